@@ -0,0 +1,245 @@
+"""
+Headless batch generation: scrape -> select -> render -> encode for many
+listings without the frontend or the HTTP API.
+
+    python batch.py listings.csv --out output/ --workers 4 --scrape-workers 2
+
+Input is CSV or JSONL (by extension) with a listing_url plus the
+PropertyInfo fields (price, bedrooms, bathrooms, square_feet, address,
+city, state, zip_code and optionally property_type, year_built, lot_size).
+JSONL rows may nest those under "property_info". An optional image_urls
+column (a JSON list, or "|"-separated in CSV) skips the scrape, and an
+optional id column names the output folder.
+
+Each listing gets <out>/<id>/post.jpg, caption.txt, hashtags.txt and
+meta.json. Finished listings are appended to <out>/checkpoint.jsonl, so
+re-running the same command resumes where it stopped; failed listings are
+retried unless --skip-failed is given. A per-stage timing summary is
+printed at the end.
+"""
+
+import argparse
+import csv
+import hashlib
+import json
+import logging
+import math
+import os
+import sys
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime
+
+import myapp
+
+STAGES = ("scrape", "select", "load", "render", "encode", "write")
+PROPERTY_FIELDS = set(myapp.PropertyInfo.model_fields)
+
+# ============================================================================
+# INPUT
+# ============================================================================
+
+def read_rows(path: str) -> list:
+    if path.endswith((".jsonl", ".ndjson")):
+        with open(path, encoding="utf-8") as f:
+            return [json.loads(line) for line in f if line.strip()]
+    with open(path, newline="", encoding="utf-8-sig") as f:
+        return list(csv.DictReader(f))
+
+def parse_row(row: dict) -> dict:
+    """Listing URL, PropertyInfo, optional pre-selected image URLs and the output key"""
+    fields = row.get('property_info') or {name: row.get(name) for name in PROPERTY_FIELDS}
+    # Blank CSV cells mean "not given"
+    fields = {name: value for name, value in fields.items() if value not in (None, "")}
+    property_info = myapp.PropertyInfo(**fields)
+
+    listing_url = (row.get('listing_url') or "").strip()
+    image_urls = row.get('image_urls') or []
+    if isinstance(image_urls, str):
+        image_urls = json.loads(image_urls) if image_urls.startswith("[") else image_urls.split("|")
+    image_urls = [url.strip() for url in image_urls if url.strip()]
+    if not listing_url and not image_urls:
+        raise ValueError("Row needs a listing_url or image_urls")
+
+    key = (row.get('id') or myapp.catalogue_listing_id(listing_url)
+           or hashlib.md5((listing_url or "|".join(image_urls)).encode()).hexdigest()[:12])
+    return {'key': str(key), 'listing_url': listing_url, 'image_urls': image_urls, 'property_info': property_info}
+
+# ============================================================================
+# CHECKPOINT
+# ============================================================================
+
+class Checkpoint:
+    """Append-only JSONL record of finished listings; the last line for a key wins"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.entries = {}
+        self._lock = threading.Lock()
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        continue  # a line cut short by a crash
+                    self.entries[entry['key']] = entry
+        self._file = open(path, "a", encoding="utf-8")
+
+    def done(self, key: str, skip_failed: bool) -> bool:
+        entry = self.entries.get(key)
+        return entry is not None and (entry['status'] == "ok" or skip_failed)
+
+    def record(self, entry: dict):
+        with self._lock:
+            self.entries[entry['key']] = entry
+            self._file.write(json.dumps(entry) + "\n")
+            self._file.flush()
+            os.fsync(self._file.fileno())
+
+    def close(self):
+        self._file.close()
+
+# ============================================================================
+# PIPELINE
+# ============================================================================
+
+def write_atomic(path: str, data: bytes):
+    tmp_path = path + ".part"
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+def process_listing(job: dict, out_dir: str, scrape_slots: threading.Semaphore) -> dict:
+    """Run one listing through the pipeline, returning its stage timings"""
+    timings = {}
+
+    def timed(stage, fn, *args):
+        start = time.perf_counter()
+        try:
+            return fn(*args)
+        finally:
+            timings[stage] = time.perf_counter() - start
+
+    image_urls = job['image_urls']
+    if not image_urls:
+        with scrape_slots:
+            remote_urls = timed("scrape", myapp.run_scrape, job['listing_url'])
+        image_urls = [myapp.get_original_url(url) for url in remote_urls]
+        listing_id = myapp.catalogue_listing_id(job['listing_url'])
+        if listing_id:
+            myapp.catalogue.record_scrape(listing_id, job['listing_url'], image_urls, timings['scrape'] * 1000)
+    if len(image_urls) < 4:
+        raise ValueError(f"Need at least 4 images, found {len(image_urls)}")
+
+    selection = timed("select", myapp.auto_select_images, image_urls)
+    hero_img, detail_imgs = timed("load", myapp.load_post_images, selection['hero_image_url'], selection['detail_images'])
+    post = timed("render", myapp.create_social_media_post, hero_img, detail_imgs, job['property_info'])
+    jpeg = timed("encode", myapp.encode_jpeg, post)
+
+    def write():
+        listing_dir = os.path.join(out_dir, job['key'])
+        os.makedirs(listing_dir, exist_ok=True)
+        write_atomic(os.path.join(listing_dir, "post.jpg"), jpeg)
+        write_atomic(os.path.join(listing_dir, "caption.txt"), myapp.generate_caption(job['property_info']).encode())
+        write_atomic(os.path.join(listing_dir, "hashtags.txt"),
+                     "\n".join(myapp.generate_hashtags(job['property_info'])).encode())
+        write_atomic(os.path.join(listing_dir, "meta.json"), json.dumps({
+            'listing_url': job['listing_url'],
+            'images_found': len(image_urls),
+            'hero_image_url': selection['hero_image_url'],
+            'detail_images': selection['detail_images'],
+            'property_info': job['property_info'].model_dump(),
+        }, indent=2).encode())
+
+    timed("write", write)
+    return timings
+
+# ============================================================================
+# SUMMARY
+# ============================================================================
+
+def percentile(sorted_values, pct: float) -> float:
+    """Nearest-rank percentile"""
+    return sorted_values[max(0, math.ceil(pct / 100 * len(sorted_values)) - 1)]
+
+def print_summary(stage_timings: dict, counts: dict, elapsed: float):
+    print(f"\n{counts['ok']} ok, {counts['failed']} failed, {counts['skipped']} skipped (already done) "
+          f"in {elapsed:.1f}s" + (f" - {counts['ok'] / elapsed * 60:.1f} listings/min" if counts['ok'] else ""))
+    if not stage_timings:
+        return
+    print(f"\n{'stage':<8} {'n':>5} {'total s':>9} {'mean ms':>9} {'p50 ms':>9} {'p95 ms':>9} {'max ms':>9}")
+    for stage in STAGES:
+        timings = sorted(stage_timings.get(stage, []))
+        if not timings:
+            continue
+        print(f"{stage:<8} {len(timings):>5} {sum(timings):>9.1f} {sum(timings) / len(timings) * 1000:>9.0f} "
+              f"{percentile(timings, 50) * 1000:>9.0f} {percentile(timings, 95) * 1000:>9.0f} {timings[-1] * 1000:>9.0f}")
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Generate posts for many listings from CSV/JSONL")
+    parser.add_argument("input", help="CSV or JSONL file of listings")
+    parser.add_argument("--out", default="batch_output", help="output directory (also holds the checkpoint)")
+    parser.add_argument("--workers", type=int, default=myapp.RENDER_WORKERS, help="listings processed in parallel")
+    parser.add_argument("--scrape-workers", type=int, default=2, help="concurrent Chrome scrapes")
+    parser.add_argument("--skip-failed", action="store_true", help="don't retry listings that failed last time")
+    parser.add_argument("--limit", type=int, help="stop after this many listings")
+    parser.add_argument("-v", "--verbose", action="store_true", help="show the app's INFO logs")
+    args = parser.parse_args(argv)
+
+    if not args.verbose:
+        myapp.logger.setLevel(logging.WARNING)
+    os.makedirs(args.out, exist_ok=True)
+    checkpoint = Checkpoint(os.path.join(args.out, "checkpoint.jsonl"))
+
+    jobs, counts = [], {'ok': 0, 'failed': 0, 'skipped': 0}
+    for line_number, row in enumerate(read_rows(args.input), start=1):
+        try:
+            job = parse_row(row)
+        except Exception as e:
+            print(f"Row {line_number}: skipped, {e}")
+            counts['failed'] += 1
+            continue
+        if checkpoint.done(job['key'], args.skip_failed):
+            counts['skipped'] += 1
+        else:
+            jobs.append(job)
+    jobs = jobs[:args.limit] if args.limit else jobs
+    print(f"{len(jobs)} listing(s) to process, {counts['skipped']} already done, {args.workers} worker(s)")
+
+    stage_timings = defaultdict(list)
+    scrape_slots = threading.Semaphore(args.scrape_workers)
+    start = time.perf_counter()
+    pool = ThreadPoolExecutor(max_workers=args.workers, thread_name_prefix="batch")
+    try:
+        futures = {pool.submit(process_listing, job, args.out, scrape_slots): job for job in jobs}
+        for done, future in enumerate(as_completed(futures), start=1):
+            job = futures[future]
+            entry = {'key': job['key'], 'listing_url': job['listing_url'], 'finished_at': datetime.now().isoformat()}
+            try:
+                timings = future.result()
+                entry.update(status="ok", timings={stage: round(t, 3) for stage, t in timings.items()})
+                for stage, seconds in timings.items():
+                    stage_timings[stage].append(seconds)
+                counts['ok'] += 1
+                print(f"[{done}/{len(jobs)}] ✅ {job['key']} ({sum(timings.values()):.1f}s)")
+            except Exception as e:
+                entry.update(status="failed", error=str(e))
+                counts['failed'] += 1
+                print(f"[{done}/{len(jobs)}] ❌ {job['key']}: {e}")
+            checkpoint.record(entry)
+    except KeyboardInterrupt:
+        print("\nInterrupted - finished listings are checkpointed, re-run to resume")
+        pool.shutdown(wait=False, cancel_futures=True)
+        return 130
+    finally:
+        pool.shutdown(wait=True)
+        checkpoint.close()
+        myapp.driver_pool.close()
+        print_summary(stage_timings, counts, time.perf_counter() - start)
+    return 1 if counts['failed'] else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
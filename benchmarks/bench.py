@@ -0,0 +1,470 @@
+"""
+Benchmarks for the render, encode, image loading and caption paths.
+
+    python benchmarks/bench.py                    # run everything, compare with baseline.json
+    python benchmarks/bench.py --quick            # fewer iterations, skip the 50 MP fixture
+    python benchmarks/bench.py -k post -k caption # only benchmarks whose name contains a pattern
+    python benchmarks/bench.py --update-baseline  # record the results as the new baseline
+
+Fixture images (12-50 MP JPEGs, grayscale and CMYK JPEGs, a PNG with alpha,
+a palette PNG) are generated deterministically into benchmarks/.fixtures on
+first run.
+
+Latency is timed with tracemalloc off. Allocations (tracemalloc peak and net,
+Python-level only) and peak RSS come from a separate instrumented call, since
+Pillow's pixel buffers are invisible to tracemalloc. Peak RSS resets the
+kernel high-water mark through /proc/self/clear_refs where it can and falls
+back to the RSS delta otherwise.
+
+Correctness checks run first - outputs the benchmarked code must keep
+producing, such as slideshows that decode back through Pillow. A failed
+check, or a benchmark whose p50 latency or peak RSS is more than
+--threshold (default 15%) above the baseline, makes the exit status 1.
+Baselines are machine-specific - the host they were recorded on is stored
+alongside and a mismatch is reported.
+"""
+
+import argparse
+import base64
+import ctypes
+import gc
+import io
+import json
+import math
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+FIXTURE_DIR = os.path.join(BENCH_DIR, ".fixtures")
+BASELINE_PATH = os.path.join(BENCH_DIR, "baseline.json")
+
+# Keep the app's on-disk state out of the working tree
+_runtime_dir = tempfile.mkdtemp(prefix="aryeo-bench-")
+for _name, _value in {
+    "CATALOGUE_DB_PATH": os.path.join(_runtime_dir, "catalogue.db"),
+    "SESSION_BACKEND": "memory",
+    "DOWNLOAD_DIR": os.path.join(_runtime_dir, "downloads"),
+    "DEBUG_DIR": os.path.join(_runtime_dir, "debug"),
+    "TRACE_FILE": os.path.join(_runtime_dir, "spans.jsonl"),
+    "FRONTEND_DIR": os.path.join(_runtime_dir, "frontend"),
+}.items():
+    os.environ.setdefault(_name, _value)
+
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+import logging
+logging.disable(logging.WARNING)
+
+import numpy as np
+from PIL import Image, ImageEnhance
+
+import myapp
+
+# ============================================================================
+# FIXTURES
+# ============================================================================
+
+FIXTURES = {
+    # name: (file name, size, mode)
+    'jpeg_12mp': ("photo_12mp.jpg", (4000, 3000), "RGB"),
+    'jpeg_24mp': ("photo_24mp.jpg", (6000, 4000), "RGB"),
+    'jpeg_50mp': ("photo_50mp.jpg", (8660, 5774), "RGB"),
+    'png_alpha': ("overlay_alpha.png", (2400, 1600), "RGBA"),
+    'png_palette': ("floorplan_palette.png", (1600, 1200), "P"),
+    'jpeg_gray': ("photo_gray.jpg", (4000, 3000), "L"),
+    'jpeg_cmyk': ("photo_cmyk.jpg", (4000, 3000), "CMYK"),
+}
+
+def synthetic_photo(size, seed: int) -> Image.Image:
+    """Smooth colour fields plus sensor-like noise - compresses and decodes like a real photo"""
+    rng = np.random.default_rng(seed)
+    base = Image.fromarray(rng.integers(0, 256, (18, 24, 3), dtype=np.uint8)).resize(size, Image.Resampling.BICUBIC)
+    noise = Image.effect_noise(size, 32).convert("RGB")
+    return Image.blend(base, noise, 0.12)
+
+def fixture_path(name: str) -> str:
+    filename, size, mode = FIXTURES[name]
+    path = os.path.join(FIXTURE_DIR, filename)
+    if os.path.exists(path):
+        return path
+    os.makedirs(FIXTURE_DIR, exist_ok=True)
+    print(f"  generating {filename} ({size[0]}x{size[1]} {mode})", flush=True)
+    img = synthetic_photo(size, seed=sum(map(ord, name)))
+    if mode == "RGBA":
+        img.putalpha(Image.radial_gradient("L").resize(size))
+        img.save(path, optimize=True)
+    elif mode == "P":
+        img.quantize(64).save(path, optimize=True)
+    elif mode != "RGB":
+        img.convert(mode).save(path, quality=92)
+    else:
+        img.save(path, quality=92)
+    return path
+
+PROPERTY_CASES = {
+    'typical': myapp.PropertyInfo(
+        price="1,250,000", bedrooms=4, bathrooms=2.5, square_feet=3200,
+        address="123 Main Street", city="Austin", state="TX", zip_code="78701", year_built=2020,
+    ),
+    'long_address': myapp.PropertyInfo(
+        price="875,000", bedrooms=3, bathrooms=2, square_feet=2100,
+        address="12345 North Extraordinarily Long Boulevard Name Northwest, Building C, Apartment 1204B",
+        city="Rancho Santa Margarita Heights", state="CA", zip_code="92688-1234",
+    ),
+    'many_specs': myapp.PropertyInfo(
+        price="24,950,000", bedrooms=14, bathrooms=16.5, square_feet=987654,
+        address="1 Estate Drive", city="Greenwich", state="CT", zip_code="06830",
+        property_type="Single Family Residence with Detached Guest House", year_built=1899, lot_size="42.7 acres",
+    ),
+    'unicode': myapp.PropertyInfo(
+        price="640,000", bedrooms=2, bathrooms=1, square_feet=980,
+        address="Calle de Peñalver 12, 3º Izquierda", city="São José", state="PR", zip_code="00907",
+        property_type="Condomínio",
+    ),
+}
+
+# ============================================================================
+# BENCHMARK REGISTRY
+# ============================================================================
+
+BENCHMARKS = []
+
+def benchmark(name: str, iterations: int, before=None, heavy: bool = False, repeat: int = 1):
+    """
+    Register fn() as a benchmark; before() runs untimed ahead of every sample.
+    Microsecond-scale functions set repeat so each sample times a batch of
+    calls, keeping timer noise out of the per-call figures.
+    """
+    def register(fn):
+        BENCHMARKS.append({'name': name, 'fn': fn, 'iterations': iterations, 'before': before, 'heavy': heavy,
+                           'repeat': repeat})
+        return fn
+    return register
+
+def clear_image_cache():
+    myapp.image_cache.clear()
+
+def register_benchmarks():
+    """Build the benchmark list; fixtures are loaded lazily inside each closure"""
+    for name, iterations in (('jpeg_12mp', 6), ('jpeg_24mp', 4), ('jpeg_50mp', 3), ('png_alpha', 8), ('png_palette', 10),
+                             ('jpeg_gray', 6), ('jpeg_cmyk', 6)):
+        path = fixture_path(name)
+        benchmark(f"download_image[{name}]", iterations, before=clear_image_cache,
+                  heavy=name == 'jpeg_50mp')(lambda path=path: myapp.download_image(path))
+    # Decoding only as much as a detail slot needs (JPEG draft mode)
+    for name in ('jpeg_12mp', 'jpeg_24mp'):
+        benchmark(f"download_image[{name}@detail]", 6, before=clear_image_cache)(
+            lambda path=fixture_path(name): myapp.download_image(path, target=myapp.POST_DETAIL_SIZE)
+        )
+
+    loaded = {}
+
+    def images():
+        if not loaded:
+            clear_image_cache()
+            loaded['hero'] = myapp.download_image(fixture_path('jpeg_12mp'))
+            loaded['details'] = [myapp.download_image(fixture_path(name))
+                                 for name in ('jpeg_24mp', 'png_alpha', 'png_palette')]
+            loaded['post'] = myapp.create_social_media_post(loaded['hero'], loaded['details'], PROPERTY_CASES['typical'])
+        return loaded
+
+    for case, info in PROPERTY_CASES.items():
+        benchmark(f"create_social_media_post[{case}]", 6)(
+            lambda info=info: myapp.create_social_media_post(images()['hero'], images()['details'], info)
+        )
+    # Non-RGB sources (grayscale and CMYK JPEGs) through the whole render
+    benchmark("create_social_media_post[gray_cmyk]", 6)(
+        lambda: myapp.create_social_media_post(
+            myapp.download_image(fixture_path('jpeg_gray')),
+            [myapp.download_image(fixture_path(name)) for name in ('jpeg_cmyk', 'jpeg_gray', 'jpeg_cmyk')],
+            PROPERTY_CASES['typical'],
+        )
+    )
+    benchmark("image_to_base64[post]", 12)(lambda: myapp.image_to_base64(images()['post']))
+
+    # Interactive preview: the full preview path, and re-rendering from already prepared tiles
+    benchmark("create_social_media_post[preview]", 12)(
+        lambda: myapp.create_social_media_post(images()['hero'], images()['details'], PROPERTY_CASES['typical'],
+                                               preview=True)
+    )
+    preview_tiles = {}
+
+    def render_preview_from_tiles():
+        if not preview_tiles:
+            preview_tiles['hero'] = myapp.prepare_post_tile(images()['hero'], "hero", preview=True)
+            preview_tiles['details'] = [myapp.prepare_post_tile(img, "detail", preview=True)
+                                        for img in images()['details']]
+        canvas = myapp.compose_post_canvas(preview_tiles['hero'], preview_tiles['details'],
+                                           PROPERTY_CASES['typical'], myapp.PREVIEW_SCALE)
+        return myapp.encode_preview_jpeg(canvas)
+
+    benchmark("preview[cached_tiles]", 20)(render_preview_from_tiles)
+
+    # Tile enhancement: the fused point table + kernel against the ImageEnhance chain it replaced
+    tiles = {}
+
+    def resized_tile(slot):
+        if slot not in tiles:
+            size = myapp.POST_HERO_SIZE if slot == "hero" else myapp.POST_DETAIL_SIZE
+            img = myapp.crop_to_aspect(images()['hero'], size[0] / size[1])
+            tiles[slot] = img.resize(size, Image.Resampling.LANCZOS)
+        return tiles[slot]
+
+    for slot in ("hero", "detail"):
+        benchmark(f"enhance_tile[{slot}:legacy]", 20)(lambda slot=slot: legacy_enhance(resized_tile(slot), slot))
+        benchmark(f"enhance_tile[{slot}:fused]", 20)(lambda slot=slot: myapp.enhance_tile(resized_tile(slot), slot))
+
+    for case, info in PROPERTY_CASES.items():
+        benchmark(f"generate_caption[{case}]", 60, repeat=200)(lambda info=info: myapp.generate_caption(info))
+        benchmark(f"generate_hashtags[{case}]", 60, repeat=200)(lambda info=info: myapp.generate_hashtags(info))
+
+def legacy_enhance(img: Image.Image, slot: str) -> Image.Image:
+    """The chained ImageEnhance passes prepare_post_tile used before enhance_tile"""
+    img = ImageEnhance.Contrast(img).enhance(1.1)
+    if slot == "hero":
+        img = ImageEnhance.Sharpness(img).enhance(1.1)
+    return img
+
+# ============================================================================
+# CHECKS
+# ============================================================================
+
+CHECKS = []
+
+def check(name: str):
+    """Register fn() as a correctness check; it fails by raising"""
+    def register(fn):
+        CHECKS.append({'name': name, 'fn': fn})
+        return fn
+    return register
+
+@check("slideshow round trip")
+def check_slideshow_round_trip():
+    # FrameSequence streams frames through Pillow internals; a Pillow upgrade that breaks it must show here
+    if myapp.frame_sequence_class() is None:
+        raise AssertionError("FrameSequence failed its round trip, slideshows fall back to holding every frame")
+    for image_format in ("gif", "webp"):
+        request = myapp.SlideshowRequest(
+            session_id="bench", hero_image_url=fixture_path('jpeg_12mp'),
+            detail_images=[fixture_path(name) for name in ('jpeg_24mp', 'png_alpha', 'png_palette')],
+            property_info=PROPERTY_CASES['typical'], format=image_format, fps=4, duration=2, size=240,
+        )
+        result = myapp.render_slideshow(request)
+        decoded = Image.open(io.BytesIO(base64.b64decode(result['image_base64'])))
+        if (decoded.format.lower(), decoded.n_frames, decoded.size) != (image_format, result['frames'], (240, 240)):
+            raise AssertionError(f"{image_format} decoded as {decoded.format} with {decoded.n_frames} frames "
+                                 f"of {decoded.size}, expected {result['frames']} of (240, 240)")
+
+@check("enhance_tile tolerance")
+def check_enhance_tile_tolerance():
+    # The fused passes must match the ImageEnhance chain exactly at the shipped 1.1 factors and within one level elsewhere
+    source = myapp.download_image(fixture_path('jpeg_12mp'))
+    cases = [(1.1, 1.1, 0), (1.1, 1.0, 0), (0.8, 1.0, 1), (1.3, 1.0, 1),
+             (1.0, 0.5, 1), (1.0, 2.0, 1), (0.9, 0.8, 1), (1.2, 1.3, 1)]
+    for size in (myapp.POST_HERO_SIZE, myapp.POST_DETAIL_SIZE):
+        tile = myapp.crop_to_aspect(source, size[0] / size[1]).resize(size, Image.Resampling.LANCZOS)
+        for contrast, sharpness, tolerance in cases:
+            preset = f"bench-check-{contrast}-{sharpness}"
+            myapp.ENHANCE_PRESETS[preset] = {**myapp.ENHANCE_DEFAULTS, 'contrast': contrast, 'sharpness': sharpness}
+            try:
+                fused = myapp.enhance_tile(tile, preset)
+            finally:
+                del myapp.ENHANCE_PRESETS[preset]
+            chained = ImageEnhance.Sharpness(ImageEnhance.Contrast(tile).enhance(contrast)).enhance(sharpness)
+            drift = int(np.abs(np.asarray(fused, dtype=np.int16) - np.asarray(chained, dtype=np.int16)).max())
+            if drift > tolerance:
+                raise AssertionError(f"contrast {contrast}, sharpness {sharpness} at {size}: off by {drift} levels, "
+                                     f"allowed {tolerance}")
+
+def run_checks() -> list:
+    """Run every check, returning the names of those that failed"""
+    failed = []
+    for entry in CHECKS:
+        try:
+            entry['fn']()
+        except Exception as e:
+            failed.append(entry['name'])
+            print(f"  ❌ {entry['name']}: {e}", flush=True)
+        else:
+            print(f"  ✅ {entry['name']}", flush=True)
+    return failed
+
+# ============================================================================
+# MEASUREMENT
+# ============================================================================
+
+def percentile(sorted_values, pct: float) -> float:
+    """Nearest-rank percentile"""
+    return sorted_values[max(0, math.ceil(pct / 100 * len(sorted_values)) - 1)]
+
+def reset_peak_rss() -> bool:
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+        return True
+    except OSError:
+        return False
+
+def peak_rss() -> int:
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith("VmHWM:"):
+                return int(line.split()[1]) * 1024
+    return 0
+
+def release_free_memory():
+    """Hand freed heap and Pillow's block cache back to the OS so the RSS peak reflects this call alone"""
+    gc.collect()
+    Image.core.clear_cache()
+    try:
+        ctypes.CDLL("libc.so.6").malloc_trim(0)
+    except (OSError, AttributeError):
+        pass
+
+def measure_memory(bench: dict) -> dict:
+    if bench['before']:
+        bench['before']()
+    release_free_memory()
+    rss_before = myapp.process_rss()
+    hwm = reset_peak_rss()
+    tracemalloc.start()
+    traced_start = tracemalloc.get_traced_memory()[0]
+    try:
+        bench['fn']()
+        traced_end, traced_peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    rss_peak = peak_rss() if hwm else myapp.process_rss()
+    return {
+        'alloc_peak_kb': round((traced_peak - traced_start) / 1024, 1),
+        'alloc_net_kb': round((traced_end - traced_start) / 1024, 1),
+        'peak_rss_mb': round(max(rss_peak - rss_before, 0) / 1024 / 1024, 1),
+    }
+
+def run_benchmark(bench: dict, quick: bool) -> dict:
+    iterations = max(2, bench['iterations'] // 3) if quick else bench['iterations']
+    if bench['before']:
+        bench['before']()
+    bench['fn']()  # warm-up: fonts, lazy imports, first-touch allocations
+
+    timings = []
+    for _ in range(iterations):
+        if bench['before']:
+            bench['before']()
+        fn, repeat = bench['fn'], bench['repeat']
+        start = time.perf_counter()
+        for _ in range(repeat):
+            fn()
+        timings.append((time.perf_counter() - start) * 1000 / repeat)
+    timings.sort()
+    result = {
+        'iterations': iterations,
+        'p50_ms': round(percentile(timings, 50), 4),
+        'p95_ms': round(percentile(timings, 95), 4),
+        'p99_ms': round(percentile(timings, 99), 4),
+        'mean_ms': round(statistics.fmean(timings), 4),
+    }
+    result.update(measure_memory(bench))
+    return result
+
+# ============================================================================
+# BASELINE
+# ============================================================================
+
+def host_info() -> dict:
+    import PIL
+    return {
+        'python': platform.python_version(),
+        'pillow': PIL.__version__,
+        'numpy': np.__version__,
+        'machine': platform.machine(),
+        'cpus': os.cpu_count(),
+    }
+
+def compare(name: str, result: dict, baseline: dict, threshold: float) -> str:
+    """Verdict against the baseline: 'new', 'ok', or a description of what regressed"""
+    previous = baseline.get('benchmarks', {}).get(name)
+    if previous is None:
+        return "new"
+    regressions = []
+    if result['p50_ms'] > previous['p50_ms'] * (1 + threshold):
+        regressions.append(f"p50 {result['p50_ms'] / previous['p50_ms'] - 1:+.0%}")
+    # A couple of MB of slack so allocator noise on small benchmarks doesn't trip it
+    if result['peak_rss_mb'] > previous['peak_rss_mb'] * (1 + threshold) + 2:
+        regressions.append(f"peak RSS {result['peak_rss_mb'] - previous['peak_rss_mb']:+.1f}MB")
+    if regressions:
+        return "REGRESSED " + ", ".join(regressions)
+    return f"ok ({result['p50_ms'] / previous['p50_ms'] - 1:+.0%})"
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("-k", dest="patterns", action="append", default=[],
+                        help="only run benchmarks whose name contains this (repeatable)")
+    parser.add_argument("--quick", action="store_true", help="fewer iterations and no 50 MP fixture")
+    parser.add_argument("--threshold", type=float, default=0.15, help="allowed slowdown before flagging (0.15 = 15%%)")
+    parser.add_argument("--baseline", default=BASELINE_PATH, help="baseline JSON to compare against")
+    parser.add_argument("--update-baseline", action="store_true", help="write these results as the baseline")
+    parser.add_argument("--json", dest="json_out", help="also write the results to this file")
+    args = parser.parse_args(argv)
+
+    print("Preparing fixtures...", flush=True)
+    register_benchmarks()
+    print("Checks:", flush=True)
+    failed_checks = run_checks()
+    selected = [
+        bench for bench in BENCHMARKS
+        if (not args.patterns or any(pattern in bench['name'] for pattern in args.patterns))
+        and not (args.quick and bench['heavy'])
+    ]
+
+    baseline = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        if baseline.get('host') != host_info():
+            print(f"⚠️  Baseline was recorded on {baseline.get('host')}, this is {host_info()}")
+
+    header = f"{'benchmark':<42} {'iters':>5} {'p50 ms':>10} {'p95 ms':>10} {'p99 ms':>10} " \
+             f"{'alloc KB':>10} {'peak MB':>8}  vs baseline"
+    print(header)
+    print("-" * len(header))
+    results = {}
+    regressed = []
+    for bench in selected:
+        result = run_benchmark(bench, args.quick)
+        results[bench['name']] = result
+        verdict = compare(bench['name'], result, baseline, args.threshold)
+        if verdict.startswith("REGRESSED"):
+            regressed.append(bench['name'])
+        print(f"{bench['name']:<42} {result['iterations']:>5} {result['p50_ms']:>10.3f} {result['p95_ms']:>10.3f} "
+              f"{result['p99_ms']:>10.3f} {result['alloc_peak_kb']:>10.1f} {result['peak_rss_mb']:>8.1f}  {verdict}",
+              flush=True)
+
+    report = {'host': host_info(), 'recorded_at': time.strftime("%Y-%m-%dT%H:%M:%S"), 'benchmarks': results}
+    if args.json_out:
+        with open(args.json_out, "w") as f:
+            json.dump(report, f, indent=2)
+    if args.update_baseline:
+        # Merge so a filtered run only refreshes the benchmarks it ran
+        report['benchmarks'] = {**baseline.get('benchmarks', {}), **results}
+        with open(args.baseline, "w") as f:
+            json.dump(report, f, indent=2)
+            f.write("\n")
+        print(f"Baseline written to {args.baseline}")
+        return 0
+
+    if failed_checks:
+        print(f"\n❌ {len(failed_checks)} check(s) failed: {', '.join(failed_checks)}")
+    if regressed:
+        print(f"\n❌ {len(regressed)} benchmark(s) regressed more than {args.threshold:.0%}: {', '.join(regressed)}")
+    if failed_checks or regressed:
+        return 1
+    print("\n✅ No regressions")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,304 @@
+"""
+Local stand-in for app.aryeo.com and cdn.aryeo.com, for load tests and
+offline development.
+
+    python loadtest/fake_aryeo.py --port 8100
+
+then start the API against it:
+
+    BASE_URL=http://127.0.0.1:8100 LOGIN_URL=http://127.0.0.1:8100/login \\
+    CDN_ORIGIN=http://127.0.0.1:8100/cdn ALLOWED_LISTING_DOMAIN=127.0.0.1 \\
+    ARYEO_EMAIL=dev@example.com ARYEO_PASSWORD=dev python myapp.py
+
+It serves:
+  - the two-step login (#Emailaddress, then #Password), accepting any credentials
+  - /admin/listings/<id>/edit and /listings/<id>/download-center, the latter
+    only with the session cookie
+  - /listings/<id>/download-center/archive.zip, a streamed ZIP of originals
+  - /api/listings/<id>/media, the JSON media listing the page fetches with api=1
+  - /cdn/listings/<id>/resized/<variant>/<variant>-<n>.jpg plus originals at
+    /cdn/listings/<id>/<n>.jpg, generated deterministically
+
+Listing pages are shaped by query parameters on the listing URL, which
+download_link carries through to the download-center:
+  images=N    number of photos (default --images)
+  lazy=N      how many of them lazy-load on scroll via data-src
+  styles=N    how many are inline-style background images instead of <img>
+  api=1       render the photos from a fetched JSON media listing instead of HTML
+  delay=MS    extra latency before the page responds
+  cdn_delay=MS  extra latency on every CDN image of the listing
+  cdn_tail=PCT  percentage of CDN responses held back a further --cdn-tail-delay ms
+"""
+
+import argparse
+import asyncio
+import html
+import io
+import random
+import secrets
+import zipfile
+from functools import lru_cache
+from urllib.parse import parse_qs
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import HTMLResponse, RedirectResponse, Response, StreamingResponse
+from PIL import Image, ImageDraw
+
+SESSION_COOKIE = "aryeo_session"
+VARIANT_WIDTHS = {'thumbnail': 320, 'medium': 800, 'large': 1600}
+
+settings = {'images': 25, 'lazy': 0, 'styles': 0, 'api': 0, 'delay': 0, 'cdn_delay': 0, 'cdn_tail': 0,
+            'cdn_tail_delay': 2000, 'original_width': 3000}
+sessions = set()
+
+app = FastAPI(title="Fake Aryeo")
+
+# ============================================================================
+# LOGIN
+# ============================================================================
+
+PAGE = """<!doctype html>
+<html><head><title>{title}</title></head>
+<body style="margin:0;font-family:sans-serif">{body}</body></html>"""
+
+def page(title: str, body: str) -> HTMLResponse:
+    return HTMLResponse(PAGE.format(title=html.escape(title), body=body))
+
+@app.get("/login")
+def login_form():
+    return page("Log in", """
+        <form method="post" action="/login/email">
+          <input id="Emailaddress" name="email" type="email">
+          <button type="submit">Continue</button>
+        </form>""")
+
+async def form_fields(request: Request) -> dict:
+    """URL-encoded form fields, parsed by hand so python-multipart isn't needed"""
+    return {name: values[0] for name, values in parse_qs((await request.body()).decode()).items()}
+
+@app.post("/login/email")
+async def login_email(request: Request):
+    email = (await form_fields(request)).get("email", "")
+    return page("Log in", f"""
+        <form method="post" action="/login/password">
+          <input type="hidden" name="email" value="{html.escape(email)}">
+          <input id="Password" name="password" type="password">
+          <button type="submit">Log in</button>
+        </form>""")
+
+@app.post("/login/password")
+async def login_password(request: Request):
+    # Any credentials are accepted
+    await form_fields(request)
+    token = secrets.token_hex(16)
+    sessions.add(token)
+    response = RedirectResponse("/dashboard", status_code=303)
+    response.set_cookie(SESSION_COOKIE, token, httponly=True)
+    return response
+
+@app.get("/dashboard")
+def dashboard(request: Request):
+    if request.cookies.get(SESSION_COOKIE) not in sessions:
+        return RedirectResponse("/login", status_code=303)
+    return page("Dashboard", "<h1>Listings</h1>")
+
+# ============================================================================
+# LISTING PAGES
+# ============================================================================
+
+def listing_options(request: Request) -> dict:
+    options = dict(settings)
+    for name in ('images', 'lazy', 'styles', 'api', 'delay', 'cdn_delay', 'cdn_tail'):
+        if name in request.query_params:
+            options[name] = int(request.query_params[name])
+    return options
+
+def cdn_query(options: dict) -> str:
+    """Query string carrying the listing's CDN latency options onto its image URLs"""
+    query = "&".join(f"{name}={options[name]}" for name in ('cdn_delay', 'cdn_tail') if options[name])
+    return f"?{query}" if query else ""
+
+@app.get("/admin/listings/{listing_id}/edit")
+def listing_edit(listing_id: str):
+    return page("Edit listing", f'<a href="/listings/{listing_id}/download-center">Download center</a>')
+
+LAZY_SCRIPT = """
+<script>
+function loadVisible() {
+  const limit = window.scrollY + window.innerHeight * 2;
+  document.querySelectorAll('img[data-src]').forEach(img => {
+    if (img.getBoundingClientRect().top + window.scrollY < limit) {
+      img.src = img.dataset.src;
+      img.removeAttribute('data-src');
+    }
+  });
+}
+window.addEventListener('scroll', loadVisible);
+loadVisible();
+</script>"""
+
+MEDIA_SCRIPT = """
+<script>
+fetch('{url}', {{credentials: 'same-origin'}}).then(r => r.json()).then(data => {{
+  data.media.forEach(item => {{
+    const img = document.createElement('img');
+    img.className = 'photo';
+    img.src = item.variants.large;
+    document.body.appendChild(img);
+  }});
+}});
+</script>"""
+
+PLACEHOLDER = "data:image/gif;base64,R0lGODlhAQABAAAAACw="
+
+@app.get("/listings/{listing_id}/download-center")
+async def download_center(listing_id: str, request: Request):
+    if request.cookies.get(SESSION_COOKIE) not in sessions:
+        return RedirectResponse("/login", status_code=303)
+    options = listing_options(request)
+    if options['delay']:
+        await asyncio.sleep(options['delay'] / 1000)
+
+    cdn = f"{request.base_url}cdn/listings/{listing_id}"
+    query = cdn_query(options)
+    tiles = []
+    for n in range(1, options['images'] + 1):
+        url = f"{cdn}/resized/large/large-{n}.jpg{query}"
+        if n <= options['styles']:
+            tiles.append(f'<div class="photo" style="background-image: url(\'{url}\');"></div>')
+        elif n <= options['styles'] + options['lazy']:
+            tiles.append(f'<img class="photo" src="{PLACEHOLDER}" data-src="{url}">')
+        else:
+            tiles.append(f'<img class="photo" src="{url}">')
+    archive = f"/listings/{listing_id}/download-center/archive.zip?{request.url.query}"
+    if options['api']:
+        tiles = [MEDIA_SCRIPT.format(url=f"/api/listings/{listing_id}/media?{request.url.query}")]
+    return page("Download center", f"""
+        <style>.photo {{ display:block; width:400px; height:300px; margin:40px auto; background-size:cover; }}</style>
+        <a href="{archive}" download>Download all</a>
+        {''.join(tiles)}
+        {LAZY_SCRIPT if options['lazy'] and not options['api'] else ''}""")
+
+@app.get("/api/listings/{listing_id}/media")
+async def media_listing(listing_id: str, request: Request):
+    if request.cookies.get(SESSION_COOKIE) not in sessions:
+        return Response(status_code=403)
+    options = listing_options(request)
+    cdn = f"{request.base_url}cdn/listings/{listing_id}"
+    query = cdn_query(options)
+    return {'media': [
+        {
+            'id': n,
+            'original': f"{cdn}/{n}.jpg{query}",
+            'variants': {variant: f"{cdn}/resized/{variant}/{variant}-{n}.jpg{query}" for variant in VARIANT_WIDTHS},
+        }
+        for n in range(1, options['images'] + 1)
+    ] + [
+        # Other media the CDN hosts, which are not listing photos
+        {'id': "tour", 'original': f"{cdn}/tour.mp4{query}", 'variants': {}},
+        {'id': "floorplan", 'original': f"{cdn}/floorplan.pdf{query}", 'variants': {}},
+    ]}
+
+class _Sink(io.RawIOBase):
+    def __init__(self):
+        self.chunks = []
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        return len(data)
+
+@app.get("/listings/{listing_id}/download-center/archive.zip")
+def download_archive(listing_id: str, request: Request):
+    if request.cookies.get(SESSION_COOKIE) not in sessions:
+        return Response(status_code=403)
+    options = listing_options(request)
+
+    def stream():
+        # Written to an unseekable sink, so entries carry data descriptors like a real streamed archive
+        sink = _Sink()
+        with zipfile.ZipFile(sink, "w", compression=zipfile.ZIP_DEFLATED) as archive:
+            for n in range(1, options['images'] + 1):
+                archive.writestr(f"photos/{n}.jpg", cdn_image(listing_id, n, options['original_width']))
+                yield b"".join(sink.chunks)
+                sink.chunks.clear()
+        yield b"".join(sink.chunks)
+
+    return StreamingResponse(stream(), media_type="application/zip")
+
+# ============================================================================
+# CDN
+# ============================================================================
+
+@lru_cache(maxsize=512)
+def cdn_image(listing_id: str, n: int, width: int) -> bytes:
+    """A deterministic photo-like JPEG: gradient sky, ground, a few shapes and the image number"""
+    rng = random.Random(f"{listing_id}-{n}")
+    height = width * 2 // 3
+    img = Image.new("RGB", (width, height))
+    draw = ImageDraw.Draw(img)
+    sky, ground = [tuple(rng.randrange(256) for _ in range(3)) for _ in range(2)]
+    horizon = int(height * rng.uniform(0.4, 0.7))
+    for y in range(0, height, 4):
+        colour = sky if y < horizon else ground
+        shade = 0.6 + 0.4 * (y / height)
+        draw.rectangle([0, y, width, y + 4], fill=tuple(int(c * shade) for c in colour))
+    for _ in range(6):
+        x, y = rng.randrange(width), rng.randrange(horizon // 2, height)
+        size = rng.randrange(width // 20, width // 5)
+        draw.rectangle([x, y, x + size, y + size * 2 // 3], fill=tuple(rng.randrange(256) for _ in range(3)))
+    draw.text((width // 20, height // 20), f"#{n}", fill=(255, 255, 255))
+    buffered = io.BytesIO()
+    img.save(buffered, format="JPEG", quality=85)
+    return buffered.getvalue()
+
+async def serve_image(listing_id: str, n: int, width: int, request: Request) -> Response:
+    cdn_delay = int(request.query_params.get("cdn_delay", settings['cdn_delay']))
+    if random.random() * 100 < float(request.query_params.get("cdn_tail", settings['cdn_tail'])):
+        cdn_delay += settings['cdn_tail_delay']
+    if cdn_delay:
+        await asyncio.sleep(cdn_delay / 1000)
+    data = await asyncio.get_running_loop().run_in_executor(None, cdn_image, listing_id, n, width)
+    return Response(data, media_type="image/jpeg", headers={"Cache-Control": "public, max-age=31536000"})
+
+@app.get("/cdn/listings/{listing_id}/resized/{variant}/{filename}")
+async def cdn_resized(listing_id: str, variant: str, filename: str, request: Request):
+    if variant not in VARIANT_WIDTHS:
+        return Response(status_code=404)
+    n = int(filename.rsplit("-", 1)[-1].split(".")[0])
+    return await serve_image(listing_id, n, VARIANT_WIDTHS[variant], request)
+
+@app.get("/cdn/listings/{listing_id}/{filename}")
+async def cdn_original(listing_id: str, filename: str, request: Request):
+    return await serve_image(listing_id, int(filename.split(".")[0]), settings['original_width'], request)
+
+@app.head("/cdn")
+@app.get("/cdn")
+def cdn_root():
+    return Response(status_code=200)
+
+def main():
+    parser = argparse.ArgumentParser(description="Local stand-in for Aryeo")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8100)
+    parser.add_argument("--images", type=int, default=settings['images'], help="photos per listing")
+    parser.add_argument("--lazy", type=int, default=0, help="photos that lazy-load on scroll")
+    parser.add_argument("--styles", type=int, default=0, help="photos shown as inline-style backgrounds")
+    parser.add_argument("--api", type=int, default=0, help="1 to render photos from a JSON media listing")
+    parser.add_argument("--delay", type=int, default=0, help="download-center latency in ms")
+    parser.add_argument("--cdn-delay", type=int, default=0, help="CDN latency per image in ms")
+    parser.add_argument("--cdn-tail", type=int, default=0, help="percentage of CDN responses that are slow")
+    parser.add_argument("--cdn-tail-delay", type=int, default=settings['cdn_tail_delay'],
+                        help="extra latency of those slow responses in ms")
+    parser.add_argument("--original-width", type=int, default=settings['original_width'])
+    args = parser.parse_args()
+    settings.update(images=args.images, lazy=args.lazy, styles=args.styles, api=args.api, delay=args.delay,
+                    cdn_delay=args.cdn_delay, cdn_tail=args.cdn_tail, cdn_tail_delay=args.cdn_tail_delay,
+                    original_width=args.original_width)
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,241 @@
+"""
+End-to-end load driver: concurrent scrape -> auto-select -> generate sessions.
+
+Against servers you started yourself (see fake_aryeo.py for the API env):
+
+    python loadtest/load.py --api http://127.0.0.1:8000 --fake http://127.0.0.1:8100 \\
+        --sessions 40 --concurrency 4 --images 30 --lazy 10 --styles 5 --delay 300
+
+or let it start both, the API pointed at the fake:
+
+    python loadtest/load.py --spawn --sessions 20 --concurrency 4
+
+Each virtual user sends its own X-Client-Id so admission fairness is
+exercised; an API you started yourself needs CLIENT_ID_TRUSTED_PROXIES=127.0.0.1
+to honour it. The report gives throughput, per-stage and end-to-end
+p50/p95/p99 latency, and error rates broken down by stage and cause.
+"""
+
+import argparse
+import json
+import math
+import os
+import subprocess
+import sys
+import threading
+import time
+import uuid
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+
+import requests
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+STAGES = ("scrape", "auto_select", "generate")
+
+PROPERTY_INFO = {
+    'price': "1,250,000", 'bedrooms': 4, 'bathrooms': 2.5, 'square_feet': 3200,
+    'address': "123 Main Street", 'city': "Austin", 'state': "TX", 'zip_code': "78701", 'year_built': 2020,
+}
+
+def percentile(sorted_values, pct: float) -> float:
+    """Nearest-rank percentile"""
+    return sorted_values[max(0, math.ceil(pct / 100 * len(sorted_values)) - 1)]
+
+class LoadRun:
+    def __init__(self, args):
+        self.args = args
+        self.latencies = defaultdict(list)
+        self.errors = Counter()
+        self.completed = 0
+        self.lock = threading.Lock()
+        self.local = threading.local()
+
+    def client(self) -> requests.Session:
+        if not hasattr(self.local, "session"):
+            self.local.session = requests.Session()
+            self.local.session.headers["X-Client-Id"] = f"load-{uuid.uuid4().hex[:8]}"
+        return self.local.session
+
+    def listing_url(self) -> str:
+        args = self.args
+        query = (f"images={args.images}&lazy={args.lazy}&styles={args.styles}&api={int(args.media_api)}"
+                 f"&delay={args.delay}&cdn_delay={args.cdn_delay}&cdn_tail={args.cdn_tail}")
+        return f"{args.fake}/admin/listings/{uuid.uuid4()}/edit?{query}"
+
+    def call(self, stage: str, path: str, payload: dict):
+        """POST one stage; returns the JSON body, or None after recording the failure"""
+        start = time.perf_counter()
+        try:
+            response = self.client().post(f"{self.args.api}{path}", json=payload, timeout=self.args.timeout)
+        except requests.RequestException as e:
+            cause = type(e).__name__
+        else:
+            if response.ok:
+                with self.lock:
+                    self.latencies[stage].append(time.perf_counter() - start)
+                return response.json()
+            cause = f"HTTP {response.status_code}"
+        with self.lock:
+            self.errors[(stage, cause)] += 1
+        return None
+
+    def session(self, _):
+        start = time.perf_counter()
+        scraped = self.call("scrape", "/scrape", {'listing_url': self.listing_url()})
+        if scraped is None:
+            return
+        selection = self.call("auto_select", "/auto-select", {'session_id': scraped['session_id']})
+        if selection is None:
+            return
+        generated = self.call("generate", "/generate", {
+            'session_id': scraped['session_id'],
+            'hero_image_url': selection['hero_image_url'],
+            'detail_images': selection['detail_images'],
+            'property_info': PROPERTY_INFO,
+        })
+        if generated is None:
+            return
+        with self.lock:
+            self.latencies["end_to_end"].append(time.perf_counter() - start)
+            self.completed += 1
+
+    def run(self) -> dict:
+        args = self.args
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+            list(pool.map(self.session, range(args.sessions)))
+        elapsed = time.perf_counter() - start
+
+        stages = {}
+        for stage in STAGES + ("end_to_end",):
+            timings = sorted(self.latencies[stage])
+            failed = sum(count for (name, _), count in self.errors.items() if name == stage)
+            attempted = len(timings) + failed
+            stages[stage] = {
+                'ok': len(timings),
+                'failed': failed,
+                'error_rate': round(failed / attempted, 4) if attempted else 0.0,
+            }
+            if timings:
+                stages[stage].update({
+                    'p50_ms': round(percentile(timings, 50) * 1000, 1),
+                    'p95_ms': round(percentile(timings, 95) * 1000, 1),
+                    'p99_ms': round(percentile(timings, 99) * 1000, 1),
+                    'max_ms': round(timings[-1] * 1000, 1),
+                })
+        return {
+            'sessions': args.sessions,
+            'concurrency': args.concurrency,
+            'elapsed_s': round(elapsed, 2),
+            'completed': self.completed,
+            'throughput_per_s': round(self.completed / elapsed, 3),
+            'error_rate': round(1 - self.completed / args.sessions, 4),
+            'stages': stages,
+            'errors': {f"{stage}: {cause}": count for (stage, cause), count in self.errors.most_common()},
+            'cdn': self.cdn_report(),
+        }
+
+    def cdn_report(self) -> Optional[dict]:
+        """The API's CDN hedging report, if it exposes one"""
+        try:
+            response = requests.get(f"{self.args.api}/debug/cdn", timeout=5)
+            return response.json() if response.ok else None
+        except requests.RequestException:
+            return None
+
+def print_report(report: dict):
+    print(f"\n{report['completed']}/{report['sessions']} sessions completed in {report['elapsed_s']}s "
+          f"at concurrency {report['concurrency']}")
+    print(f"Throughput: {report['throughput_per_s']} sessions/s, error rate {report['error_rate']:.1%}\n")
+    print(f"{'stage':<12} {'ok':>5} {'failed':>6} {'err %':>6} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'max ms':>9}")
+    for stage, row in report['stages'].items():
+        print(f"{stage:<12} {row['ok']:>5} {row['failed']:>6} {row['error_rate']:>6.1%} "
+              + " ".join(f"{row.get(key, float('nan')):>9.1f}" for key in ('p50_ms', 'p95_ms', 'p99_ms', 'max_ms')))
+    cdn = report.get('cdn')
+    if cdn:
+        print(f"\nCDN: {cdn['fetches']} fetches, hedge rate {cdn['hedge_rate']:.1%} "
+              f"({cdn['hedge_wins']} won, {cdn['hedges_skipped']} skipped), "
+              f"{cdn['retries']} retries, {cdn['failures']} failed")
+        print(f"     p99 {cdn['p99_ms']}ms vs {cdn['unhedged_p99_ms']}ms unhedged "
+              f"(saved {cdn['p99_saved_ms']}ms), hedge delay {cdn['hedge_delay_ms']}ms")
+    if report['errors']:
+        print("\nErrors:")
+        for cause, count in report['errors'].items():
+            print(f"  {count:>5}  {cause}")
+
+def wait_for(url: str, timeout: float, name: str):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if requests.get(url, timeout=2).status_code == 200:
+                return
+        except requests.RequestException:
+            pass
+        time.sleep(0.5)
+    raise SystemExit(f"{name} did not become ready at {url} within {timeout:.0f}s")
+
+def spawn_servers(args) -> list:
+    """Start the fake and the API pointed at it; returns the processes to stop afterwards"""
+    fake_port = int(args.fake.rsplit(":", 1)[1])
+    api_port = int(args.api.rsplit(":", 1)[1])
+    fake = subprocess.Popen([sys.executable, os.path.join(ROOT, "loadtest", "fake_aryeo.py"), "--port", str(fake_port)])
+    env = dict(os.environ,
+               BASE_URL=args.fake, LOGIN_URL=f"{args.fake}/login", CDN_ORIGIN=f"{args.fake}/cdn",
+               ALLOWED_LISTING_DOMAIN=args.fake.split("//", 1)[1].split(":")[0],
+               CLIENT_ID_TRUSTED_PROXIES="127.0.0.1",
+               ARYEO_EMAIL=os.environ.get("ARYEO_EMAIL", "load@example.com"),
+               ARYEO_PASSWORD=os.environ.get("ARYEO_PASSWORD", "load"))
+    api = subprocess.Popen([sys.executable, "-m", "uvicorn", "myapp:app", "--port", str(api_port),
+                            "--log-level", "warning"], cwd=ROOT, env=env)
+    processes = [fake, api]
+    try:
+        wait_for(f"{args.fake}/login", 30, "Fake Aryeo")
+        wait_for(f"{args.api}/ready", 120, "API")
+    except SystemExit:
+        stop(processes)
+        raise
+    return processes
+
+def stop(processes: list):
+    for process in processes:
+        process.terminate()
+    for process in processes:
+        try:
+            process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            process.kill()
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Concurrent scrape/generate load test")
+    parser.add_argument("--api", default="http://127.0.0.1:8000")
+    parser.add_argument("--fake", default="http://127.0.0.1:8100", help="fake Aryeo base URL")
+    parser.add_argument("--spawn", action="store_true", help="start the fake and the API for this run")
+    parser.add_argument("--sessions", type=int, default=20)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--timeout", type=float, default=300, help="per-request timeout in seconds")
+    parser.add_argument("--images", type=int, default=25, help="photos per fake listing")
+    parser.add_argument("--lazy", type=int, default=0, help="photos that lazy-load on scroll")
+    parser.add_argument("--styles", type=int, default=0, help="photos shown as inline-style backgrounds")
+    parser.add_argument("--media-api", action="store_true", help="photos come from a JSON media listing")
+    parser.add_argument("--delay", type=int, default=0, help="download-center latency in ms")
+    parser.add_argument("--cdn-delay", type=int, default=0, help="CDN latency per image in ms")
+    parser.add_argument("--cdn-tail", type=int, default=0, help="percentage of CDN responses that are slow")
+    parser.add_argument("--json", dest="json_out", help="also write the report to this file")
+    args = parser.parse_args(argv)
+
+    processes = spawn_servers(args) if args.spawn else []
+    try:
+        report = LoadRun(args).run()
+    finally:
+        stop(processes)
+
+    print_report(report)
+    if args.json_out:
+        with open(args.json_out, "w") as f:
+            json.dump(report, f, indent=2)
+    return 0 if report['completed'] else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,31 +1,78 @@
-from fastapi import FastAPI, HTTPException
-from fastapi.responses import JSONResponse
+from __future__ import annotations
+
+from fastapi import FastAPI, HTTPException, BackgroundTasks, Request
+from fastapi.responses import JSONResponse, PlainTextResponse, FileResponse, StreamingResponse
 from fastapi.staticfiles import StaticFiles
-from pydantic import BaseModel, HttpUrl, field_validator
-from typing import List, Optional, Dict
-import uvicorn
-from selenium import webdriver
-from selenium.webdriver.common.by import By
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
+from pydantic import BaseModel, HttpUrl, field_validator, model_validator
+from typing import List, Optional, Dict, Tuple, TYPE_CHECKING
 from fastapi.middleware.cors import CORSMiddleware 
-from selenium.webdriver.chrome.options import Options
-from selenium.common.exceptions import TimeoutException, WebDriverException
-from selenium.webdriver.chrome.service import Service
+import importlib
 import time
 import re
 import os
-import requests
 from urllib.parse import urlparse, urlunparse, ParseResult
-from PIL import Image, ImageDraw, ImageFont, ImageEnhance, ImageFilter
 import io
 import base64
 from datetime import datetime, timedelta
 import logging
+import logging.handlers
+import queue
+import uuid
+import contextvars
+import cProfile
+import pstats
+import hmac
+import math
+import sys
+import tracemalloc
+from collections import deque
+import asyncio
+import heapq
+import threading
+import sqlite3
+import json
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from bisect import bisect_left
+from contextlib import contextmanager, asynccontextmanager
 from functools import lru_cache
 import hashlib
 import zipfile
+import struct
+import zlib
 import shutil
+import tempfile
+import random
+from concurrent.futures import Future, ThreadPoolExecutor, FIRST_COMPLETED, wait as wait_futures
+
+class LazyModule:
+    """Module proxy that imports the real module on first attribute access"""
+
+    def __init__(self, name: str):
+        self._name = name
+        self._module = None
+        self._lock = threading.Lock()
+
+    def _load(self):
+        with self._lock:
+            if self._module is None:
+                self._module = importlib.import_module(self._name)
+        return self._module
+
+    def __getattr__(self, attr: str):
+        return getattr(self._module or self._load(), attr)
+
+# Heavy modules load on first use; Selenium is imported inside the driver helpers
+requests = LazyModule("requests")
+np = LazyModule("numpy")
+Image = LazyModule("PIL.Image")
+ImageDraw = LazyModule("PIL.ImageDraw")
+ImageFont = LazyModule("PIL.ImageFont")
+ImageEnhance = LazyModule("PIL.ImageEnhance")
+ImageFilter = LazyModule("PIL.ImageFilter")
+
+if TYPE_CHECKING:
+    from selenium import webdriver
 
 # Setup logging
 logging.basicConfig(level=logging.INFO)
@@ -44,20 +91,835 @@ app.add_middleware(
     allow_headers=["*"],  # Allows all headers
 )
 
-# Configuration - CREDENTIALS FROM DOCUMENT 2
-EMAIL = "john@moshinremedia.com"
-PASSWORD = "Madmax1993"
-BASE_URL = "https://moshin-real-estate-media.aryeo.com"
-LOGIN_URL = "https://app.aryeo.com/login"
+# Configuration - Aryeo login comes from the environment only; scrapes fail until it is set
+# BASE_URL, LOGIN_URL, CDN_ORIGIN and ALLOWED_LISTING_DOMAIN can point at loadtest/fake_aryeo.py
+EMAIL = os.getenv("ARYEO_EMAIL", "")
+PASSWORD = os.getenv("ARYEO_PASSWORD", "")
+BASE_URL = os.getenv("BASE_URL", "https://moshin-real-estate-media.aryeo.com")
+LOGIN_URL = os.getenv("LOGIN_URL", "https://app.aryeo.com/login")
+ALLOWED_LISTING_DOMAIN = os.getenv("ALLOWED_LISTING_DOMAIN", "aryeo.com")
 
 # Session management with TTL
 SESSION_TTL = timedelta(hours=2)
-sessions: Dict[str, dict] = {}
+SESSION_MAX = int(os.getenv("SESSION_MAX", "1000"))
+SESSION_REAP_INTERVAL = float(os.getenv("SESSION_REAP_INTERVAL", "30"))
+# "memory" keeps sessions per process, "sqlite" shares them between workers on a host
+SESSION_BACKEND = os.getenv("SESSION_BACKEND", "memory")
+SESSION_DB_PATH = os.getenv("SESSION_DB_PATH", os.path.join(os.getcwd(), "sessions.db"))
+WORKERS = int(os.getenv("WORKERS", "1"))
+
+# Request tracing - spans go to a rotating JSONL file and a small in-memory buffer
+TRACE_FILE = os.getenv("TRACE_FILE", os.path.join(os.getcwd(), "traces", "spans.jsonl"))
+TRACE_FILE_MAX_BYTES = int(os.getenv("TRACE_FILE_MAX_BYTES", str(20 * 1024 * 1024)))
+TRACE_FILE_BACKUPS = int(os.getenv("TRACE_FILE_BACKUPS", "5"))
+TRACE_MEMORY_TRACES = int(os.getenv("TRACE_MEMORY_TRACES", "200"))
+TRACE_SKIP_PATHS = {"/health", "/ready", "/metrics"}
+
+# Blocking work runs on dedicated pools so the event loop stays responsive
+SCRAPE_WORKERS = int(os.getenv("SCRAPE_WORKERS", "4"))
+RENDER_WORKERS = int(os.getenv("RENDER_WORKERS", str(os.cpu_count() or 2)))
+STORE_WORKERS = int(os.getenv("STORE_WORKERS", "4"))
+
+# Admission control - concurrent slots, bounded wait queue and per-client queue cap
+SCRAPE_CONCURRENCY = int(os.getenv("SCRAPE_CONCURRENCY", str(SCRAPE_WORKERS)))
+SCRAPE_QUEUE_SIZE = int(os.getenv("SCRAPE_QUEUE_SIZE", "8"))
+RENDER_CONCURRENCY = int(os.getenv("RENDER_CONCURRENCY", str(RENDER_WORKERS)))
+RENDER_QUEUE_SIZE = int(os.getenv("RENDER_QUEUE_SIZE", "32"))
+ADMISSION_CLIENT_QUEUE_SIZE = int(os.getenv("ADMISSION_CLIENT_QUEUE_SIZE", "4"))
+ADMISSION_QUEUE_TIMEOUT = float(os.getenv("ADMISSION_QUEUE_TIMEOUT", "30"))
+# X-Client-Id is only trusted from these addresses (e.g. the agency gateway); others are keyed by address
+CLIENT_ID_TRUSTED_PROXIES = {ip.strip() for ip in os.getenv("CLIENT_ID_TRUSTED_PROXIES", "").split(",") if ip.strip()}
+# Batch and carousel renders retry a full render queue, but give up after this long
+RENDER_SLOT_MAX_WAIT = float(os.getenv("RENDER_SLOT_MAX_WAIT", "120"))
+
+# Batch generation streams a ZIP; at most BATCH_WINDOW posts are held in memory
+BATCH_MAX_JOBS = int(os.getenv("BATCH_MAX_JOBS", "500"))
+BATCH_WINDOW = int(os.getenv("BATCH_WINDOW", str(RENDER_CONCURRENCY)))
+
+# Carousel mode: cover + one slide per photo + closing slide (Instagram allows 20 in total)
+CAROUSEL_MAX_PHOTOS = int(os.getenv("CAROUSEL_MAX_PHOTOS", "18"))
+CAROUSEL_CLOSING_CTA = os.getenv("CAROUSEL_CLOSING_CTA", "Schedule your private showing today")
+
+# Animated slideshow defaults and limits
+SLIDESHOW_FPS = int(os.getenv("SLIDESHOW_FPS", "12"))
+SLIDESHOW_DURATION = float(os.getenv("SLIDESHOW_DURATION", "8"))
+SLIDESHOW_MAX_DURATION = float(os.getenv("SLIDESHOW_MAX_DURATION", "20"))
+SLIDESHOW_SIZE = int(os.getenv("SLIDESHOW_SIZE", "540"))
+SLIDESHOW_WEBP_QUALITY = int(os.getenv("SLIDESHOW_WEBP_QUALITY", "75"))
+# Frames x pixels per animation, in megapixels (a 1080px frame is 1.17). Encoder memory grows with it -
+# roughly 1.4 MB per megapixel for WebP and 4 MB for GIF, whose writer keeps every palettised frame
+SLIDESHOW_MAX_MEGAPIXELS = {
+    'webp': float(os.getenv("SLIDESHOW_WEBP_MAX_MEGAPIXELS", "120")),
+    'gif': float(os.getenv("SLIDESHOW_GIF_MAX_MEGAPIXELS", "30")),
+}
+
+# Interactive previews: the post at reduced scale, cheap resampling, no enhancement, fast JPEG
+PREVIEW_SCALE = float(os.getenv("PREVIEW_SCALE", "0.5"))
+PREVIEW_JPEG_QUALITY = int(os.getenv("PREVIEW_JPEG_QUALITY", "70"))
+PREVIEW_TILE_CACHE_SIZE = int(os.getenv("PREVIEW_TILE_CACHE_SIZE", "128"))
+
+# Tile enhancement presets. contrast and sharpness are ImageEnhance factors, brightness and gamma
+# tone tweaks (1.0 = unchanged), warmth shifts red up and blue down (0.0 = unchanged). ENHANCE_PRESETS
+# is JSON replacing or adding presets, e.g. {"hero": {"contrast": 1.15, "sharpness": 1.1, "warmth": 0.03}}
+ENHANCE_DEFAULTS = {'contrast': 1.0, 'sharpness': 1.0, 'brightness': 1.0, 'gamma': 1.0, 'warmth': 0.0}
+ENHANCE_PRESETS = {name: {**ENHANCE_DEFAULTS, **params} for name, params in {
+    'hero': {'contrast': 1.1, 'sharpness': 1.1},
+    'detail': {'contrast': 1.1},
+    'slide': {'contrast': 1.1},
+    **json.loads(os.getenv("ENHANCE_PRESETS", "{}")),
+}.items()}
+_unknown_enhancements = {key for params in ENHANCE_PRESETS.values() for key in params} - set(ENHANCE_DEFAULTS)
+if _unknown_enhancements:
+    raise ValueError(f"Unknown ENHANCE_PRESETS parameters: {sorted(_unknown_enhancements)}")
+
+# Live-edit sessions hold a canvas and its tiles in this process's memory
+EDIT_SESSION_TTL = float(os.getenv("EDIT_SESSION_TTL", "900"))
+EDIT_SESSION_MAX = int(os.getenv("EDIT_SESSION_MAX", "32"))
+
+# On-demand profiling - disabled unless an admin token is configured
+PROFILE_ADMIN_TOKEN = os.getenv("PROFILE_ADMIN_TOKEN")
+PROFILE_DIR = os.getenv("PROFILE_DIR", os.path.join(os.getcwd(), "profiles"))
+PROFILE_SAMPLE_INTERVAL = float(os.getenv("PROFILE_SAMPLE_INTERVAL", "0.005"))
+
+# Memory accounting - MEMORY_TRACE is "off", "on" (tracemalloc deltas per stage)
+# or "snapshot" (also diff tracemalloc snapshots around each stage)
+MEMORY_TRACE = os.getenv("MEMORY_TRACE", "off")
+MEMORY_REQUEST_THRESHOLD_MB = float(os.getenv("MEMORY_REQUEST_THRESHOLD_MB", "100"))
+MEMORY_RSS_THRESHOLD_MB = float(os.getenv("MEMORY_RSS_THRESHOLD_MB", "2048"))
+
+# Durable catalogue of every scraped listing
+CATALOGUE_DB_PATH = os.getenv("CATALOGUE_DB_PATH", os.path.join(os.getcwd(), "catalogue.db"))
+
+# CDN fetches share one keep-alive pool (see http_client)
+HTTP_POOL_SIZE = int(os.getenv("HTTP_POOL_SIZE", "32"))
+CDN_ORIGIN = os.getenv("CDN_ORIGIN", "https://cdn.aryeo.com")
+# Resize variants the CDN serves as name:width; images are fetched at the smallest one covering their slot
+CDN_VARIANTS = dict(sorted(
+    ((name, int(width)) for name, width in
+     (item.split(":") for item in os.getenv("CDN_VARIANTS", "thumbnail:320,medium:800,large:1600").split(","))),
+    key=lambda variant: variant[1]
+))
+# Width/height assumed for a variant before it is downloaded
+CDN_VARIANT_ASPECT = float(os.getenv("CDN_VARIANT_ASPECT", "1.5"))
+# Each CDN fetch gets a time budget; a slow first request is hedged with a duplicate after the
+# p95 time-to-headers (clamped), counted from when it started rather than when it was queued, and
+# only into an idle CDN worker for at most CDN_HEDGE_MAX_SHARE of fetches. Failures are retried
+# with jittered backoff while budget remains
+CDN_FETCH_BUDGET = float(os.getenv("CDN_FETCH_BUDGET", "15"))
+CDN_CONNECT_TIMEOUT = float(os.getenv("CDN_CONNECT_TIMEOUT", "3.05"))
+CDN_HEDGE = os.getenv("CDN_HEDGE", "true").lower() == "true"
+CDN_HEDGE_MIN_DELAY = float(os.getenv("CDN_HEDGE_MIN_DELAY", "0.05"))
+CDN_HEDGE_MAX_DELAY = float(os.getenv("CDN_HEDGE_MAX_DELAY", "2"))
+CDN_HEDGE_DEFAULT_DELAY = float(os.getenv("CDN_HEDGE_DEFAULT_DELAY", "0.5"))
+CDN_HEDGE_MIN_SAMPLES = 20
+CDN_HEDGE_MAX_SHARE = float(os.getenv("CDN_HEDGE_MAX_SHARE", "0.1"))
+CDN_RETRY_BACKOFF = float(os.getenv("CDN_RETRY_BACKOFF", "0.1"))
+CDN_MAX_RETRIES = int(os.getenv("CDN_MAX_RETRIES", "3"))
+CDN_READ_CHUNK_SIZE = 64 * 1024
+
+# Startup warm-up, tracked by /ready
+WARMUP_ENABLED = os.getenv("WARMUP_ENABLED", "true").lower() == "true"
+WARMUP_TIMEOUT = float(os.getenv("WARMUP_TIMEOUT", "120"))
+WARMUP_CDN_CONNECTIONS = int(os.getenv("WARMUP_CDN_CONNECTIONS", "4"))
+WARMUP_PRELOGIN = os.getenv("WARMUP_PRELOGIN", "false").lower() == "true"
+
+# Pre-launched Chrome instances reused across scrapes (0 disables pooling)
+DRIVER_POOL_SIZE = int(os.getenv("DRIVER_POOL_SIZE", "0"))
+DRIVER_MAX_USES = int(os.getenv("DRIVER_MAX_USES", "20"))
+DRIVER_LOGIN_TTL = float(os.getenv("DRIVER_LOGIN_TTL", "1800"))
+
+FRONTEND_DIR = os.getenv("FRONTEND_DIR", "frontend/build")
+
+# Auto selection - images are scored on small proxies, fetched in parallel
+AUTO_SELECT_PROXY_SIZE = (128, 96)
+AUTO_SELECT_WORKERS = 16
+proxy_executor = ThreadPoolExecutor(max_workers=AUTO_SELECT_WORKERS, thread_name_prefix="proxy")
+
+# Managed on-disk stores: downloads (archive originals, Chrome downloads) and scrape failure artifacts
+DOWNLOAD_DIR = os.getenv("DOWNLOAD_DIR", os.path.join(os.getcwd(), "downloads"))
+DOWNLOAD_MAX_BYTES = int(float(os.getenv("DOWNLOAD_MAX_MB", "2048")) * 1024 * 1024)
+DOWNLOAD_MAX_AGE = float(os.getenv("DOWNLOAD_MAX_AGE", str(7 * 86400)))
+DEBUG_DIR = os.getenv("DEBUG_DIR", os.path.join(os.getcwd(), "debug"))
+DEBUG_MAX_BYTES = int(float(os.getenv("DEBUG_MAX_MB", "256")) * 1024 * 1024)
+DEBUG_MAX_AGE = float(os.getenv("DEBUG_MAX_AGE", str(3 * 86400)))
+BLOB_SWEEP_INTERVAL = int(os.getenv("BLOB_SWEEP_INTERVAL", "300"))
+
+# Optional bulk ingestion of originals from the listing's download-center archive
+ARCHIVE_INGEST = os.getenv("ARCHIVE_INGEST", "false").lower() == "true"
+ARCHIVE_LINK_SELECTOR = os.getenv("ARCHIVE_LINK_SELECTOR", 'a[href$=".zip"], a[href*=".zip?"], a[download]')
+ARCHIVE_CHUNK_SIZE = int(os.getenv("ARCHIVE_CHUNK_SIZE", str(256 * 1024)))
+ARCHIVE_TIMEOUT = float(os.getenv("ARCHIVE_TIMEOUT", "300"))
+ARCHIVE_IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.webp', '.tif', '.tiff')
+archive_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="archive")
+
+# Scrape extraction: "network" reads image URLs off Chrome's network log (DOM scan as fallback), "dom" only scans
+SCRAPE_MODE = os.getenv("SCRAPE_MODE", "network")
+NETWORK_HARVEST_TIMEOUT = float(os.getenv("NETWORK_HARVEST_TIMEOUT", "20"))
+NETWORK_IDLE_SECONDS = float(os.getenv("NETWORK_IDLE_SECONDS", "1"))
+MEDIA_API_PATTERN = re.compile(os.getenv("MEDIA_API_PATTERN", r"/(?:media|photos|images)(?:/|$)"))
+
+# ============================================================================
+# METRICS
+# ============================================================================
+
+class Metric:
+    """Base for Prometheus-style metrics with optional labels"""
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self._values: Dict[tuple, object] = {}
+        self._lock = threading.Lock()
+        metrics_registry.append(self)
+
+    def _key(self, labels: dict) -> tuple:
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    @staticmethod
+    def _format_labels(names: tuple, values: tuple, extra: str = "") -> str:
+        pairs = [f'{name}="{value}"' for name, value in zip(names, values)]
+        if extra:
+            pairs.append(extra)
+        return "{" + ",".join(pairs) + "}" if pairs else ""
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            return [f"{self.name}{self._format_labels(self.labelnames, key)} {value}"
+                    for key, value in self._values.items()]
+
+    def render(self) -> str:
+        header = f"# HELP {self.name} {self.documentation}\n# TYPE {self.name} {self.kind}\n"
+        return header + "".join(line + "\n" for line in self.samples())
+
+class Counter(Metric):
+    kind = "counter"
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+class Gauge(Metric):
+    kind = "gauge"
+
+    def set(self, value: float, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount: float = 1, **labels):
+        self.inc(-amount, **labels)
+
+    @contextmanager
+    def track_inprogress(self, **labels):
+        self.inc(**labels)
+        try:
+            yield
+        finally:
+            self.dec(**labels)
+
+class Histogram(Metric):
+    kind = "histogram"
+    DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple = (), buckets: tuple = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                # Per-bucket (non-cumulative) counts, then sum and count
+                state = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            state[0][index] += 1
+            state[1] += value
+            state[2] += 1
+
+    def samples(self) -> List[str]:
+        lines = []
+        with self._lock:
+            for key, (counts, total, count) in self._values.items():
+                cumulative = 0
+                for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                    cumulative += bucket_count
+                    le = "+Inf" if bound == float("inf") else repr(bound)
+                    labels = self._format_labels(self.labelnames, key, 'le="' + le + '"')
+                    lines.append(f"{self.name}_bucket{labels} {cumulative}")
+                lines.append(f"{self.name}_sum{self._format_labels(self.labelnames, key)} {total}")
+                lines.append(f"{self.name}_count{self._format_labels(self.labelnames, key)} {count}")
+        return lines
+
+metrics_registry: List[Metric] = []
+
+STAGE_SECONDS = Histogram("aryeo_stage_duration_seconds", "Latency of each pipeline stage", ("stage",))
+CACHE_REQUESTS = Counter("aryeo_cache_requests_total", "Cache lookups by cache and result", ("cache", "result"))
+RETRIES = Counter("aryeo_retries_total", "Retried operations", ("operation",))
+TIMEOUTS = Counter("aryeo_timeouts_total", "Operations that hit a timeout", ("operation",))
+IN_FLIGHT = Gauge("aryeo_in_flight", "Requests currently being processed", ("operation",))
+STAGE_ALLOCATED = Histogram("aryeo_stage_allocated_bytes", "Net traced allocation of each stage (MEMORY_TRACE only)",
+                            ("stage",), buckets=tuple(2 ** n for n in range(16, 32, 2)))
+PROCESS_RSS = Gauge("aryeo_process_rss_bytes", "Resident memory of the API process and its child processes", ("process",))
+CACHE_BYTES = Gauge("aryeo_cache_bytes", "Approximate bytes held by each cache", ("cache",))
+GENERATE_PEAK = Histogram("aryeo_generate_peak_bytes", "Peak memory growth of each /generate",
+                          buckets=tuple(2 ** n for n in range(20, 32)))
+ADMISSION_ACTIVE = Gauge("aryeo_admission_active", "Admitted requests holding a slot", ("pool",))
+ADMISSION_QUEUED = Gauge("aryeo_admission_queued", "Requests waiting for a slot", ("pool",))
+ADMISSION_REJECTIONS = Counter("aryeo_admission_rejections_total", "Requests turned away", ("pool", "reason"))
+ADMISSION_WAIT = Histogram("aryeo_admission_wait_seconds", "Time spent queued before admission", ("pool",))
+BLOB_STORE_BYTES = Gauge("aryeo_blob_store_bytes", "Bytes held by each managed disk store", ("store",))
+BLOB_EVICTIONS = Counter("aryeo_blob_evictions_total", "Files evicted from disk stores", ("store", "reason"))
+SCRAPE_EXTRACTIONS = Counter("aryeo_scrape_extractions_total", "Scrapes by the path that found their images", ("method",))
+CDN_VARIANT_BYTES = Counter("aryeo_cdn_variant_bytes_total", "Image bytes downloaded from the CDN by resize variant",
+                            ("variant",))
+CDN_VARIANT_SAVED = Counter("aryeo_cdn_variant_bytes_saved_total",
+                            "Estimated bytes not downloaded by fetching a smaller variant than the URL named", ("variant",))
+CDN_VARIANT_FALLBACKS = Counter("aryeo_cdn_variant_fallbacks_total", "Variant fetches that failed over to a larger one",
+                                ("variant",))
+CDN_FETCHES = Counter("aryeo_cdn_fetches_total", "CDN fetches by which request answered", ("outcome",))
+CDN_HEDGES = Counter("aryeo_cdn_hedges_total", "Duplicate CDN requests sent because the first was slow")
+IMAGES_FOUND = Histogram("aryeo_images_found_per_listing", "Images found per scraped listing",
+                         buckets=(0, 5, 10, 20, 30, 50, 75, 100, 150, 250))
+
+@contextmanager
+def pipeline_stage(stage: str, **attributes):
+    """Time a pipeline stage into STAGE_SECONDS and record it as a trace span"""
+    start = time.perf_counter()
+    try:
+        with trace_span(stage, **attributes) as span:
+            if tracemalloc.is_tracing():
+                with stage_memory(stage, span):
+                    yield
+            else:
+                yield
+    finally:
+        STAGE_SECONDS.observe(time.perf_counter() - start, stage=stage)
+
+def render_metrics() -> str:
+    """All metrics in the Prometheus text exposition format"""
+    return "".join(metric.render() for metric in metrics_registry)
+
+# ============================================================================
+# TRACING
+# ============================================================================
+
+current_trace_id: contextvars.ContextVar = contextvars.ContextVar("current_trace_id", default=None)
+current_span_id: contextvars.ContextVar = contextvars.ContextVar("current_span_id", default=None)
+
+recent_traces: "OrderedDict[str, List[dict]]" = OrderedDict()
+recent_traces_lock = threading.Lock()
+
+# JSONL span log; nothing is written until start_span_writer() runs at startup
+span_logger = logging.getLogger("aryeo.spans")
+span_logger.setLevel(logging.INFO)
+span_logger.propagate = False
+span_listener: Optional[logging.handlers.QueueListener] = None
+
+def start_span_writer():
+    """Append spans to TRACE_FILE from a listener thread, off the request path"""
+    global span_listener
+    if span_listener is not None:
+        return
+    os.makedirs(os.path.dirname(TRACE_FILE), exist_ok=True)
+    file_handler = logging.handlers.RotatingFileHandler(
+        TRACE_FILE, maxBytes=TRACE_FILE_MAX_BYTES, backupCount=TRACE_FILE_BACKUPS, encoding="utf-8"
+    )
+    file_handler.setFormatter(logging.Formatter("%(message)s"))
+    span_queue: queue.Queue = queue.Queue(-1)
+    span_listener = logging.handlers.QueueListener(span_queue, file_handler)
+    span_listener.start()
+    span_logger.addHandler(logging.handlers.QueueHandler(span_queue))
+
+def stop_span_writer():
+    """Flush queued spans and close the file"""
+    global span_listener
+    if span_listener is None:
+        return
+    for handler in list(span_logger.handlers):
+        span_logger.removeHandler(handler)
+    span_listener.stop()
+    for handler in span_listener.handlers:
+        handler.close()
+    span_listener = None
+
+def export_span(span: dict):
+    """Keep the span for the debug endpoint and append it to the JSONL file"""
+    with recent_traces_lock:
+        spans = recent_traces.get(span['trace_id'])
+        if spans is None:
+            spans = recent_traces[span['trace_id']] = []
+            while len(recent_traces) > TRACE_MEMORY_TRACES:
+                recent_traces.popitem(last=False)
+        spans.append(span)
+    span_logger.info(json.dumps(span, default=str))
+
+@contextmanager
+def trace_span(name: str, **attributes):
+    """
+    Record a nested span under the current trace; a no-op outside a trace.
+
+    Yields the span's attribute dict so callers can annotate it.
+    """
+    trace_id = current_trace_id.get()
+    if trace_id is None:
+        yield attributes
+        return
+
+    span_id = uuid.uuid4().hex[:16]
+    parent_id = current_span_id.get()
+    token = current_span_id.set(span_id)
+    start_wall = time.time()
+    start = time.perf_counter()
+    status = "ok"
+    try:
+        yield attributes
+    except BaseException as e:
+        status = "error"
+        attributes['error'] = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        current_span_id.reset(token)
+        export_span({
+            'trace_id': trace_id,
+            'span_id': span_id,
+            'parent_id': parent_id,
+            'name': name,
+            'start': start_wall,
+            'duration_ms': round((time.perf_counter() - start) * 1000, 3),
+            'status': status,
+            'thread': threading.current_thread().name,
+            'attributes': attributes,
+        })
+
+def load_trace(trace_id: str) -> List[dict]:
+    """Spans of a trace from memory, falling back to the JSONL files"""
+    with recent_traces_lock:
+        spans = list(recent_traces.get(trace_id, []))
+    if spans:
+        return spans
+    for path in [TRACE_FILE] + [f"{TRACE_FILE}.{n}" for n in range(1, TRACE_FILE_BACKUPS + 1)]:
+        if not os.path.exists(path):
+            continue
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                if trace_id in line:
+                    span = json.loads(line)
+                    if span['trace_id'] == trace_id:
+                        spans.append(span)
+    return spans
+
+def build_span_tree(spans: List[dict]) -> List[dict]:
+    """Nest spans under their parents, children ordered by start time"""
+    nodes = {span['span_id']: {**span, 'children': []} for span in sorted(spans, key=lambda s: s['start'])}
+    roots = []
+    for node in nodes.values():
+        parent = nodes.get(node['parent_id'])
+        (parent['children'] if parent else roots).append(node)
+    return roots
+
+def render_waterfall(roots: List[dict], width: int = 60) -> str:
+    """Text waterfall of a span tree, one bar per span"""
+    if not roots:
+        return ""
+    origin = min(root['start'] for root in roots)
+    total_ms = max((root['start'] - origin) * 1000 + root['duration_ms'] for root in roots) or 1.0
+    lines = []
+
+    def walk(node: dict, depth: int):
+        offset_ms = (node['start'] - origin) * 1000
+        begin = int(offset_ms / total_ms * width)
+        length = max(1, int(node['duration_ms'] / total_ms * width))
+        bar = " " * begin + "#" * min(length, width - begin)
+        label = ("  " * depth + node['name'])[:40]
+        marker = " !" if node['status'] == "error" else ""
+        lines.append(f"{label:<40} |{bar:<{width}}| {offset_ms:9.1f}ms +{node['duration_ms']:9.1f}ms{marker}")
+        for child in node['children']:
+            walk(child, depth + 1)
+
+    for root in roots:
+        walk(root, 0)
+    return "\n".join(lines)
+
+# ============================================================================
+# PROFILING
+# ============================================================================
+
+current_profile: contextvars.ContextVar = contextvars.ContextVar("current_profile", default=None)
+profile_lock = asyncio.Lock()
+
+class ProfileSession:
+    """
+    Profiles one request across the event loop and any worker threads it uses.
+
+    Each participating thread runs under its own deterministic cProfile
+    profiler (merged into one pstats file at the end), while a sampler thread
+    folds the stacks of those threads into flamegraph-ready collapsed format.
+
+    From Python 3.12 cProfile sits on sys.monitoring, which allows one active
+    profiler per process; it then records every thread, and threads that
+    can't enable their own are covered by it and the sampler alone.
+    """
+
+    def __init__(self, profile_id: str):
+        self.profile_id = profile_id
+        self.path = os.path.join(PROFILE_DIR, profile_id)
+        self.started_at = time.time()
+        self.profilers: List[cProfile.Profile] = []
+        self.sampled_only = 0
+        self.samples: Dict[str, int] = {}
+        self.threads: set = set()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._sampler = threading.Thread(target=self._sample_loop, name=f"profiler-{profile_id}", daemon=True)
+
+    def start(self):
+        self._sampler.start()
+
+    @contextmanager
+    def profile_thread(self):
+        """Run the calling thread under cProfile and the sampler"""
+        profiler = cProfile.Profile()
+        ident = threading.get_ident()
+        with self._lock:
+            self.threads.add(ident)
+        try:
+            profiler.enable()
+        except ValueError:
+            # "Another profiling tool is already active" (Python 3.12+)
+            profiler = None
+        try:
+            yield
+        finally:
+            if profiler is not None:
+                profiler.disable()
+            with self._lock:
+                self.threads.discard(ident)
+                if profiler is not None:
+                    self.profilers.append(profiler)
+                else:
+                    self.sampled_only += 1
+
+    @staticmethod
+    def _fold(frame) -> str:
+        stack = []
+        while frame is not None:
+            code = frame.f_code
+            stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+            frame = frame.f_back
+        return ";".join(reversed(stack))
+
+    def _sample_loop(self):
+        while not self._stop.wait(PROFILE_SAMPLE_INTERVAL):
+            with self._lock:
+                threads = list(self.threads)
+            frames = sys._current_frames()
+            for ident in threads:
+                frame = frames.get(ident)
+                if frame is not None:
+                    stack = self._fold(frame)
+                    self.samples[stack] = self.samples.get(stack, 0) + 1
+
+    def finish(self) -> dict:
+        """Stop sampling and write profile.pstats and stacks.collapsed"""
+        self._stop.set()
+        self._sampler.join()
+        os.makedirs(self.path, exist_ok=True)
+        with self._lock:
+            profilers = list(self.profilers)
+        if profilers:
+            stats = pstats.Stats(profilers[0])
+            for profiler in profilers[1:]:
+                stats.add(profiler)
+            stats.dump_stats(os.path.join(self.path, "profile.pstats"))
+        with open(os.path.join(self.path, "stacks.collapsed"), "w", encoding="utf-8") as f:
+            for stack, count in sorted(self.samples.items()):
+                f.write(f"{stack} {count}\n")
+        summary = {
+            'profile_id': self.profile_id,
+            'started_at': datetime.fromtimestamp(self.started_at).isoformat(),
+            'duration_ms': round((time.time() - self.started_at) * 1000, 1),
+            'threads_profiled': len(profilers),
+            'threads_sampled_only': self.sampled_only,
+            'samples': sum(self.samples.values()),
+        }
+        with open(os.path.join(self.path, "summary.json"), "w", encoding="utf-8") as f:
+            json.dump(summary, f)
+        return summary
+
+def profiling_requested(request: Request) -> bool:
+    return request.headers.get("X-Profile", "").lower() in ("1", "true") or \
+        request.query_params.get("profile", "").lower() in ("1", "true")
+
+def is_admin(request: Request) -> bool:
+    token = request.headers.get("X-Admin-Token") or request.query_params.get("admin_token") or ""
+    return bool(PROFILE_ADMIN_TOKEN) and hmac.compare_digest(token.encode(), PROFILE_ADMIN_TOKEN.encode())
+
+# ============================================================================
+# MEMORY
+# ============================================================================
+
+stage_snapshots: deque = deque(maxlen=50)
+heavy_requests: deque = deque(maxlen=50)
+
+def start_memory_tracing():
+    if MEMORY_TRACE in ("on", "snapshot") and not tracemalloc.is_tracing():
+        tracemalloc.start(10 if MEMORY_TRACE == "snapshot" else 1)
+        logger.info(f"tracemalloc enabled ({MEMORY_TRACE})")
+
+@contextmanager
+def stage_memory(stage: str, span: dict):
+    """Record traced allocation (and optionally a snapshot diff) of a stage"""
+    before = tracemalloc.take_snapshot() if MEMORY_TRACE == "snapshot" else None
+    current_before, _ = tracemalloc.get_traced_memory()
+    try:
+        yield
+    finally:
+        current_after, peak = tracemalloc.get_traced_memory()
+        allocated = current_after - current_before
+        span['allocated_bytes'] = allocated
+        STAGE_ALLOCATED.observe(max(allocated, 0), stage=stage)
+        if before is not None:
+            top = tracemalloc.take_snapshot().compare_to(before, "lineno")[:10]
+            stage_snapshots.append({
+                'stage': stage,
+                'at': datetime.now().isoformat(),
+                'allocated_bytes': allocated,
+                'top': [str(stat) for stat in top],
+            })
+
+def _read_rss(pid) -> int:
+    """Resident set size of a process in bytes, 0 if it is gone"""
+    try:
+        with open(f"/proc/{pid}/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return 0
+
+def process_rss() -> int:
+    return _read_rss("self")
+
+def child_processes() -> List[int]:
+    """PIDs of all descendants of this process (chromedriver, Chrome and its helpers)"""
+    children: Dict[int, List[int]] = {}
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat") as f:
+                # The command name may contain spaces, fields resume after the last ')'
+                ppid = int(f.read().rsplit(")", 1)[1].split()[1])
+        except (OSError, ValueError, IndexError):
+            continue
+        children.setdefault(ppid, []).append(int(entry))
+    descendants, pending = [], [os.getpid()]
+    while pending:
+        for child in children.get(pending.pop(), []):
+            descendants.append(child)
+            pending.append(child)
+    return descendants
+
+def memory_report() -> dict:
+    """Process, child-process, cache and tracemalloc memory in one report"""
+    rss = process_rss()
+    children = child_processes() if os.path.isdir("/proc") else []
+    children_rss = sum(_read_rss(pid) for pid in children)
+    PROCESS_RSS.set(rss, process="api")
+    PROCESS_RSS.set(children_rss, process="children")
+    caches = {}
+    for cache in caches_registry:
+        CACHE_BYTES.set(cache.bytes, cache=cache.name)
+        caches[cache.name] = {'entries': len(cache), 'bytes': cache.bytes, 'max_entries': cache.maxsize}
+    report = {
+        'rss_bytes': rss,
+        'children': {'count': len(children), 'rss_bytes': children_rss},
+        'total_rss_bytes': rss + children_rss,
+        'caches': caches,
+        'tracemalloc': None,
+        'heavy_requests': list(heavy_requests),
+        'stage_snapshots': list(stage_snapshots),
+    }
+    if tracemalloc.is_tracing():
+        current, peak = tracemalloc.get_traced_memory()
+        report['tracemalloc'] = {'mode': MEMORY_TRACE, 'current_bytes': current, 'peak_bytes': peak}
+    return report
+
+@contextmanager
+def memory_watch(label: str, report: bool = True):
+    """
+    Measure memory growth of a block of work; yields a dict filled on exit.
+
+    Growth is the larger of the RSS delta and, when tracing, the tracemalloc
+    peak above the starting allocation. Pillow pixel buffers are invisible to
+    tracemalloc, and its peak is process-wide, so treat both as estimates
+    under concurrency. With report set, crossing a threshold is logged.
+    """
+    usage = {'label': label}
+    rss_before = process_rss()
+    traced_before = tracemalloc.get_traced_memory()[0] if tracemalloc.is_tracing() else None
+    if traced_before is not None:
+        tracemalloc.reset_peak()
+    try:
+        yield usage
+    finally:
+        usage['rss_bytes'] = process_rss()
+        usage['rss_delta_bytes'] = usage['rss_bytes'] - rss_before
+        usage['peak_bytes'] = max(usage['rss_delta_bytes'], 0)
+        if traced_before is not None:
+            usage['peak_bytes'] = max(usage['peak_bytes'], tracemalloc.get_traced_memory()[1] - traced_before)
+        if report and (usage['peak_bytes'] > MEMORY_REQUEST_THRESHOLD_MB * 1024 * 1024
+                or usage['rss_bytes'] > MEMORY_RSS_THRESHOLD_MB * 1024 * 1024):
+            usage['at'] = datetime.now().isoformat()
+            usage['trace_id'] = current_trace_id.get()
+            heavy_requests.append(usage)
+            logger.warning(f"🧠 {label} crossed memory threshold: peak +{usage['peak_bytes'] / 1048576:.1f}MB, "
+                           f"RSS {usage['rss_bytes'] / 1048576:.1f}MB")
+
+# ============================================================================
+# WORKER POOLS
+# ============================================================================
+
+scrape_executor = ThreadPoolExecutor(max_workers=SCRAPE_WORKERS, thread_name_prefix="scrape")
+render_executor = ThreadPoolExecutor(max_workers=RENDER_WORKERS, thread_name_prefix="render")
+# Session and catalogue SQLite calls can wait on the database lock for seconds
+store_executor = ThreadPoolExecutor(max_workers=STORE_WORKERS, thread_name_prefix="store")
+
+def _call_in_worker(fn, *args):
+    session = current_profile.get()
+    if session is None:
+        return fn(*args)
+    with session.profile_thread():
+        return fn(*args)
+
+async def run_in_worker(executor: ThreadPoolExecutor, fn, *args):
+    """Run blocking work on a pool, carrying the trace and profile context along"""
+    context = contextvars.copy_context()
+    return await asyncio.get_running_loop().run_in_executor(executor, context.run, _call_in_worker, fn, *args)
 
-# Downloads dir
-DOWNLOAD_DIR = os.path.join(os.getcwd(), "downloads")
-if not os.path.exists(DOWNLOAD_DIR):
-    os.makedirs(DOWNLOAD_DIR)
+# ============================================================================
+# ADMISSION CONTROL
+# ============================================================================
+
+class AdmissionController:
+    """
+    Concurrency limit with a bounded wait queue and per-client fairness.
+
+    Waiters sit in one FIFO per client and freed slots are handed out
+    round-robin across clients, so one client's batch only ever fills its own
+    queue. Full queues are rejected immediately with a Retry-After estimate
+    based on how long slots are typically held.
+    """
+
+    def __init__(self, name: str, limit: int, max_queue: int, max_queue_per_client: int, queue_timeout: float):
+        self.name = name
+        self.limit = limit
+        self.max_queue = max_queue
+        self.max_queue_per_client = max_queue_per_client
+        self.queue_timeout = queue_timeout
+        self.active = 0
+        self.queued = 0
+        self._queues: "OrderedDict[str, deque]" = OrderedDict()
+        self._avg_hold = 5.0
+
+    def retry_after(self) -> int:
+        return max(1, math.ceil(self._avg_hold * (self.queued + 1) / self.limit))
+
+    def _reject(self, status_code: int, reason: str, detail: str):
+        ADMISSION_REJECTIONS.inc(pool=self.name, reason=reason)
+        logger.warning(f"🚦 {self.name} admission rejected ({reason}): {self.active} active, {self.queued} queued")
+        raise HTTPException(status_code=status_code, detail=detail, headers={"Retry-After": str(self.retry_after())})
+
+    def _update_gauges(self):
+        ADMISSION_ACTIVE.set(self.active, pool=self.name)
+        ADMISSION_QUEUED.set(self.queued, pool=self.name)
+
+    def _dispatch(self):
+        """Hand free slots to waiting clients in round-robin order"""
+        while self.active < self.limit and self._queues:
+            client, waiters = next(iter(self._queues.items()))
+            waiter = waiters.popleft()
+            self.queued -= 1
+            if waiters:
+                self._queues.move_to_end(client)
+            else:
+                del self._queues[client]
+            if not waiter.done():
+                self.active += 1
+                waiter.set_result(None)
+        self._update_gauges()
+
+    async def acquire(self, client: str):
+        if self.active < self.limit and not self._queues:
+            self.active += 1
+            self._update_gauges()
+            return
+        if self.queued >= self.max_queue:
+            self._reject(503, "queue_full", f"{self.name} capacity exhausted, try again later")
+        waiters = self._queues.get(client)
+        if waiters is not None and len(waiters) >= self.max_queue_per_client:
+            self._reject(429, "client_queue_full", f"Too many queued {self.name} requests for this client")
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._queues.setdefault(client, deque()).append(waiter)
+        self.queued += 1
+        self._update_gauges()
+        start = time.perf_counter()
+        try:
+            await asyncio.wait_for(waiter, self.queue_timeout)
+        except BaseException as e:
+            if waiter.done() and not waiter.cancelled():
+                # The slot was granted just as we gave up, hand it back
+                self.release()
+            else:
+                waiters = self._queues.get(client)
+                if waiters is not None and waiter in waiters:
+                    waiters.remove(waiter)
+                    self.queued -= 1
+                    if not waiters:
+                        del self._queues[client]
+                self._update_gauges()
+            if isinstance(e, asyncio.TimeoutError):
+                self._reject(503, "queue_timeout", f"Timed out waiting for {self.name} capacity")
+            raise
+        finally:
+            ADMISSION_WAIT.observe(time.perf_counter() - start, pool=self.name)
+
+    def release(self, held: Optional[float] = None):
+        """Free a slot; held is how long it was in use, which feeds the Retry-After estimate"""
+        if held is not None:
+            self._avg_hold = 0.8 * self._avg_hold + 0.2 * held
+        self.active -= 1
+        self._dispatch()
+
+    @asynccontextmanager
+    async def slot(self, client: str):
+        await self.acquire(client)
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.release(time.perf_counter() - start)
+
+scrape_admission = AdmissionController(
+    "scrape", SCRAPE_CONCURRENCY, SCRAPE_QUEUE_SIZE, ADMISSION_CLIENT_QUEUE_SIZE, ADMISSION_QUEUE_TIMEOUT
+)
+render_admission = AdmissionController(
+    "render", RENDER_CONCURRENCY, RENDER_QUEUE_SIZE, ADMISSION_CLIENT_QUEUE_SIZE, ADMISSION_QUEUE_TIMEOUT
+)
+
+def client_id(request: Request) -> str:
+    """Fairness key - the caller's address, or the X-Client-Id a trusted proxy forwarded for it"""
+    host = request.client.host if request.client else "unknown"
+    if host in CLIENT_ID_TRUSTED_PROXIES:
+        return request.headers.get("X-Client-Id") or host
+    return host
 
 # ============================================================================
 # MODELS
@@ -69,8 +931,8 @@ class ListingURLRequest(BaseModel):
     @field_validator('listing_url')
     def validate_aryeo_url(cls, v):
         url_str = str(v)
-        if 'aryeo.com' not in url_str:
-            raise ValueError('URL must be from aryeo.com domain')
+        if ALLOWED_LISTING_DOMAIN not in url_str:
+            raise ValueError(f'URL must be from {ALLOWED_LISTING_DOMAIN} domain')
         return v
 
 class PropertyInfo(BaseModel):
@@ -116,11 +978,19 @@ class ImageSelection(BaseModel):
             raise ValueError('Exactly 3 detail images are required')
         return v
 
+class ScrapeChanges(BaseModel):
+    added: List[str]
+    changed: List[str]
+    removed: List[str]
+    unchanged: List[str]
+    previous_scraped_at: Optional[str] = None
+
 class ScrapedImages(BaseModel):
     session_id: str
     images: List[str]
     listing_url: str
     total_found: int
+    changes: Optional[ScrapeChanges] = None
 
 class GeneratedContent(BaseModel):
     session_id: str
@@ -128,12 +998,145 @@ class GeneratedContent(BaseModel):
     caption: str
     hashtags: List[str]
 
+class CarouselRequest(BaseModel):
+    session_id: str
+    image_urls: List[str]
+    property_info: PropertyInfo
+
+    @field_validator('image_urls')
+    def validate_image_urls(cls, v):
+        if not 4 <= len(v) <= CAROUSEL_MAX_PHOTOS:
+            raise ValueError(f'Between 4 and {CAROUSEL_MAX_PHOTOS} images are required')
+        return v
+
+class CarouselContent(BaseModel):
+    session_id: str
+    slides: List[str]
+    caption: str
+    hashtags: List[str]
+    elapsed_ms: float
+
+class SlideshowRequest(ImageSelection):
+    format: str = "webp"
+    fps: int = SLIDESHOW_FPS
+    duration: float = SLIDESHOW_DURATION
+    size: int = SLIDESHOW_SIZE
+
+    @field_validator('format')
+    def validate_format(cls, v):
+        if v.lower() not in ('webp', 'gif'):
+            raise ValueError('Format must be webp or gif')
+        return v.lower()
+
+    @field_validator('fps')
+    def validate_fps(cls, v):
+        if not 1 <= v <= 30:
+            raise ValueError('FPS must be between 1 and 30')
+        return v
+
+    @field_validator('duration')
+    def validate_duration(cls, v):
+        if not 1 <= v <= SLIDESHOW_MAX_DURATION:
+            raise ValueError(f'Duration must be between 1 and {SLIDESHOW_MAX_DURATION:g} seconds')
+        return v
+
+    @field_validator('size')
+    def validate_size(cls, v):
+        if not 240 <= v <= 1080:
+            raise ValueError('Size must be between 240 and 1080 pixels')
+        return v
+
+    @model_validator(mode='after')
+    def validate_frame_budget(self):
+        frames = slideshow_frame_count(self.duration, self.fps, 1 + len(self.detail_images))
+        megapixels = frames * self.size * self.size / 1e6
+        budget = SLIDESHOW_MAX_MEGAPIXELS[self.format]
+        if megapixels > budget:
+            raise ValueError(f'{frames} frames of {self.size}px is {megapixels:.0f} megapixels, over the '
+                             f'{budget:g} allowed for {self.format}; lower the size, fps or duration')
+        return self
+
+class SlideshowContent(BaseModel):
+    session_id: str
+    image_base64: str
+    format: str
+    width: int
+    height: int
+    frames: int
+    fps: int
+    render_ms: float
+    encode_ms: float
+
+class PreviewContent(BaseModel):
+    session_id: str
+    image_base64: str
+    width: int
+    height: int
+    caption: str
+    hashtags: List[str]
+    elapsed_ms: float
+
+class EditStart(ImageSelection):
+    preview: bool = True
+
+class EditChange(BaseModel):
+    hero_image_url: Optional[str] = None
+    detail_images: Optional[List[str]] = None
+    property_info: Optional[PropertyInfo] = None
+
+    @field_validator('detail_images')
+    def validate_detail_images(cls, v):
+        if v is not None and len(v) != 3:
+            raise ValueError('Exactly 3 detail images are required')
+        return v
+
+class EditPatch(BaseModel):
+    region: str
+    x: int
+    y: int
+    width: int
+    height: int
+    image_base64: str
+
+class EditUpdate(BaseModel):
+    edit_id: str
+    version: int
+    width: int
+    height: int
+    patches: List[EditPatch]
+    caption: Optional[str] = None
+    hashtags: Optional[List[str]] = None
+    elapsed_ms: float
+
+class BatchGenerateRequest(BaseModel):
+    jobs: List[ImageSelection]
+
+    @field_validator('jobs')
+    def validate_jobs(cls, v):
+        if not 1 <= len(v) <= BATCH_MAX_JOBS:
+            raise ValueError(f'Between 1 and {BATCH_MAX_JOBS} jobs are required')
+        return v
+
+class AutoSelectRequest(BaseModel):
+    session_id: str
+
+class AutoSelection(BaseModel):
+    session_id: str
+    hero_image_url: str
+    detail_images: List[str]
+    scores: Dict[str, Dict[str, float]]
+    scored: int
+    elapsed_ms: float
+
 # ============================================================================
 # SELENIUM HELPERS - MERGED WITH LOGIN FUNCTIONALITY
 # ============================================================================
 
 def init_driver(headless: bool = True) -> webdriver.Chrome:
     """Initialize Chrome WebDriver with optimized options"""
+    from selenium import webdriver
+    from selenium.webdriver.chrome.options import Options
+
     chrome_options = Options()
     
     if headless:
@@ -156,6 +1159,11 @@ def init_driver(headless: bool = True) -> webdriver.Chrome:
         "safebrowsing.enabled": True
     }
     chrome_options.add_experimental_option("prefs", prefs)
+
+    if SCRAPE_MODE == "network":
+        # Network.* events land in the performance log; "eager" returns from get() at DOMContentLoaded
+        chrome_options.set_capability("goog:loggingPrefs", {"performance": "ALL"})
+        chrome_options.page_load_strategy = "eager"
     
     driver = webdriver.Chrome(options=chrome_options)
     driver.set_page_load_timeout(30)
@@ -163,9 +1171,85 @@ def init_driver(headless: bool = True) -> webdriver.Chrome:
     
     return driver
 
+class DriverPool:
+    """
+    Pre-launched Chrome drivers handed out to scrapes.
+
+    A driver is reused for up to max_uses scrapes, then quit and replaced in
+    the background. With size 0 every scrape launches and quits its own driver.
+    """
+
+    def __init__(self, size: int, max_uses: int):
+        self.size = size
+        self.max_uses = max_uses
+        self._idle: queue.Queue = queue.Queue()
+        self._closed = False
+
+    def _launch(self) -> webdriver.Chrome:
+        with pipeline_stage("driver_init"):
+            driver = init_driver()
+        driver.pool_uses = 0
+        return driver
+
+    def fill(self, prelogin: bool = False):
+        """Launch drivers until the pool is full, optionally logging each in"""
+        while not self._closed and self._idle.qsize() < self.size:
+            driver = self._launch()
+            if prelogin and EMAIL and PASSWORD:
+                with pipeline_stage("login"):
+                    if login_to_aryeo(driver):
+                        driver.logged_in_at = time.monotonic()
+            self._idle.put(driver)
+        logger.info(f"Driver pool ready with {self._idle.qsize()} driver(s)")
+
+    def acquire(self) -> webdriver.Chrome:
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            return self._launch()
+
+    def release(self, driver: webdriver.Chrome, healthy: bool = True):
+        driver.pool_uses = getattr(driver, 'pool_uses', 0) + 1
+        if healthy and not self._closed and driver.pool_uses < self.max_uses and self._idle.qsize() < self.size:
+            self._idle.put(driver)
+            return
+        try:
+            driver.quit()
+        except:
+            pass
+        if self.size and not self._closed:
+            threading.Thread(target=self._refill, name="driver-refill", daemon=True).start()
+
+    def _refill(self):
+        try:
+            self.fill(prelogin=WARMUP_PRELOGIN)
+        except Exception as e:
+            logger.error(f"Driver pool refill failed: {str(e)}")
+
+    def close(self):
+        self._closed = True
+        while True:
+            try:
+                self._idle.get_nowait().quit()
+            except queue.Empty:
+                break
+            except:
+                pass
+
+driver_pool = DriverPool(DRIVER_POOL_SIZE, DRIVER_MAX_USES)
+
+def has_fresh_login(driver: webdriver.Chrome) -> bool:
+    """Whether a pooled driver logged in recently enough to skip the login form"""
+    logged_in_at = getattr(driver, 'logged_in_at', None)
+    return logged_in_at is not None and time.monotonic() - logged_in_at < DRIVER_LOGIN_TTL
+
 
 def login_to_aryeo(driver: webdriver.Chrome) -> bool:
     """Login to Aryeo using credentials from document 2"""
+    from selenium.webdriver.common.by import By
+    from selenium.webdriver.support.ui import WebDriverWait
+    from selenium.webdriver.support import expected_conditions as EC
+
     try:
         logger.info("Navigating to login page...")
         driver.get(LOGIN_URL)
@@ -242,66 +1326,44 @@ def extract_id_from_url(url: str) -> str:
         return match.group(1)
     raise ValueError("Could not extract listing ID from URL")
 
-def scrape_listing_images(driver: webdriver.Chrome, listing_url: str) -> List[str]:
-    """Scrape image URLs from Aryeo listing page with robust error handling."""
-    try:
-        # Step 1: Login
-        if not login_to_aryeo(driver):
-            raise Exception("Login failed")
+# Collects listing image URLs from the rendered page: <img> sources (including
+# lazy data-src), and CSS background images
+DOM_SCAN_SCRIPT = """
+const cdnOrigin = arguments[0];
+const urls = new Set();
 
-        # Step 2: Convert to download-center URL
-        logger.info(f"Original listing URL: {listing_url}")
-        listing_url = download_link(listing_url)
-        logger.info(f"Converted to download-center URL: {listing_url}")
-        
-        # Step 3: Navigate with retry logic
-        max_retries = 3
-        page_loaded = False
-        
-        for attempt in range(max_retries):
-            try:
-                logger.info(f"Navigation attempt {attempt + 1}/{max_retries}")
-                driver.set_page_load_timeout(60)  # 60 second timeout
-                driver.get(listing_url)
-                
-                # Wait for page to be ready
-                WebDriverWait(driver, 30).until(
-                    lambda d: d.execute_script("return document.readyState") == "complete"
-                )
-                logger.info("✅ Page loaded successfully")
-                page_loaded = True
-                break
-                
-            except TimeoutException:
-                if attempt < max_retries - 1:
-                    logger.warning(f"⏱️ Timeout on attempt {attempt + 1}, retrying in 3 seconds...")
-                    time.sleep(3)
-                    continue
-                else:
-                    # On final attempt, try to use what we have
-                    logger.warning("⚠️ Final timeout, stopping page load and proceeding...")
-                    try:
-                        driver.execute_script("window.stop();")
-                        page_loaded = True
-                    except Exception as stop_error:
-                        logger.error(f"Could not stop page load: {stop_error}")
-                        
-            except Exception as nav_error:
-                if attempt < max_retries - 1:
-                    logger.warning(f"❌ Error on attempt {attempt + 1}: {str(nav_error)}, retrying...")
-                    time.sleep(3)
-                    continue
-                else:
-                    logger.error(f"Navigation failed after {max_retries} attempts")
-                    raise
-        
-        if not page_loaded:
-            raise Exception("Failed to load page after all retries")
-        
-        # Wait a bit for dynamic content
+// Check all img elements
+document.querySelectorAll('img').forEach(img => {
+    const src = img.src || img.dataset.src || img.dataset.lazySrc;
+    if (src && src.includes(cdnOrigin) && src.includes('/resized/')) {
+        urls.add(src);
+    }
+});
+
+// Check all elements with background images
+document.querySelectorAll('*').forEach(el => {
+    try {
+        const style = window.getComputedStyle(el).backgroundImage;
+        if (style && style.includes(cdnOrigin) && style.includes('/resized/')) {
+            const match = style.match(/url\\(["\']?(.*?)["\']?\\)/);
+            if (match && match[1]) urls.add(match[1]);
+        }
+    } catch(e) {}
+});
+
+return Array.from(urls);
+"""
+
+def scan_dom_images(driver: webdriver.Chrome) -> List[str]:
+    """Settle, scroll lazy loaders into action, then collect CDN images from the DOM three ways"""
+    from selenium.webdriver.common.by import By
+
+    # Wait a bit for dynamic content
+    with pipeline_stage("settle"):
         time.sleep(5)
-        
-        # Step 4: Scroll to load lazy-loaded images
+
+    # Step 4: Scroll to load lazy-loaded images
+    with pipeline_stage("scroll"):
         logger.info("📜 Scrolling to load images...")
         try:
             # Scroll down 3 times
@@ -309,53 +1371,55 @@ def scrape_listing_images(driver: webdriver.Chrome, listing_url: str) -> List[st
                 driver.execute_script("window.scrollTo(0, document.body.scrollHeight);")
                 time.sleep(2)
                 logger.info(f"  Scroll {i + 1}/3 complete")
-            
+
             # Scroll back to top
             driver.execute_script("window.scrollTo(0, 0);")
             time.sleep(2)
             logger.info("  Scrolled back to top")
         except Exception as scroll_error:
             logger.warning(f"⚠️ Scrolling error (continuing anyway): {str(scroll_error)}")
-        
-        # Step 5: Collect images using multiple methods
-        image_urls = []
-        seen_urls = set()
-        
-        # METHOD 1: Find <img> elements
+
+    # Step 5: Collect images using multiple methods
+    image_urls = []
+    seen_urls = set()
+
+    # METHOD 1: Find <img> elements
+    with pipeline_stage("extract_method1"):
         logger.info("🔍 Method 1: Searching <img> elements...")
         try:
             images = driver.find_elements(By.TAG_NAME, "img")
             logger.info(f"  Found {len(images)} img elements")
-            
+
             for img in images:
                 try:
                     src = (img.get_attribute('src') or 
                            img.get_attribute('data-src') or
                            img.get_attribute('data-lazy-src'))
-                    
-                    if src and 'cdn.aryeo.com' in src and '/resized/' in src and src not in seen_urls:
+
+                    if src and CDN_ORIGIN in src and '/resized/' in src and src not in seen_urls:
                         image_urls.append(src)
                         seen_urls.add(src)
                 except Exception as img_error:
                     continue
-            
+
             logger.info(f"  ✅ Method 1 found {len(image_urls)} images")
         except Exception as method1_error:
             logger.warning(f"  ⚠️ Method 1 error (continuing): {str(method1_error)}")
-        
-        # METHOD 2: Check background-image in style attributes
+
+    # METHOD 2: Check background-image in style attributes
+    with pipeline_stage("extract_method2"):
         logger.info("🔍 Method 2: Checking style attributes...")
         method2_count = 0
         try:
             all_elements = driver.find_elements(By.XPATH, "//*[@style]")
             logger.info(f"  Checking {len(all_elements)} elements with style attributes")
-            
+
             for elem in all_elements:
                 try:
                     style = elem.get_attribute('style')
-                    if style and 'cdn.aryeo.com' in style and '/resized/' in style:
+                    if style and CDN_ORIGIN in style and '/resized/' in style:
                         # Extract URL from background-image: url(...)
-                        urls = re.findall(r'url\(["\']?(https://cdn\.aryeo\.com[^"\')\s]+)["\']?\)', style)
+                        urls = re.findall(r'url\(["\']?(' + re.escape(CDN_ORIGIN) + r'[^"\')\s]+)["\']?\)', style)
                         for url in urls:
                             if '/resized/' in url and url not in seen_urls:
                                 image_urls.append(url)
@@ -363,52 +1427,235 @@ def scrape_listing_images(driver: webdriver.Chrome, listing_url: str) -> List[st
                                 method2_count += 1
                 except Exception as elem_error:
                     continue
-            
+
             logger.info(f"  ✅ Method 2 found {method2_count} additional images")
         except Exception as method2_error:
             logger.warning(f"  ⚠️ Method 2 error (continuing): {str(method2_error)}")
-        
-        # METHOD 3: JavaScript execution to find all CDN URLs
+
+    # METHOD 3: JavaScript execution to find all CDN URLs
+    with pipeline_stage("extract_method3"):
         logger.info("🔍 Method 3: JavaScript page scan...")
         method3_count = 0
         try:
-            js_script = """
-            const urls = new Set();
-            
-            // Check all img elements
-            document.querySelectorAll('img').forEach(img => {
-                const src = img.src || img.dataset.src || img.dataset.lazySrc;
-                if (src && src.includes('cdn.aryeo.com') && src.includes('/resized/')) {
-                    urls.add(src);
-                }
-            });
-            
-            // Check all elements with background images
-            document.querySelectorAll('*').forEach(el => {
-                try {
-                    const style = window.getComputedStyle(el).backgroundImage;
-                    if (style && style.includes('cdn.aryeo.com') && style.includes('/resized/')) {
-                        const match = style.match(/url\\(["\']?(.*?)["\']?\\)/);
-                        if (match && match[1]) urls.add(match[1]);
-                    }
-                } catch(e) {}
-            });
-            
-            return Array.from(urls);
-            """
-            
-            js_urls = driver.execute_script(js_script)
+            js_urls = driver.execute_script(DOM_SCAN_SCRIPT, CDN_ORIGIN)
             logger.info(f"  JavaScript found {len(js_urls)} total URLs")
-            
+
             for url in js_urls:
                 if url and url not in seen_urls:
                     image_urls.append(url)
                     seen_urls.add(url)
                     method3_count += 1
-            
+
             logger.info(f"  ✅ Method 3 found {method3_count} additional images")
         except Exception as method3_error:
             logger.warning(f"  ⚠️ Method 3 error (continuing): {str(method3_error)}")
+
+    return image_urls
+
+def json_strings(value):
+    """Every string anywhere in a decoded JSON document"""
+    if isinstance(value, str):
+        yield value
+    elif isinstance(value, dict):
+        for item in value.values():
+            yield from json_strings(item)
+    elif isinstance(value, list):
+        for item in value:
+            yield from json_strings(item)
+
+def is_listing_image_url(url: str) -> bool:
+    """A resized CDN image, as the DOM scan accepts - not an original, video, PDF or other CDN file"""
+    if CDN_ORIGIN not in url or '/resized/' not in url:
+        return False
+    extension = os.path.splitext(urlparse(url).path)[1].lower()
+    return not extension or extension in ARCHIVE_IMAGE_EXTENSIONS
+
+class NetworkHarvest:
+    """
+    Listing images seen in Chrome's performance log while a page loads.
+
+    Every request the page makes for a resized CDN image is collected as it
+    is sent, before any lazy loader has to put it in the DOM. JSON responses
+    from media endpoints (MEDIA_API_PATTERN) are read with
+    Network.getResponseBody; once one lists resized CDN images it is taken
+    as the listing's full media set and the harvest stops. Originals, videos
+    and documents it also names are skipped.
+    """
+
+    def __init__(self, driver: webdriver.Chrome):
+        self.driver = driver
+        self.media_listing: Optional[str] = None
+        self._urls: Dict[str, str] = {}  # image identity -> URL, in discovery order
+        self._media_requests: Dict[str, str] = {}
+        self._last_activity = time.monotonic()
+        # Drop whatever the login and earlier scrapes left in the log
+        driver.get_log("performance")
+
+    @property
+    def image_urls(self) -> List[str]:
+        return list(self._urls.values())
+
+    def add(self, url: str):
+        identity = image_identity(url)
+        # Of several variants of one photo, the large rendition is the one the DOM scan would pick
+        if identity not in self._urls or '/resized/large/' in url:
+            self._urls[identity] = url
+
+    def poll(self):
+        for entry in self.driver.get_log("performance"):
+            try:
+                message = json.loads(entry['message'])['message']
+                params = message['params']
+            except (KeyError, ValueError):
+                continue
+            method = message.get('method')
+            if method == "Network.requestWillBeSent":
+                self._last_activity = time.monotonic()
+                url = params.get('request', {}).get('url', '')
+                if is_listing_image_url(url):
+                    self.add(url)
+            elif method == "Network.responseReceived":
+                response = params.get('response', {})
+                api_url = response.get('url', '')
+                if 'json' in response.get('mimeType', '') and MEDIA_API_PATTERN.search(urlparse(api_url).path):
+                    self._media_requests[params.get('requestId')] = api_url
+            elif method in ("Network.loadingFinished", "Network.loadingFailed"):
+                self._last_activity = time.monotonic()
+                api_url = self._media_requests.pop(params.get('requestId'), None)
+                if api_url and method == "Network.loadingFinished":
+                    self.read_media_listing(params['requestId'], api_url)
+
+    def read_media_listing(self, request_id: str, api_url: str):
+        try:
+            response = self.driver.execute_cdp_cmd("Network.getResponseBody", {'requestId': request_id})
+            body = response['body']
+            payload = json.loads(base64.b64decode(body) if response.get('base64Encoded') else body)
+        except Exception as e:
+            logger.warning(f"⚠️ Could not read media response {api_url}: {str(e)}")
+            return
+        urls = [value for value in json_strings(payload) if is_listing_image_url(value)]
+        if urls:
+            for url in urls:
+                self.add(url)
+            self.media_listing = api_url
+            logger.info(f"  Media listing {api_url} named {len(urls)} resized CDN images")
+
+    def collect(self, timeout: float) -> List[str]:
+        """Poll until a media listing arrives, the page goes quiet after loading, or the timeout"""
+        deadline = time.monotonic() + timeout
+        while True:
+            self.poll()
+            if self.media_listing:
+                return self.image_urls
+            idle = time.monotonic() - self._last_activity >= NETWORK_IDLE_SECONDS
+            if idle and self.driver.execute_script("return document.readyState") == "complete":
+                break
+            if time.monotonic() >= deadline:
+                TIMEOUTS.inc(operation="network_harvest")
+                logger.warning(f"⏱️ Network harvest still busy after {timeout:g}s, using what it has")
+                break
+            time.sleep(0.1)
+
+        # Without a media listing, lazy images that were never requested are still named in the DOM
+        try:
+            for url in self.driver.execute_script(DOM_SCAN_SCRIPT, CDN_ORIGIN):
+                self.add(url)
+        except Exception as e:
+            logger.warning(f"⚠️ DOM scan after network harvest failed: {str(e)}")
+        logger.info(f"  Network harvest found {len(self._urls)} images")
+        return self.image_urls
+
+def start_network_harvest(driver: webdriver.Chrome) -> Optional[NetworkHarvest]:
+    """A harvest on the driver's performance log, or None when the log isn't available"""
+    try:
+        return NetworkHarvest(driver)
+    except Exception as e:
+        logger.warning(f"⚠️ Performance log unavailable, using DOM scan: {str(e)}")
+        return None
+
+def scrape_listing_images(driver: webdriver.Chrome, listing_url: str) -> List[str]:
+    """Scrape image URLs from Aryeo listing page with robust error handling."""
+    from selenium.webdriver.support.ui import WebDriverWait
+    from selenium.common.exceptions import TimeoutException
+
+    try:
+        # Step 1: Login (pooled drivers may already be logged in)
+        if has_fresh_login(driver):
+            logger.info("Reusing logged-in driver")
+        else:
+            with pipeline_stage("login"):
+                logged_in = login_to_aryeo(driver)
+            if not logged_in:
+                raise Exception("Login failed")
+            driver.logged_in_at = time.monotonic()
+
+        # Step 2: Convert to download-center URL
+        logger.info(f"Original listing URL: {listing_url}")
+        listing_url = download_link(listing_url)
+        logger.info(f"Converted to download-center URL: {listing_url}")
+        
+        # Step 3: Navigate with retry logic, listening to network traffic from the first request
+        harvest = start_network_harvest(driver) if SCRAPE_MODE == "network" else None
+        max_retries = 3
+        page_loaded = False
+        
+        with pipeline_stage("navigation"):
+            for attempt in range(max_retries):
+                try:
+                    logger.info(f"Navigation attempt {attempt + 1}/{max_retries}")
+                    with trace_span("navigation_attempt", attempt=attempt + 1):
+                        driver.set_page_load_timeout(60)  # 60 second timeout
+                        driver.get(listing_url)
+                    
+                        # Wait for page to be ready (the harvest decides for itself when it has enough)
+                        if harvest is None:
+                            WebDriverWait(driver, 30).until(
+                                lambda d: d.execute_script("return document.readyState") == "complete"
+                            )
+                    logger.info("✅ Page loaded successfully")
+                    page_loaded = True
+                    break
+                
+                except TimeoutException:
+                    TIMEOUTS.inc(operation="navigation")
+                    if attempt < max_retries - 1:
+                        RETRIES.inc(operation="navigation")
+                        logger.warning(f"⏱️ Timeout on attempt {attempt + 1}, retrying in 3 seconds...")
+                        time.sleep(3)
+                        continue
+                    else:
+                        # On final attempt, try to use what we have
+                        logger.warning("⚠️ Final timeout, stopping page load and proceeding...")
+                        try:
+                            driver.execute_script("window.stop();")
+                            page_loaded = True
+                        except Exception as stop_error:
+                            logger.error(f"Could not stop page load: {stop_error}")
+                        
+                except Exception as nav_error:
+                    if attempt < max_retries - 1:
+                        RETRIES.inc(operation="navigation")
+                        logger.warning(f"❌ Error on attempt {attempt + 1}: {str(nav_error)}, retrying...")
+                        time.sleep(3)
+                        continue
+                    else:
+                        logger.error(f"Navigation failed after {max_retries} attempts")
+                        raise
+        
+        if not page_loaded:
+            raise Exception("Failed to load page after all retries")
+        
+        image_urls = None
+        if harvest is not None:
+            with pipeline_stage("network_harvest"):
+                image_urls = harvest.collect(NETWORK_HARVEST_TIMEOUT)
+            if not image_urls:
+                logger.warning("⚠️ Network log had no listing images, falling back to DOM scan")
+        if image_urls:
+            SCRAPE_EXTRACTIONS.inc(method="network_api" if harvest.media_listing else "network")
+        else:
+            SCRAPE_EXTRACTIONS.inc(method="dom")
+            image_urls = scan_dom_images(driver)
         
         # Step 6: Final results
         logger.info(f"🎉 Total unique CDN images found: {len(image_urls)}")
@@ -416,32 +1663,7 @@ def scrape_listing_images(driver: webdriver.Chrome, listing_url: str) -> List[st
         # Step 7: Debug if no images found
         if len(image_urls) == 0:
             logger.error("❌ NO IMAGES FOUND! Saving debug information...")
-            try:
-                # Save screenshot
-                screenshot_path = "debug_no_images.png"
-                driver.save_screenshot(screenshot_path)
-                logger.error(f"📸 Screenshot saved to: {screenshot_path}")
-                
-                # Log page info
-                logger.error(f"📄 Page title: {driver.title}")
-                logger.error(f"🔗 Current URL: {driver.current_url}")
-                
-                # Check what images ARE on the page
-                all_imgs = driver.find_elements(By.TAG_NAME, "img")
-                logger.error(f"🖼️ Total <img> elements found: {len(all_imgs)}")
-                
-                # Log sample of image sources
-                for i, img in enumerate(all_imgs[:5]):
-                    src = img.get_attribute('src')
-                    logger.error(f"  Sample img {i + 1}: {src}")
-                
-                # Save page source for inspection
-                with open("debug_page_source.html", "w", encoding="utf-8") as f:
-                    f.write(driver.page_source)
-                logger.error(f"💾 Page source saved to: debug_page_source.html")
-                
-            except Exception as debug_error:
-                logger.error(f"⚠️ Could not save debug info: {str(debug_error)}")
+            save_debug_artifacts(driver, "no_images")
         
         return image_urls
 
@@ -450,16 +1672,27 @@ def scrape_listing_images(driver: webdriver.Chrome, listing_url: str) -> List[st
         logger.error(f"Error type: {type(e).__name__}")
         
         # Try to save debug info even on error
-        try:
-            driver.save_screenshot("debug_error.png")
-            logger.error("📸 Error screenshot saved to: debug_error.png")
-        except:
-            pass
+        save_debug_artifacts(driver, "error", e)
         
         raise
 
+def run_scrape(listing_url: str) -> List[str]:
+    """Scrape a listing with a pooled (or fresh) driver and hand it back"""
+    if not EMAIL or not PASSWORD:
+        raise HTTPException(status_code=503, detail="Aryeo login not configured, set ARYEO_EMAIL and ARYEO_PASSWORD")
+    driver = driver_pool.acquire()
+    healthy = False
+    try:
+        image_urls = scrape_listing_images(driver, listing_url)
+        healthy = True
+        if ARCHIVE_INGEST:
+            start_archive_ingest(driver, listing_url, image_urls)
+        return image_urls
+    finally:
+        driver_pool.release(driver, healthy)
+
 def get_original_url(resized_url: str) -> str:
-    inner_start = resized_url.find('https://cdn.aryeo.com')
+    inner_start = resized_url.find(CDN_ORIGIN)
     if inner_start != -1:
         inner_url = resized_url[inner_start:]
     else:
@@ -470,6 +1703,29 @@ def get_original_url(resized_url: str) -> str:
     # So return inner_url as is
     return inner_url
 
+def image_identity(url: str) -> str:
+    """Stable identity of a CDN image, independent of resize variant and query string"""
+    parsed = urlparse(get_original_url(url))
+    path = re.sub(r'/resized/[^/]+/(?:[a-z]+-)?', '/', parsed.path)
+    return f"{parsed.netloc}{path}"
+
+def diff_image_sets(previous_urls: List[str], current_urls: List[str]) -> dict:
+    """Compare two scrapes of a listing by image identity"""
+    previous = {image_identity(url): url for url in previous_urls}
+    current_ids = set()
+    diff = {'added': [], 'changed': [], 'removed': [], 'unchanged': []}
+    for url in current_urls:
+        identity = image_identity(url)
+        current_ids.add(identity)
+        if identity not in previous:
+            diff['added'].append(url)
+        elif previous[identity] != url:
+            diff['changed'].append(url)
+        else:
+            diff['unchanged'].append(url)
+    diff['removed'] = [url for identity, url in previous.items() if identity not in current_ids]
+    return diff
+
 def sort_images_by_quality_local(image_paths: List[str]) -> List[str]:
     """Sort images by quality based on filename and dimensions"""
     scored_images = []
@@ -511,316 +1767,2630 @@ def sort_images_by_quality_local(image_paths: List[str]) -> List[str]:
     return [path for score, path in scored_images]
 
 # ============================================================================
-# IMAGE PROCESSING (from document 1)
+# BLOB STORE
+# ============================================================================
+
+class BlobStore:
+    """
+    Size-capped directory of files, evicted least recently used first.
+
+    Writes land in a temp file beside the target and are renamed into place,
+    so readers never see a partial file. sweep() also drops anything not
+    accessed for max_age. The index is in memory and rebuild() recreates it
+    from a scandir walk, ordered by mtime, which get() keeps current.
+    """
+
+    TEMP_SUFFIX = ".part"
+
+    def __init__(self, name: str, root: str, max_bytes: int, max_age: float):
+        self.name = name
+        self.root = root
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self._index: OrderedDict = OrderedDict()  # key -> [size, last access]
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def namespace() -> str:
+        """Per-request key prefix: time-ordered and tagged with the trace ID when there is one"""
+        return f"{datetime.now():%Y%m%d-%H%M%S}-{current_trace_id.get() or uuid.uuid4().hex[:16]}"
+
+    def path(self, key: str) -> str:
+        parts = key.split('/')
+        if any(part in ('', '.', '..') for part in parts):
+            raise ValueError(f"Invalid blob key: {key!r}")
+        return os.path.join(self.root, *parts)
+
+    def key_for(self, path: str) -> Optional[str]:
+        relative = os.path.relpath(path, self.root)
+        if relative.startswith('..') or os.path.isabs(relative):
+            return None
+        return relative.replace(os.sep, '/')
+
+    @contextmanager
+    def open_write(self, key: str):
+        """Write a file atomically; it's added to the index once the rename succeeds"""
+        path = self.path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix=".", suffix=self.TEMP_SUFFIX)
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                yield f
+            os.replace(tmp_path, path)
+        except BaseException:
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+            raise
+        self.add(key)
+
+    def put(self, key: str, data: bytes) -> str:
+        with self.open_write(key) as f:
+            f.write(data)
+        return self.path(key)
+
+    def add(self, key: str):
+        """Index a file written into the store by someone else, then enforce the cap"""
+        size = os.stat(self.path(key)).st_size
+        with self._lock:
+            previous = self._index.pop(key, None)
+            if previous is not None:
+                self._bytes -= previous[0]
+            self._index[key] = [size, time.time()]
+            self._bytes += size
+        self._evict()
+
+    def get(self, key: str) -> Optional[str]:
+        """Path of a stored file, marking it recently used; None if it isn't stored"""
+        with self._lock:
+            entry = self._index.get(key)
+            if entry is None:
+                return None
+            self._index.move_to_end(key)
+            entry[1] = time.time()
+        path = self.path(key)
+        try:
+            os.utime(path)
+        except OSError:
+            self.discard(key)
+            return None
+        return path
+
+    def discard(self, key: str, reason: str = "deleted"):
+        with self._lock:
+            entry = self._index.pop(key, None)
+            if entry is None:
+                return
+            self._bytes -= entry[0]
+        self._delete(key, reason)
+
+    def _delete(self, key: str, reason: str):
+        path = self.path(key)
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+        # Drop emptied namespace directories
+        parent = os.path.dirname(path)
+        while parent != self.root and parent.startswith(self.root):
+            try:
+                os.rmdir(parent)
+            except OSError:
+                break
+            parent = os.path.dirname(parent)
+        if reason != "deleted":
+            BLOB_EVICTIONS.inc(store=self.name, reason=reason)
+        BLOB_STORE_BYTES.set(self._bytes, store=self.name)
+
+    def _evict(self, now: Optional[float] = None):
+        victims = []
+        with self._lock:
+            while self._index:
+                key, (size, last_access) = next(iter(self._index.items()))
+                if self._bytes > self.max_bytes:
+                    reason = "size"
+                elif now is not None and now - last_access > self.max_age:
+                    reason = "age"
+                else:
+                    break
+                del self._index[key]
+                self._bytes -= size
+                victims.append((key, reason))
+        for key, reason in victims:
+            self._delete(key, reason)
+        BLOB_STORE_BYTES.set(self._bytes, store=self.name)
+        return len(victims)
+
+    def sweep(self) -> int:
+        """Evict expired and over-cap files, returning how many went"""
+        return self._evict(now=time.time())
+
+    def rebuild(self):
+        """Re-index whatever is on disk, clearing temp files left by a crash"""
+        start = time.perf_counter()
+        os.makedirs(self.root, exist_ok=True)
+        found = []
+        stale_before = time.time() - 3600
+        pending = [self.root]
+        while pending:
+            with os.scandir(pending.pop()) as entries:
+                for entry in entries:
+                    if entry.is_dir(follow_symlinks=False):
+                        pending.append(entry.path)
+                        continue
+                    stat = entry.stat(follow_symlinks=False)
+                    if entry.name.endswith(self.TEMP_SUFFIX):
+                        if stat.st_mtime < stale_before:
+                            os.remove(entry.path)
+                        continue
+                    found.append((stat.st_mtime, self.key_for(entry.path), stat.st_size))
+        found.sort()
+        with self._lock:
+            # Files written while we were scanning keep their newer place in the order
+            written = self._index
+            self._index = OrderedDict((key, [size, mtime]) for mtime, key, size in found if key not in written)
+            self._index.update(written)
+            self._bytes = sum(size for size, _ in self._index.values())
+        self.sweep()
+        logger.info(f"{self.name} store: indexed {len(self._index)} files, {self._bytes / 1024 / 1024:.1f}MB "
+                    f"in {(time.perf_counter() - start) * 1000:.0f}ms")
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                'root': self.root,
+                'files': len(self._index),
+                'bytes': self._bytes,
+                'max_bytes': self.max_bytes,
+                'max_age_seconds': self.max_age,
+            }
+
+download_store = BlobStore("downloads", DOWNLOAD_DIR, DOWNLOAD_MAX_BYTES, DOWNLOAD_MAX_AGE)
+debug_store = BlobStore("debug", DEBUG_DIR, DEBUG_MAX_BYTES, DEBUG_MAX_AGE)
+artifact_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="artifacts")
+
+async def sweep_blob_stores_periodically():
+    """Background task evicting old files from the disk stores"""
+    loop = asyncio.get_running_loop()
+    for store in (download_store, debug_store):
+        await loop.run_in_executor(None, store.rebuild)
+    while True:
+        await asyncio.sleep(BLOB_SWEEP_INTERVAL)
+        for store in (download_store, debug_store):
+            try:
+                await loop.run_in_executor(None, store.sweep)
+            except Exception as e:
+                logger.error(f"{store.name} store sweep error: {str(e)}")
+
+def save_debug_artifacts(driver: webdriver.Chrome, reason: str, error: Optional[Exception] = None):
+    """
+    Capture a screenshot, the page source and some context from a failed
+    scrape into their own debug_store namespace. Only the capture happens
+    here; the disk writes are handed to artifact_executor.
+    """
+    artifacts = {}
+    context = {'reason': reason, 'error': str(error) if error else None, 'trace_id': current_trace_id.get(),
+               'captured_at': datetime.now().isoformat()}
+    try:
+        artifacts['screenshot.png'] = driver.get_screenshot_as_png()
+    except Exception as e:
+        logger.warning(f"⚠️ Could not capture screenshot: {str(e)}")
+    try:
+        artifacts['page_source.html'] = driver.page_source.encode('utf-8')
+        context.update(driver.execute_script("""
+            const imgs = Array.from(document.querySelectorAll('img'));
+            return {url: location.href, title: document.title, img_count: imgs.length,
+                    sample_srcs: imgs.slice(0, 5).map(img => img.src)};
+        """))
+    except Exception as e:
+        logger.warning(f"⚠️ Could not capture page state: {str(e)}")
+    artifacts['context.json'] = json.dumps(context, indent=2).encode()
+
+    namespace = f"{BlobStore.namespace()}-{reason}"
+    artifact_executor.submit(write_debug_artifacts, namespace, artifacts)
+    logger.error(f"🗂️ Debug artifacts for {reason} saved to {debug_store.path(namespace)}")
+
+def write_debug_artifacts(namespace: str, artifacts: Dict[str, bytes]):
+    for name, data in artifacts.items():
+        try:
+            debug_store.put(f"{namespace}/{name}", data)
+        except Exception as e:
+            logger.error(f"Could not write debug artifact {name}: {str(e)}")
+
+# ============================================================================
+# ARCHIVE INGESTION
+# ============================================================================
+
+class StreamingZipExtractor:
+    """
+    Extract a ZIP while it downloads by walking its local file headers.
+
+    The central directory at the end of the archive is never needed: each
+    entry is written to dest_dir as its bytes arrive, so memory stays at one
+    chunk however large the archive. Only entries accepted by the filter are
+    kept; the rest are read past.
+    """
+
+    def __init__(self, dest_dir: str, accept=lambda name: True):
+        self.dest_dir = dest_dir
+        self.accept = accept
+        self.done = False
+        self._buffer = bytearray()
+        self._entry: Optional[dict] = None
+        self._names = set()
+
+    def feed(self, chunk: bytes) -> List[Tuple[str, str]]:
+        """Consume a chunk, returning (entry name, local path) for entries it completed"""
+        self._buffer += chunk
+        completed = []
+        while not self.done:
+            if self._entry is None:
+                if not self._read_header():
+                    break
+            elif self._entry['state'] == 'data':
+                if not self._read_data():
+                    break
+            elif not self._read_descriptor():
+                break
+            if self._entry is not None and self._entry['state'] == 'finished':
+                self._finish(completed)
+        return completed
+
+    def close(self):
+        if self._entry is not None and self._entry['file'] is not None:
+            self._entry['file'].close()
+            os.remove(self._entry['tmp_path'])
+        self._entry = None
+
+    def _read_header(self) -> bool:
+        if len(self._buffer) < 4:
+            return False
+        signature = bytes(self._buffer[:4])
+        if signature in (b"PK\x01\x02", b"PK\x05\x06"):
+            # Central directory - every entry has been seen
+            self.done = True
+            return False
+        if signature != zipfile.stringFileHeader:
+            raise zipfile.BadZipFile(f"Unexpected signature {signature!r} in archive stream")
+        if len(self._buffer) < zipfile.sizeFileHeader:
+            return False
+        (_, _, _, flags, method, _, _, crc, compressed_size, file_size,
+         name_length, extra_length) = struct.unpack(zipfile.structFileHeader, self._buffer[:zipfile.sizeFileHeader])
+        header_end = zipfile.sizeFileHeader + name_length + extra_length
+        if len(self._buffer) < header_end:
+            return False
+
+        raw_name = bytes(self._buffer[zipfile.sizeFileHeader:zipfile.sizeFileHeader + name_length])
+        name = raw_name.decode('utf-8' if flags & 0x800 else 'cp437')
+        extra = bytes(self._buffer[zipfile.sizeFileHeader + name_length:header_end])
+        del self._buffer[:header_end]
+
+        zip64 = 0xFFFFFFFF in (compressed_size, file_size)
+        if zip64:
+            file_size, compressed_size = self._zip64_sizes(extra, file_size, compressed_size)
+        has_descriptor = bool(flags & 0x08)
+        is_directory = name.endswith('/')
+        if has_descriptor and method != zipfile.ZIP_DEFLATED and not is_directory:
+            # Only deflate streams mark their own end; anything else needs the central directory
+            raise zipfile.BadZipFile(f"Entry {name} can't be extracted from a stream")
+
+        keep = (not flags & 0x01 and method in (zipfile.ZIP_STORED, zipfile.ZIP_DEFLATED)
+                and not is_directory and self.accept(name))
+        self._entry = {
+            'name': name,
+            'method': method,
+            'crc': None if has_descriptor else crc,
+            'running_crc': 0,
+            'remaining': 0 if is_directory else None if has_descriptor else compressed_size,
+            'descriptor': has_descriptor,
+            'zip64': zip64,
+            'decompressor': zlib.decompressobj(-15) if method == zipfile.ZIP_DEFLATED else None,
+            'file': None,
+            'state': 'data' if not is_directory else 'descriptor' if has_descriptor else 'finished',
+        }
+        if keep:
+            # dest_dir may sit in a BlobStore, whose evictions remove directories they leave empty
+            os.makedirs(self.dest_dir, exist_ok=True)
+            self._entry['path'] = self._local_path(name)
+            self._entry['tmp_path'] = self._entry['path'] + ".part"
+            self._entry['file'] = open(self._entry['tmp_path'], 'wb')
+        return True
+
+    @staticmethod
+    def _zip64_sizes(extra: bytes, file_size: int, compressed_size: int) -> Tuple[int, int]:
+        offset = 0
+        while offset + 4 <= len(extra):
+            header_id, length = struct.unpack('<HH', extra[offset:offset + 4])
+            if header_id == 0x0001:
+                values = iter(struct.unpack(f'<{length // 8}Q', extra[offset + 4:offset + 4 + length // 8 * 8]))
+                if file_size == 0xFFFFFFFF:
+                    file_size = next(values)
+                if compressed_size == 0xFFFFFFFF:
+                    compressed_size = next(values)
+                break
+            offset += 4 + length
+        return file_size, compressed_size
+
+    def _read_data(self) -> bool:
+        entry = self._entry
+        if not self._buffer:
+            return False
+        if entry['remaining'] is None:
+            # Data descriptor follows - the deflate stream tells us where the data ends
+            data = entry['decompressor'].decompress(bytes(self._buffer))
+            if entry['decompressor'].eof:
+                self._buffer = bytearray(entry['decompressor'].unused_data)
+                entry['state'] = 'descriptor'
+            else:
+                self._buffer.clear()
+        else:
+            take = min(len(self._buffer), entry['remaining'])
+            data = bytes(self._buffer[:take])
+            del self._buffer[:take]
+            entry['remaining'] -= take
+            if entry['decompressor'] is not None:
+                data = entry['decompressor'].decompress(data)
+            if entry['remaining'] == 0:
+                entry['state'] = 'descriptor' if entry['descriptor'] else 'finished'
+        if entry['file'] is not None and data:
+            entry['file'].write(data)
+            entry['running_crc'] = zlib.crc32(data, entry['running_crc'])
+        return True
+
+    def _read_descriptor(self) -> bool:
+        # crc, compressed size, size - optionally preceded by a signature
+        entry = self._entry
+        if len(self._buffer) < 4:
+            return False
+        offset = 4 if bytes(self._buffer[:4]) == b"PK\x07\x08" else 0
+        length = offset + struct.calcsize('<LQQ' if entry['zip64'] else '<LLL')
+        if len(self._buffer) < length:
+            return False
+        entry['crc'] = struct.unpack('<L', self._buffer[offset:offset + 4])[0]
+        del self._buffer[:length]
+        entry['state'] = 'finished'
+        return True
+
+    def _finish(self, completed: list):
+        entry, self._entry = self._entry, None
+        if entry['file'] is None:
+            return
+        entry['file'].close()
+        if entry['crc'] is not None and entry['crc'] != entry['running_crc']:
+            os.remove(entry['tmp_path'])
+            raise zipfile.BadZipFile(f"Bad CRC for {entry['name']}")
+        os.replace(entry['tmp_path'], entry['path'])
+        completed.append((entry['name'], entry['path']))
+
+    def _local_path(self, name: str) -> str:
+        # Flatten to the base name so entries can never escape dest_dir
+        base = os.path.basename(name.replace('\\', '/')) or "entry"
+        stem, ext = os.path.splitext(base)
+        candidate, n = base, 1
+        while candidate in self._names:
+            candidate = f"{stem}_{n}{ext}"
+            n += 1
+        self._names.add(candidate)
+        return os.path.join(self.dest_dir, candidate)
+
+# CDN image identity -> extracted original on local disk
+local_originals: Dict[str, str] = {}
+local_originals_lock = threading.Lock()
+
+def local_original(url: str) -> Optional[str]:
+    """Local copy of a CDN image from its listing archive, if one has been extracted"""
+    if not local_originals:
+        return None
+    with local_originals_lock:
+        return local_originals.get(image_identity(url))
+
+def archive_entry_key(name: str) -> str:
+    return os.path.splitext(os.path.basename(name))[0].lower()
+
+def find_archive_url(driver: webdriver.Chrome) -> Optional[str]:
+    """The download-all link on the download-center page, if there is one"""
+    try:
+        return driver.execute_script(
+            "const link = document.querySelector(arguments[0]); return link ? link.href : null;",
+            ARCHIVE_LINK_SELECTOR
+        )
+    except Exception as e:
+        logger.warning(f"Could not look for archive link: {str(e)}")
+        return None
+
+def start_archive_ingest(driver: webdriver.Chrome, listing_url: str, image_urls: List[str]):
+    """Queue the listing archive for ingestion using the scrape's logged-in cookies"""
+    archive_url = find_archive_url(driver)
+    if not archive_url:
+        logger.info("No download-center archive link found, images stay on the CDN")
+        return
+    cookies = {cookie['name']: cookie['value'] for cookie in driver.get_cookies()}
+    listing_id = catalogue_listing_id(listing_url) or hashlib.md5(listing_url.encode()).hexdigest()[:16]
+    archive_executor.submit(ingest_listing_archive, archive_url, listing_id, image_urls, cookies)
+
+def ingest_listing_archive(archive_url: str, listing_id: str, image_urls: List[str],
+                           cookies: Optional[dict] = None) -> int:
+    """
+    Stream the listing's bulk ZIP into DOWNLOAD_DIR/<listing_id>, extracting
+    images as they arrive. Each original whose file name matches a scraped
+    CDN image is registered in local_originals straight away, so fetches of
+    that URL read the local file from then on. Returns the number mapped.
+    """
+    dest_dir = os.path.join(DOWNLOAD_DIR, listing_id)
+    os.makedirs(dest_dir, exist_ok=True)
+    by_key = {archive_entry_key(image_identity(url)): image_identity(url) for url in image_urls}
+    extractor = StreamingZipExtractor(dest_dir, accept=lambda name: name.lower().endswith(ARCHIVE_IMAGE_EXTENSIONS))
+    extracted = 0
+    mapped = set()
+    start = time.perf_counter()
+    try:
+        with trace_span("archive_ingest", listing_id=listing_id) as span, pipeline_stage("archive_download"):
+            with http_client().get(archive_url, cookies=cookies, stream=True, timeout=ARCHIVE_TIMEOUT) as response:
+                response.raise_for_status()
+                for chunk in response.iter_content(ARCHIVE_CHUNK_SIZE):
+                    for name, path in extractor.feed(chunk):
+                        download_store.add(download_store.key_for(path))
+                        extracted += 1
+                        identity = by_key.get(archive_entry_key(name))
+                        if identity is not None:
+                            with local_originals_lock:
+                                local_originals[identity] = path
+                            mapped.add(identity)
+                    if extractor.done:
+                        break
+            span.update(extracted=extracted, mapped=len(mapped))
+    except Exception as e:
+        logger.error(f"Archive ingestion failed for listing {listing_id}: {str(e)}")
+    finally:
+        extractor.close()
+    logger.info(f"📦 Archive for listing {listing_id}: {extracted} originals extracted, "
+                f"{len(mapped)}/{len(image_urls)} CDN images now local ({time.perf_counter() - start:.1f}s)")
+    return len(mapped)
+
+# ============================================================================
+# IMAGE PROCESSING (from document 1)
+# ============================================================================
+
+class LRUCache:
+    """Thread-safe LRU cache that reports hits, misses and bytes held"""
+
+    def __init__(self, name: str, maxsize: int, sizeof=None):
+        self.name = name
+        self.maxsize = maxsize
+        self.sizeof = sizeof or (lambda value: 0)
+        self.bytes = 0
+        self._data: "OrderedDict[str, object]" = OrderedDict()
+        self._lock = threading.Lock()
+        caches_registry.append(self)
+
+    def get(self, key: str):
+        with self._lock:
+            value = self._data.get(key)
+            if value is not None:
+                self._data.move_to_end(key)
+        CACHE_REQUESTS.inc(cache=self.name, result="hit" if value is not None else "miss")
+        return value
+
+    def put(self, key: str, value):
+        with self._lock:
+            previous = self._data.pop(key, None)
+            if previous is not None:
+                self.bytes -= self.sizeof(previous)
+            self._data[key] = value
+            self.bytes += self.sizeof(value)
+            while len(self._data) > self.maxsize:
+                _, evicted = self._data.popitem(last=False)
+                self.bytes -= self.sizeof(evicted)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self.bytes = 0
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+caches_registry: List[LRUCache] = []
+
+def image_nbytes(img: Image.Image) -> int:
+    """Decoded size of a PIL image"""
+    return img.width * img.height * len(img.getbands())
+
+image_cache = LRUCache("image", maxsize=100, sizeof=image_nbytes)
+
+@lru_cache(maxsize=1)
+def http_client():
+    """Shared requests session so CDN fetches reuse keep-alive connections"""
+    session = requests.Session()
+    adapter = requests.adapters.HTTPAdapter(pool_connections=8, pool_maxsize=HTTP_POOL_SIZE)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    session.headers.update({
+        'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
+    })
+    return session
+
+def cdn_variant(url: str) -> Optional[re.Match]:
+    """The /resized/<variant>/ part of a CDN URL, if it names a known variant"""
+    match = re.search(r'/resized/([a-z0-9_]+)/(\1-)?', url) if CDN_ORIGIN in url else None
+    return match if match and match.group(1) in CDN_VARIANTS else None
+
+def with_variant(url: str, match: re.Match, variant: str) -> str:
+    prefix = f"{variant}-" if match.group(2) else ""
+    return f"{url[:match.start()]}/resized/{variant}/{prefix}{url[match.end():]}"
+
+def variant_candidates(url_or_path: str, target: Tuple[int, int]) -> List[str]:
+    """
+    URLs to try for an image shown at target (w, h), smallest first.
+
+    The first is the smallest variant wide enough to cover the target, then
+    every larger variant up to the one the URL names, which is never
+    exceeded. Anything that isn't a known CDN variant URL is used as is.
+    """
+    match = cdn_variant(url_or_path)
+    if match is None:
+        return [url_or_path]
+    needed = max(target[0], target[1] * CDN_VARIANT_ASPECT)
+    names = list(CDN_VARIANTS)
+    named = names.index(match.group(1))
+    chosen = next((idx for idx, name in enumerate(names) if CDN_VARIANTS[name] >= needed), named)
+    return [with_variant(url_or_path, match, name) for name in names[min(chosen, named):named]] + [url_or_path]
+
+def fetch_variant(url_or_path: str, target: Optional[Tuple[int, int]],
+                  timeout: float = CDN_FETCH_BUDGET) -> Tuple[bytes, str]:
+    """
+    Image bytes at the smallest CDN variant covering target, failing over to
+    larger variants, and where they came from (see fetch_image_bytes).
+    """
+    candidates = variant_candidates(url_or_path, target) if target else [url_or_path]
+    for candidate in candidates[:-1]:
+        try:
+            content, source = fetch_image_bytes(candidate, timeout)
+        except requests.HTTPError as e:
+            CDN_VARIANT_FALLBACKS.inc(variant=cdn_variant(candidate).group(1))
+            logger.warning(f"Variant {candidate} unavailable ({str(e)}), trying a larger one")
+            continue
+        record_variant_fetch(url_or_path, source, len(content))
+        return content, source
+    content, source = fetch_image_bytes(candidates[-1], timeout)
+    record_variant_fetch(url_or_path, source, len(content))
+    return content, source
+
+def named_variant_size(size: Tuple[int, int], requested_url: str, fetched_url: str) -> Tuple[int, int]:
+    """
+    The size of the image at requested_url, given the size of a smaller
+    variant fetched in its place. Variants are scaled to their width unless
+    the image is narrower, in which case every variant is the same size.
+    An archive original (a local path) is the real size already.
+    """
+    fetched, requested = cdn_variant(fetched_url), cdn_variant(requested_url)
+    if fetched_url == requested_url or fetched is None or requested is None:
+        return size
+    fetched_width = CDN_VARIANTS[fetched.group(1)]
+    if size[0] < fetched_width:
+        return size
+    scale = CDN_VARIANTS[requested.group(1)] / fetched_width
+    return round(size[0] * scale), round(size[1] * scale)
+
+def record_variant_fetch(requested_url: str, fetched_url: str, nbytes: int):
+    """Count downloaded bytes per variant and estimate what the named variant would have cost"""
+    fetched = cdn_variant(fetched_url)
+    if fetched is None:  # a local archive original, not a download
+        return
+    CDN_VARIANT_BYTES.inc(nbytes, variant=fetched.group(1))
+    if fetched_url != requested_url:
+        # Bytes scale roughly with pixel area
+        ratio = CDN_VARIANTS[cdn_variant(requested_url).group(1)] / CDN_VARIANTS[fetched.group(1)]
+        CDN_VARIANT_SAVED.inc(nbytes * (ratio * ratio - 1), variant=fetched.group(1))
+
+class LatencyWindow:
+    """The most recent latencies, for percentiles"""
+
+    def __init__(self, size: int = 512):
+        self._values = deque(maxlen=size)
+        self._lock = threading.Lock()
+
+    def observe(self, seconds: float):
+        with self._lock:
+            self._values.append(seconds)
+
+    def percentile(self, pct: float) -> Optional[float]:
+        """Nearest-rank percentile, None before the first sample"""
+        with self._lock:
+            values = sorted(self._values)
+        if not values:
+            return None
+        return values[max(0, math.ceil(pct / 100 * len(values)) - 1)]
+
+    def __len__(self) -> int:
+        return len(self._values)
+
+cdn_executor = ThreadPoolExecutor(max_workers=HTTP_POOL_SIZE, thread_name_prefix="cdn")
+# Every request's time to headers sets the hedge delay; the first request of each fetch, whether
+# or not it won, is the tail we'd have without hedging; the answer actually used is the tail we got.
+# All three are timed from when the first request started running, leaving out queueing for a worker
+cdn_request_latency = LatencyWindow()
+cdn_primary_latency = LatencyWindow()
+cdn_fetch_latency = LatencyWindow()
+cdn_fetch_stats = {'fetches': 0, 'hedged': 0, 'hedge_wins': 0, 'hedges_skipped': 0, 'retries': 0, 'failures': 0,
+                   'in_flight': 0}
+cdn_fetch_stats_lock = threading.Lock()
+
+def count_cdn_fetch(stat: str, amount: int = 1):
+    with cdn_fetch_stats_lock:
+        cdn_fetch_stats[stat] += amount
+
+def hedge_allowed() -> bool:
+    """A hedge must start right away on an idle CDN worker and stay within CDN_HEDGE_MAX_SHARE of fetches"""
+    with cdn_fetch_stats_lock:
+        return (cdn_fetch_stats['in_flight'] < HTTP_POOL_SIZE
+                and cdn_fetch_stats['hedged'] < CDN_HEDGE_MAX_SHARE * cdn_fetch_stats['fetches'])
+
+def hedge_delay() -> float:
+    """Time to wait for headers before hedging: recent p95, or a default until there are enough samples"""
+    p95 = cdn_request_latency.percentile(95) if len(cdn_request_latency) >= CDN_HEDGE_MIN_SAMPLES else None
+    return min(max(CDN_HEDGE_DEFAULT_DELAY if p95 is None else p95, CDN_HEDGE_MIN_DELAY), CDN_HEDGE_MAX_DELAY)
+
+def retryable(error: Exception) -> bool:
+    """Connection problems, timeouts, 429 and 5xx are worth another try; other HTTP errors are final"""
+    response = getattr(error, 'response', None)
+    return response is None or response.status_code == 429 or response.status_code >= 500
+
+def request_headers(url: str, deadline: float, started: Optional[Future] = None):
+    """
+    Send one GET and return the response once its headers arrive, body still
+    unread. A fetch's first request is given started, which is resolved with
+    the time it leaves the executor queue.
+    """
+    start = time.monotonic()
+    if started is not None:
+        started.set_result(start)
+    remaining = max(deadline - start, 0.01)
+    try:
+        response = http_client().get(url, timeout=(min(CDN_CONNECT_TIMEOUT, remaining), remaining), stream=True)
+    finally:
+        elapsed = time.monotonic() - start
+        cdn_request_latency.observe(elapsed)
+        if started is not None:
+            cdn_primary_latency.observe(elapsed)
+    try:
+        response.raise_for_status()
+    except Exception:
+        response.close()
+        raise
+    return response
+
+def read_body(response, url: str, deadline: float) -> bytes:
+    """Read a streamed response body, giving up with a Timeout once the deadline passes"""
+    body = bytearray()
+    with response:
+        for chunk in response.iter_content(CDN_READ_CHUNK_SIZE):
+            body += chunk
+            if time.monotonic() > deadline:
+                raise requests.Timeout(f"Body of {url} not read within the fetch budget")
+    return bytes(body)
+
+def submit_cdn_request(url: str, deadline: float, started: Optional[Future] = None) -> Future:
+    """Queue a request on cdn_executor, counted in_flight until it finishes or is cancelled"""
+    count_cdn_fetch('in_flight')
+    future = cdn_executor.submit(request_headers, url, deadline, started)
+    future.add_done_callback(lambda _: count_cdn_fetch('in_flight', -1))
+    return future
+
+def abandon_request(future):
+    """Drop a request that lost the race, closing its connection once it answers"""
+    if not future.cancel():
+        future.add_done_callback(lambda f: f.exception() is None and f.result().close())
+
+def hedged_round(url: str, deadline: float) -> bytes:
+    """One fetch: a request, plus a duplicate if it's slower than the hedge delay; first good answer wins"""
+    started = Future()
+    primary = submit_cdn_request(url, deadline, started)
+    pending, hedge, error = {primary}, None, None
+    hedging = CDN_HEDGE
+    while pending:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            break
+        if hedging and not started.done():
+            # Still queued behind other CDN requests - a hedge would only queue behind them too
+            wait_futures({started, primary}, timeout=remaining, return_when=FIRST_COMPLETED)
+            continue
+        if hedging:
+            remaining = min(remaining, max(hedge_delay() - (time.monotonic() - started.result()), 0))
+        done, pending = wait_futures(pending, timeout=remaining, return_when=FIRST_COMPLETED)
+        for future in done:
+            try:
+                response = future.result()
+            except requests.RequestException as e:
+                if not retryable(e):
+                    for loser in pending:
+                        abandon_request(loser)
+                    raise
+                error = e
+                continue
+            for loser in pending:
+                abandon_request(loser)
+            cdn_fetch_latency.observe(time.monotonic() - started.result())
+            if future is hedge:
+                count_cdn_fetch('hedge_wins')
+            CDN_FETCHES.inc(outcome="hedge" if future is hedge else "primary")
+            return read_body(response, url, deadline)
+        if not done and hedging and time.monotonic() < deadline:
+            hedging = False
+            if not hedge_allowed():
+                count_cdn_fetch('hedges_skipped')
+                continue
+            count_cdn_fetch('hedged')
+            CDN_HEDGES.inc()
+            hedge = submit_cdn_request(url, deadline)
+            pending.add(hedge)
+    for loser in pending:
+        abandon_request(loser)
+    if error is not None:
+        raise error
+    TIMEOUTS.inc(operation="cdn_fetch")
+    raise requests.Timeout(f"No response from {url} within the fetch budget")
+
+def hedged_fetch(url: str, budget: float = CDN_FETCH_BUDGET) -> bytes:
+    """
+    GET a CDN object within budget seconds.
+
+    Each round hedges a slow request (see hedged_round). A failed round is
+    retried after a full-jitter exponential backoff, but only if the backoff
+    plus a typical response still fits in what is left of the budget.
+    """
+    count_cdn_fetch('fetches')
+    deadline = time.monotonic() + budget
+    for attempt in range(CDN_MAX_RETRIES + 1):
+        try:
+            return hedged_round(url, deadline)
+        except requests.RequestException as e:
+            backoff = random.uniform(0, CDN_RETRY_BACKOFF * 2 ** attempt)
+            typical = cdn_request_latency.percentile(50) or CDN_HEDGE_DEFAULT_DELAY
+            if (not retryable(e) or attempt == CDN_MAX_RETRIES
+                    or time.monotonic() + backoff + typical > deadline):
+                count_cdn_fetch('failures')
+                CDN_FETCHES.inc(outcome="failed")
+                raise
+            count_cdn_fetch('retries')
+            RETRIES.inc(operation="cdn_fetch")
+            logger.warning(f"CDN fetch of {url} failed ({str(e)}), retrying in {backoff * 1000:.0f}ms")
+            time.sleep(backoff)
+
+def cdn_fetch_report() -> dict:
+    """Hedging activity and the latency tail with and without it"""
+    with cdn_fetch_stats_lock:
+        stats = dict(cdn_fetch_stats)
+
+    def ms(value):
+        return None if value is None else round(value * 1000, 1)
+
+    p99, unhedged_p99 = cdn_fetch_latency.percentile(99), cdn_primary_latency.percentile(99)
+    return {
+        **stats,
+        'hedge_rate': round(stats['hedged'] / stats['fetches'], 4) if stats['fetches'] else 0.0,
+        'hedge_delay_ms': ms(hedge_delay()),
+        'p50_ms': ms(cdn_fetch_latency.percentile(50)),
+        'p95_ms': ms(cdn_fetch_latency.percentile(95)),
+        'p99_ms': ms(p99),
+        # The first request of every fetch, including ones that lost to a hedge
+        'unhedged_p99_ms': ms(unhedged_p99),
+        'p99_saved_ms': ms(unhedged_p99 - p99) if p99 is not None and unhedged_p99 is not None else None,
+    }
+
+def fetch_image_bytes(url_or_path: str, timeout: float = CDN_FETCH_BUDGET) -> Tuple[bytes, str]:
+    """
+    Read raw image bytes from URL or local path, preferring an extracted
+    archive original, and return where they were read from - the URL, or
+    the original's local path.
+    """
+    if url_or_path.startswith('http'):
+        local_path = local_original(url_or_path)
+        if local_path is not None:
+            try:
+                if download_store.get(download_store.key_for(local_path)) is None:
+                    raise FileNotFoundError(local_path)
+                with open(local_path, 'rb') as f:
+                    return f.read(), local_path
+            except OSError:
+                with local_originals_lock:
+                    local_originals.pop(image_identity(url_or_path), None)
+        return hedged_fetch(url_or_path, timeout), url_or_path
+    with open(url_or_path, 'rb') as f:
+        return f.read(), url_or_path
+
+def download_image(url_or_path: str, cookies_hash: str = None,
+                   target: Optional[Tuple[int, int]] = None) -> Optional[Image.Image]:
+    """Load image from URL or local path, no larger than needed to cover target (w, h) if given"""
+    cache_key = f"{url_or_path}@{target[0]}x{target[1]}" if target else url_or_path
+    with trace_span("download_image", url=url_or_path) as span:
+        img = image_cache.get(cache_key)
+        span['cache'] = "hit" if img is not None else "miss"
+        if img is None:
+            img = _load_image(url_or_path, target, cache_key)
+        return img
+
+def _load_image(url_or_path: str, target: Optional[Tuple[int, int]] = None,
+                cache_key: Optional[str] = None) -> Optional[Image.Image]:
+    try:
+        with pipeline_stage("image_download"):
+            content, _ = fetch_variant(url_or_path, target)
+
+        with pipeline_stage("image_decode"):
+            img = Image.open(io.BytesIO(content))
+            if target:
+                # JPEG draft mode decodes at 1/2, 1/4 or 1/8 scale while still covering the target
+                scale = max(target[0] / img.width, target[1] / img.height)
+                if scale < 1:
+                    img.draft('RGB', (math.ceil(img.width * scale), math.ceil(img.height * scale)))
+            img.load()
+            
+            if img.mode in ('RGBA', 'LA', 'P'):
+                background = Image.new('RGB', img.size, (255, 255, 255))
+                if img.mode == 'P':
+                    img = img.convert('RGBA')
+                background.paste(img, mask=img.split()[-1] if img.mode in ('RGBA', 'LA') else None)
+                img = background
+            elif img.mode != 'RGB':
+                # Grayscale, CMYK and the rest - everything downstream (enhance_tile's tables) expects RGB
+                img = img.convert('RGB')
+
+        image_cache.put(cache_key or url_or_path, img)
+        return img
+    except Exception as e:
+        logger.error(f"Image load error for {url_or_path}: {str(e)}")
+        return None
+
+@lru_cache(maxsize=1024)
+def enhancement_lut(preset: str, mean: int) -> Optional[List[int]]:
+    """
+    Point table (R, G and B) for a preset's contrast and tone, None if it is
+    the identity. Contrast reproduces ImageEnhance.Contrast exactly - a
+    float32 blend with the grey mean, truncated - and tone is applied to its
+    result.
+    """
+    params = ENHANCE_PRESETS[preset]
+    levels = np.arange(256, dtype=np.float32)
+    mean = np.float32(mean)
+    contrasted = np.clip(mean + np.float32(params['contrast']) * (levels - mean), 0, 255).astype(np.uint8)
+    tables = []
+    for gain in (1 + params['warmth'], 1.0, 1 - params['warmth']):
+        if params['brightness'] == 1 and params['gamma'] == 1 and gain == 1:
+            tables.append(contrasted)
+            continue
+        toned = np.clip(contrasted * (params['brightness'] * gain), 0, 255)
+        toned = 255 * (toned / 255) ** (1 / params['gamma'])
+        tables.append(np.rint(toned).astype(np.uint8))
+    lut = np.concatenate(tables)
+    return None if np.array_equal(lut, np.tile(np.arange(256), 3)) else lut.tolist()
+
+@lru_cache(maxsize=16)
+def sharpen_kernel(sharpness: float) -> ImageFilter.Kernel:
+    """
+    ImageEnhance.Sharpness as one 3x3 kernel: the image blended away from its
+    SMOOTH-filtered copy. The offset stands in for the rounding of the smoothed
+    image and the truncating blend, keeping results within one level.
+    """
+    weight = (sharpness - 1) / 13
+    weights = [-weight] * 9
+    weights[4] = sharpness - 5 * weight
+    return ImageFilter.Kernel((3, 3), weights, scale=1, offset=-0.5 + abs(sharpness - 1) / 2)
+
+def enhance_tile(img: Image.Image, preset: str) -> Image.Image:
+    """
+    Apply an ENHANCE_PRESETS preset in at most two passes: one point table
+    for contrast and tone, then one 3x3 kernel for sharpening. Replaces
+    chained ImageEnhance calls, which allocate an intermediate image per step.
+    """
+    params = ENHANCE_PRESETS[preset]
+    mean = 0
+    if params['contrast'] != 1:
+        histogram = img.convert("L").histogram()
+        mean = int(sum(level * count for level, count in enumerate(histogram)) / (img.width * img.height) + 0.5)
+    lut = enhancement_lut(preset, mean)
+    if lut is not None:
+        img = img.point(lut)
+    if params['sharpness'] != 1:
+        img = img.filter(sharpen_kernel(params['sharpness']))
+    return img
+
+FONT_BOLD = "/usr/share/fonts/truetype/dejavu/DejaVuSans-Bold.ttf"
+FONT_REGULAR = "/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf"
+
+# Post template geometry at full size; previews draw the same layout scaled by PREVIEW_SCALE
+POST_SIZE = 1080
+POST_HERO_HEIGHT = 540
+POST_INFO_BAR_HEIGHT = 90  # Slightly increased for better breathing room
+POST_DETAIL_HEIGHT = 270
+POST_BOTTOM_HEIGHT = POST_SIZE - POST_HERO_HEIGHT - POST_INFO_BAR_HEIGHT - POST_DETAIL_HEIGHT
+POST_DARK_GRAY = (20, 20, 20)  # Softer than pure black
+POST_WHITE = (255, 255, 255)
+# Slots of create_social_media_post, the sizes its images are fetched to cover
+POST_HERO_SIZE = (POST_SIZE, POST_HERO_HEIGHT)
+POST_DETAIL_SIZE = (POST_SIZE // 3, POST_DETAIL_HEIGHT)
+
+POST_FONTS = {
+    # Info bar fonts - improved sizes
+    'bold_label': (FONT_BOLD, 20),
+    'bold_value': (FONT_BOLD, 28),
+    'regular_specs': (FONT_REGULAR, 22),
+    'regular_specs_small': (FONT_REGULAR, 18),
+    # Bottom section fonts - better hierarchy
+    'title_large': (FONT_BOLD, 50),
+    # Responsive address fonts
+    'address_large': (FONT_REGULAR, 42),
+    'address_medium': (FONT_REGULAR, 36),
+    'address_small': (FONT_REGULAR, 32),
+}
+
+@lru_cache(maxsize=4)
+def load_post_fonts(scale: float = 1.0) -> dict:
+    """Fonts used by create_social_media_post at a render scale, loaded once per process"""
+    try:
+        return {name: ImageFont.truetype(path, max(1, round(size * scale))) for name, (path, size) in POST_FONTS.items()}
+    except:
+        default = ImageFont.load_default()
+        return {name: default for name in POST_FONTS}
+
+def _wrap_phrases(draw, phrases, font, max_width, separator=" | "):
+    lines = []
+    current = []
+    for phrase in phrases:
+        test = current + [phrase]
+        test_text = separator.join(test)
+        bbox = draw.textbbox((0, 0), test_text, font=font)
+        if bbox[2] - bbox[0] <= max_width:
+            current = test
+        else:
+            if current:
+                lines.append(separator.join(current))
+            current = [phrase]
+    if current:
+        lines.append(separator.join(current))
+    return lines
+
+def _wrap_text(draw, text, font, max_width):
+    words = text.split()
+    lines = []
+    current = ""
+    for word in words:
+        test = current + " " + word if current else word
+        bbox = draw.textbbox((0, 0), test, font=font)
+        if bbox[2] - bbox[0] <= max_width:
+            current = test
+        else:
+            if current:
+                lines.append(current)
+            current = word
+    if current:
+        lines.append(current)
+    return lines
+
+def post_layout(property_info) -> dict:
+    """Text placement of a post at full size, computed once per distinct PropertyInfo"""
+    return _post_layout(property_info.model_dump_json())
+
+@lru_cache(maxsize=256)
+def _post_layout(property_json: str) -> dict:
+    """
+    Every text item of the info bar and the address block as
+    (x, y, text, font name) at full size.
+
+    Wrapping and font choices are made here once, with the full-size fonts,
+    so a scaled-down preview makes exactly the same decisions as the final
+    render and only scales positions and glyph sizes.
+    """
+    property_info = PropertyInfo.model_validate_json(property_json)
+    fonts = load_post_fonts()
+    draw = ImageDraw.Draw(Image.new("RGB", (1, 1)))
+    width = POST_SIZE
+    info_y = POST_HERO_HEIGHT
+    section_width = width // 3
+    margin = 25
+    info = []
+
+    # Left: PRICE (improved hierarchy)
+    price_label = "PRICE:"
+    price_value = "$"+property_info.price
+
+    # Calculate total width for centering
+    label_bbox = draw.textbbox((0, 0), price_label, font=fonts['bold_label'])
+    value_bbox = draw.textbbox((0, 0), price_value, font=fonts['bold_value'])
+    spacing = 8
+    total_width = (label_bbox[2] - label_bbox[0]) + spacing + (value_bbox[2] - value_bbox[0])
+
+    start_x = (section_width - total_width) // 2
+    info.append((start_x, info_y + 25, price_label, 'bold_label'))
+    info.append((start_x, info_y + 45, price_value, 'bold_value'))
+
+    # Middle: SPECS (cleaner separator, better spacing)
+    baths_str = str(int(property_info.bathrooms)) if property_info.bathrooms == int(property_info.bathrooms) else str(property_info.bathrooms)
+    specs_phrases = [
+        f"{property_info.bedrooms} BEDS",
+        f"{baths_str} BATHS",
+        f"{property_info.square_feet:,} SQ FT"
+    ]
+    if property_info.year_built:
+        specs_phrases.append(f"BUILT {property_info.year_built}")
+
+    # Use cleaner separator, smaller font if it needs more than two lines
+    font_used = 'regular_specs'
+    specs_lines = _wrap_phrases(draw, specs_phrases, fonts[font_used], section_width - margin * 2, " · ")
+    if len(specs_lines) > 2:
+        font_used = 'regular_specs_small'
+        specs_lines = _wrap_phrases(draw, specs_phrases, fonts[font_used], section_width - margin * 2, " · ")
+
+    line_height = 28
+    total_text_height = line_height * len(specs_lines)
+    start_y = info_y + (POST_INFO_BAR_HEIGHT - total_text_height) // 2
+    for idx, line in enumerate(specs_lines):
+        line_bbox = draw.textbbox((0, 0), line, font=fonts[font_used])
+        line_x = section_width + (section_width - (line_bbox[2] - line_bbox[0])) // 2
+        info.append((line_x, start_y + idx * line_height, line, font_used))
+
+    # Right: PROPERTY TYPE
+    type_text = property_info.property_type.upper() if property_info.property_type else "MODERN ESTATE"
+    type_bbox = draw.textbbox((0, 0), type_text, font=fonts['bold_value'])
+    type_x = (section_width * 2) + (section_width - (type_bbox[2] - type_bbox[0])) // 2
+    type_y = info_y + (POST_INFO_BAR_HEIGHT - (type_bbox[3] - type_bbox[1])) // 2
+    info.append((type_x, type_y, type_text, 'bold_value'))
+
+    # Bottom: the address sits below where the (currently hidden) title would be
+    bottom_y = POST_SIZE - POST_BOTTOM_HEIGHT
+    title_x = 50
+    title_y = bottom_y + 30
+    title_bbox = draw.textbbox((0, 0), type_text, font=fonts['title_large'])
+    title_height = title_bbox[3] - title_bbox[1]
+
+    # Available height for address (with padding)
+    available_height = POST_BOTTOM_HEIGHT - title_height - 60  # 30 top padding + 30 bottom padding
+    max_width = width - 100  # 50px margin on each side
+
+    address_text = f"{property_info.address}, {property_info.city}, {property_info.state}"
+    if property_info.zip_code:
+        address_text += f" {property_info.zip_code}"
+
+    # Responsive sizing: the largest font whose wrapped lines fit, else the smallest
+    for address_font, line_height in (('address_large', 40), ('address_medium', 34), ('address_small', 28)):
+        address_lines = _wrap_text(draw, address_text, fonts[address_font], max_width)
+        if len(address_lines) * line_height <= available_height:
+            break
+
+    address = []
+    address_y = title_y + title_height
+    for line in address_lines:
+        address.append((title_x, address_y, line, address_font))
+        address_y += line_height+10
+
+    return {'info': info, 'address': address}
+
+def crop_to_aspect(img: Image.Image, target_aspect: float) -> Image.Image:
+    """Centre-crop an image to the given width/height ratio"""
+    if img.width / img.height > target_aspect:
+        new_width = int(img.height * target_aspect)
+        left = (img.width - new_width) // 2
+        return img.crop((left, 0, left + new_width, img.height))
+    new_height = int(img.width / target_aspect)
+    top = (img.height - new_height) // 2
+    return img.crop((0, top, img.width, top + new_height))
+
+def prepare_post_tile(img: Image.Image, slot: str, preview: bool = False) -> Image.Image:
+    """
+    Crop, resize and enhance a source image for the hero or a detail slot.
+
+    Previews are resized with reducing BILINEAR straight to the scaled slot
+    and skip the enhancement passes.
+    """
+    width, height = scaled_size(POST_HERO_SIZE if slot == "hero" else POST_DETAIL_SIZE,
+                                PREVIEW_SCALE if preview else 1.0)
+    # The aspect is taken from the full-size slot so previews crop exactly like the final render
+    full_width, full_height = POST_HERO_SIZE if slot == "hero" else POST_DETAIL_SIZE
+    img = crop_to_aspect(img, full_width / full_height)
+    if preview:
+        return img.resize((width, height), Image.Resampling.BILINEAR, reducing_gap=2.0)
+    img = img.resize((width, height), Image.Resampling.LANCZOS)
+    return enhance_tile(img, slot)
+
+def scaled_size(size: Tuple[int, int], scale: float) -> Tuple[int, int]:
+    return round(size[0] * scale), round(size[1] * scale)
+
+def post_regions(scale: float = 1.0) -> Dict[str, Tuple[int, int, int, int]]:
+    """Boxes (left, top, right, bottom) of the separately drawn parts of a post, which tile the canvas"""
+    detail_top = round((POST_HERO_HEIGHT + POST_INFO_BAR_HEIGHT) * scale)
+    bottom_top = round((POST_SIZE - POST_BOTTOM_HEIGHT) * scale)
+    size = round(POST_SIZE * scale)
+    regions = {
+        'hero': (0, 0, size, round(POST_HERO_HEIGHT * scale)),
+        'info': (0, round(POST_HERO_HEIGHT * scale), size, detail_top),
+    }
+    for idx in range(3):
+        left, right = round(idx * POST_DETAIL_SIZE[0] * scale), round((idx + 1) * POST_DETAIL_SIZE[0] * scale)
+        regions[f"detail{idx}"] = (left, detail_top, right, bottom_top)
+    regions['address'] = (0, bottom_top, size, size)
+    return regions
+
+def draw_post_info_bar(draw: ImageDraw.ImageDraw, layout: dict, scale: float = 1.0, origin: Tuple[int, int] = (0, 0)):
+    """Info bar background and text; origin is the canvas position of what draw paints on"""
+    fonts = load_post_fonts(scale)
+    ox, oy = origin
+    top = round(POST_HERO_HEIGHT * scale)
+    draw.rectangle([(-ox, top - oy),
+                    (round(POST_SIZE * scale) - ox, round((POST_HERO_HEIGHT + POST_INFO_BAR_HEIGHT) * scale) - oy)],
+                   fill=POST_DARK_GRAY)
+    for x, y, text, font in layout['info']:
+        draw.text((round(x * scale) - ox, round(y * scale) - oy), text, fill=POST_WHITE, font=fonts[font])
+
+def draw_post_address(draw: ImageDraw.ImageDraw, layout: dict, scale: float = 1.0, origin: Tuple[int, int] = (0, 0)):
+    """Bottom block background and address lines; origin as for draw_post_info_bar"""
+    fonts = load_post_fonts(scale)
+    ox, oy = origin
+    top = round((POST_SIZE - POST_BOTTOM_HEIGHT) * scale)
+    size = round(POST_SIZE * scale)
+    draw.rectangle([(-ox, top - oy), (size - ox, size - oy)], fill=POST_DARK_GRAY)
+    for x, y, text, font in layout['address']:
+        draw.text((round(x * scale) - ox, round(y * scale) - oy), text, fill=POST_WHITE, font=fonts[font])
+
+def compose_post_canvas(hero_tile: Image.Image, detail_tiles: list, property_info, scale: float = 1.0) -> Image.Image:
+    """Lay prepared tiles and the post's text out on a canvas at the given scale"""
+    layout = post_layout(property_info)
+    size = round(POST_SIZE * scale)
+    canvas = Image.new("RGB", (size, size), POST_WHITE)
+    draw = ImageDraw.Draw(canvas)
+
+    regions = post_regions(scale)
+    canvas.paste(hero_tile, regions['hero'][:2])
+    draw_post_info_bar(draw, layout, scale)
+    if len(detail_tiles) >= 3:
+        for idx, tile in enumerate(detail_tiles[:3]):
+            canvas.paste(tile, regions[f"detail{idx}"][:2])
+    draw_post_address(draw, layout, scale)
+    return canvas
+
+def create_social_media_post(hero_img: Image.Image, detail_imgs: list, property_info,
+                             preview: bool = False) -> Image.Image:
+    """
+    Enhanced real estate social media post with responsive address typography.
+    
+    Typography improvements:
+    - Better font hierarchy with distinct sizes
+    - Improved spacing and letter-spacing for readability
+    - Better contrast and visual balance
+    - Optimized text positioning and alignment
+    - Enhanced readability with proper line heights
+    - Responsive address sizing based on length
+
+    preview renders at PREVIEW_SCALE with cheap resampling and no
+    enhancement, using the same layout as the final render.
+    """
+    hero_tile = prepare_post_tile(hero_img, "hero", preview)
+    detail_tiles = [prepare_post_tile(img, "detail", preview) for img in detail_imgs[:3]] if len(detail_imgs) >= 3 else []
+    return compose_post_canvas(hero_tile, detail_tiles, property_info, PREVIEW_SCALE if preview else 1.0)
+
+def encode_jpeg(img: Image.Image) -> bytes:
+    """Encode a post as a high-quality JPEG"""
+    buffered = io.BytesIO()
+    img.save(buffered, format="JPEG", quality=95, optimize=True)
+    return buffered.getvalue()
+
+def image_to_base64(img: Image.Image) -> str:
+    """Convert PIL Image to base64"""
+    return base64.b64encode(encode_jpeg(img)).decode()
+
+def render_post(hero_image_url: str, detail_images: List[str], property_info) -> str:
+    """Load the selected images, compose the post and return it as base64 JPEG"""
+    with memory_watch("generate", report=False) as usage:
+        final_image = compose_post(hero_image_url, detail_images, property_info)
+        with pipeline_stage("encode"):
+            image_base64 = image_to_base64(final_image)
+        usage['base64_bytes'] = len(image_base64)
+    GENERATE_PEAK.observe(usage['peak_bytes'])
+    return image_base64
+
+def render_post_jpeg(hero_image_url: str, detail_images: List[str], property_info) -> bytes:
+    """Load the selected images, compose the post and return raw JPEG bytes"""
+    final_image = compose_post(hero_image_url, detail_images, property_info)
+    with pipeline_stage("encode"):
+        return encode_jpeg(final_image)
+
+def compose_post(hero_image_url: str, detail_images: List[str], property_info) -> Image.Image:
+    """Load the selected images and lay out the post"""
+    hero_img, detail_imgs = load_post_images(hero_image_url, detail_images)
+    logger.info("Creating composite image")
+    with pipeline_stage("render"):
+        return create_social_media_post(hero_img, detail_imgs, property_info)
+
+def load_post_images(hero_image_url: str, detail_images: List[str], hero_size: Tuple[int, int] = POST_HERO_SIZE,
+                     detail_size: Tuple[int, int] = POST_DETAIL_SIZE) -> Tuple[Image.Image, List[Image.Image]]:
+    """Load the hero and detail images, failing with 400 if any can't be loaded"""
+    logger.info(f"Loading hero image: {hero_image_url}")
+    hero_img = download_image(hero_image_url, target=hero_size)
+    if not hero_img:
+        raise HTTPException(status_code=400, detail="Failed to load hero image")
+
+    detail_imgs = []
+    for idx, path in enumerate(detail_images):
+        logger.info(f"Loading detail image {idx + 1}: {path}")
+        img = download_image(path, target=detail_size)
+        if not img:
+            raise HTTPException(status_code=400, detail=f"Failed to load detail image {idx + 1}")
+        detail_imgs.append(img)
+    return hero_img, detail_imgs
+
+# ============================================================================
+# PREVIEW
+# ============================================================================
+
+preview_tile_cache = LRUCache("preview_tile", maxsize=PREVIEW_TILE_CACHE_SIZE, sizeof=image_nbytes)
+
+def encode_preview_jpeg(img: Image.Image) -> bytes:
+    """Encode a preview quickly: lower quality and no optimisation pass"""
+    buffered = io.BytesIO()
+    img.save(buffered, format="JPEG", quality=PREVIEW_JPEG_QUALITY)
+    return buffered.getvalue()
+
+def preview_tile(url_or_path: str, slot: str) -> Optional[Image.Image]:
+    """A source prepared for a preview slot, cached so repeat previews skip download, decode and resize"""
+    key = f"{slot}@{PREVIEW_SCALE}:{url_or_path}"
+    tile = preview_tile_cache.get(key)
+    if tile is None:
+        target = scaled_size(POST_HERO_SIZE if slot == "hero" else POST_DETAIL_SIZE, PREVIEW_SCALE)
+        img = download_image(url_or_path, target=target)
+        if img is None:
+            return None
+        tile = prepare_post_tile(img, slot, preview=True)
+        preview_tile_cache.put(key, tile)
+    return tile
+
+def render_preview(hero_image_url: str, detail_images: List[str], property_info) -> dict:
+    """Render a reduced-scale preview of the post from cached tiles"""
+    start = time.perf_counter()
+    with pipeline_stage("preview_tiles"):
+        hero_tile = preview_tile(hero_image_url, "hero")
+        if hero_tile is None:
+            raise HTTPException(status_code=400, detail="Failed to load hero image")
+        detail_tiles = []
+        for idx, path in enumerate(detail_images):
+            tile = preview_tile(path, "detail")
+            if tile is None:
+                raise HTTPException(status_code=400, detail=f"Failed to load detail image {idx + 1}")
+            detail_tiles.append(tile)
+    with pipeline_stage("preview_render"):
+        canvas = compose_post_canvas(hero_tile, detail_tiles, property_info, PREVIEW_SCALE)
+    with pipeline_stage("preview_encode"):
+        jpeg = encode_preview_jpeg(canvas)
+    return {
+        'image_base64': base64.b64encode(jpeg).decode(),
+        'width': canvas.width,
+        'height': canvas.height,
+        'elapsed_ms': round((time.perf_counter() - start) * 1000, 1),
+    }
+
+# ============================================================================
+# LIVE EDIT
+# ============================================================================
+
+def edit_tile(url_or_path: str, slot: str, preview: bool) -> Image.Image:
+    """A prepared tile for a live edit, failing with 400 if the image can't be loaded"""
+    if preview:
+        tile = preview_tile(url_or_path, slot)
+    else:
+        img = download_image(url_or_path, target=POST_HERO_SIZE if slot == "hero" else POST_DETAIL_SIZE)
+        tile = prepare_post_tile(img, slot) if img is not None else None
+    if tile is None:
+        raise HTTPException(status_code=400, detail=f"Failed to load {slot} image {url_or_path}")
+    return tile
+
+class LiveEdit:
+    """
+    One post being edited: its prepared tiles, layout and current canvas.
+
+    A change redraws only the regions it affects (see post_regions) - a
+    swapped image repastes one tile, a PropertyInfo edit redraws the info
+    bar and/or address block only if their text actually changed - and
+    each redrawn region is encoded on its own as a patch for the client.
+    """
+
+    def __init__(self, selection: EditStart):
+        self.preview = selection.preview
+        self.scale = PREVIEW_SCALE if selection.preview else 1.0
+        self.lock = threading.Lock()
+        self.version = 0
+        self.touched = time.monotonic()
+        self.urls = {'hero': selection.hero_image_url}
+        self.urls.update({f"detail{idx}": url for idx, url in enumerate(selection.detail_images)})
+        with pipeline_stage("edit_tiles"):
+            self.tiles = {region: edit_tile(url, "hero" if region == "hero" else "detail", self.preview)
+                          for region, url in self.urls.items()}
+        self.property_info = selection.property_info
+        self.layout = post_layout(selection.property_info)
+        with pipeline_stage("edit_composite"):
+            self.canvas = compose_post_canvas(
+                self.tiles['hero'], [self.tiles[f"detail{idx}"] for idx in range(3)], self.property_info, self.scale
+            )
+
+    def apply(self, change: EditChange) -> Tuple[List[str], bool]:
+        """
+        Apply a change and return the regions it redrew and whether the
+        property details changed - fields such as lot_size appear only in
+        the caption, so they can change without redrawing anything.
+        """
+        wanted = {}
+        if change.hero_image_url is not None:
+            wanted['hero'] = change.hero_image_url
+        for idx, url in enumerate(change.detail_images or []):
+            wanted[f"detail{idx}"] = url
+        dirty = [region for region, url in wanted.items() if url != self.urls[region]]
+        with pipeline_stage("edit_tiles"):
+            tiles = {region: edit_tile(wanted[region], "hero" if region == "hero" else "detail", self.preview)
+                     for region in dirty}
+        for region in dirty:
+            self.urls[region] = wanted[region]
+            self.tiles[region] = tiles[region]
+
+        info_changed = change.property_info is not None and change.property_info != self.property_info
+        if info_changed:
+            layout = post_layout(change.property_info)
+            dirty += [region for region in ('info', 'address') if layout[region] != self.layout[region]]
+            self.property_info, self.layout = change.property_info, layout
+
+        with pipeline_stage("edit_composite"):
+            for region in dirty:
+                self.redraw(region)
+        if dirty or info_changed:
+            self.version += 1
+        return dirty, info_changed
+
+    def redraw(self, region: str):
+        box = post_regions(self.scale)[region]
+        if region in self.tiles:
+            self.canvas.paste(self.tiles[region], box[:2])
+            return
+        part = Image.new("RGB", (box[2] - box[0], box[3] - box[1]), POST_WHITE)
+        draw = (draw_post_info_bar if region == "info" else draw_post_address)
+        draw(ImageDraw.Draw(part), self.layout, self.scale, origin=box[:2])
+        self.canvas.paste(part, box[:2])
+
+    def patch(self, region: str) -> EditPatch:
+        box = (0, 0) + self.canvas.size if region == "canvas" else post_regions(self.scale)[region]
+        part = self.canvas.crop(box)
+        encoded = encode_preview_jpeg(part) if self.preview else encode_jpeg(part)
+        return EditPatch(region=region, x=box[0], y=box[1], width=part.width, height=part.height,
+                         image_base64=base64.b64encode(encoded).decode())
+
+class LiveEditStore:
+    """Live edits of this process, dropped after EDIT_SESSION_TTL idle seconds or when over EDIT_SESSION_MAX"""
+
+    def __init__(self, ttl: float, max_edits: int):
+        self.ttl = ttl
+        self.max_edits = max_edits
+        self._edits: "OrderedDict[str, LiveEdit]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def add(self, edit: LiveEdit) -> str:
+        edit_id = uuid.uuid4().hex
+        with self._lock:
+            self._edits[edit_id] = edit
+            while len(self._edits) > self.max_edits:
+                self._edits.popitem(last=False)
+        return edit_id
+
+    def get(self, edit_id: str) -> Optional[LiveEdit]:
+        with self._lock:
+            edit = self._edits.get(edit_id)
+            if edit is None or time.monotonic() - edit.touched > self.ttl:
+                self._edits.pop(edit_id, None)
+                return None
+            edit.touched = time.monotonic()
+            self._edits.move_to_end(edit_id)
+            return edit
+
+    def discard(self, edit_id: str) -> bool:
+        with self._lock:
+            return self._edits.pop(edit_id, None) is not None
+
+    def reap(self) -> List[str]:
+        now = time.monotonic()
+        with self._lock:
+            expired = [edit_id for edit_id, edit in self._edits.items() if now - edit.touched > self.ttl]
+            for edit_id in expired:
+                del self._edits[edit_id]
+        return expired
+
+    def __len__(self) -> int:
+        return len(self._edits)
+
+live_edits = LiveEditStore(EDIT_SESSION_TTL, EDIT_SESSION_MAX)
+
+def start_live_edit(selection: EditStart) -> dict:
+    start = time.perf_counter()
+    edit = LiveEdit(selection)
+    edit_id = live_edits.add(edit)
+    with pipeline_stage("edit_encode"):
+        patches = [edit.patch("canvas")]
+    return live_edit_update(edit_id, edit, patches, True, start)
+
+def update_live_edit(edit_id: str, edit: LiveEdit, change: EditChange) -> dict:
+    start = time.perf_counter()
+    with edit.lock:
+        dirty, info_changed = edit.apply(change)
+        with pipeline_stage("edit_encode"):
+            patches = [edit.patch(region) for region in dirty]
+        return live_edit_update(edit_id, edit, patches, info_changed, start)
+
+def live_edit_update(edit_id: str, edit: LiveEdit, patches: List[EditPatch], with_text: bool, start: float) -> dict:
+    """Response body; caption and hashtags are only included when the property details changed"""
+    return {
+        'edit_id': edit_id,
+        'version': edit.version,
+        'width': edit.canvas.width,
+        'height': edit.canvas.height,
+        'patches': patches,
+        'caption': generate_caption(edit.property_info) if with_text else None,
+        'hashtags': generate_hashtags(edit.property_info) if with_text else None,
+        'elapsed_ms': round((time.perf_counter() - start) * 1000, 1),
+    }
+
+# ============================================================================
+# CAROUSEL
+# ============================================================================
+
+CAROUSEL_SIZE = 1080
+CAROUSEL_STRIP_HEIGHT = 120
+CAROUSEL_DARK = (20, 20, 20)
+CAROUSEL_WHITE = (255, 255, 255)
+
+def fit_cover(img: Image.Image, size: Tuple[int, int]) -> Image.Image:
+    """Centre-crop to the target aspect and resize, like the post layout does"""
+    return crop_to_aspect(img, size[0] / size[1]).resize(size, Image.Resampling.LANCZOS)
+
+def fit_text(draw: ImageDraw.ImageDraw, text: str, font, max_width: int) -> str:
+    """Truncate text with an ellipsis so it fits max_width"""
+    if draw.textlength(text, font=font) <= max_width:
+        return text
+    while text and draw.textlength(text + "…", font=font) > max_width:
+        text = text[:-1]
+    return text.rstrip() + "…"
+
+def listing_specs(property_info) -> str:
+    baths = property_info.bathrooms
+    baths_str = str(int(baths)) if baths == int(baths) else str(baths)
+    return f"{property_info.bedrooms} BEDS · {baths_str} BATHS · {property_info.square_feet:,} SQ FT"
+
+def create_photo_slide(img: Image.Image, property_info, position: int, total: int) -> Image.Image:
+    """Full-width photo with a branded strip: price and address left, specs and slide counter right"""
+    size = CAROUSEL_SIZE
+    photo_height = size - CAROUSEL_STRIP_HEIGHT
+
+    canvas = Image.new("RGB", (size, size), CAROUSEL_DARK)
+    photo = enhance_tile(fit_cover(img, (size, photo_height)), "slide")
+    canvas.paste(photo, (0, 0))
+    draw = ImageDraw.Draw(canvas)
+    draw.rectangle([(0, photo_height), (size, photo_height + 4)], fill=CAROUSEL_WHITE)
+    draw_info_strip(draw, photo_height, property_info, f"{position}/{total}")
+    return canvas
+
+def draw_info_strip(draw: ImageDraw.ImageDraw, top: int, property_info, counter: str = "") -> None:
+    """Price and address on the left, specs and an optional counter on the right"""
+    fonts = load_post_fonts()
+    margin = 40
+    top += 24
+    column = CAROUSEL_SIZE // 2 - margin
+    draw.text((margin, top), "$" + property_info.price, fill=CAROUSEL_WHITE, font=fonts['bold_value'])
+    address = fit_text(draw, f"{property_info.address}, {property_info.city}", fonts['regular_specs'], column)
+    draw.text((margin, top + 44), address, fill=CAROUSEL_WHITE, font=fonts['regular_specs'])
+
+    right = CAROUSEL_SIZE - margin
+    specs = fit_text(draw, listing_specs(property_info), fonts['regular_specs_small'], column)
+    draw.text((right, top + 6), specs, fill=CAROUSEL_WHITE, font=fonts['regular_specs_small'], anchor="ra")
+    if counter:
+        draw.text((right, top + 46), counter, fill=CAROUSEL_WHITE, font=fonts['bold_label'], anchor="ra")
+
+def create_closing_slide(img: Image.Image, property_info) -> Image.Image:
+    """Darkened hero backdrop with the listing summary and a call to action"""
+    size = CAROUSEL_SIZE
+    fonts = load_post_fonts()
+    canvas = ImageEnhance.Brightness(fit_cover(img, (size, size))).enhance(0.3)
+    draw = ImageDraw.Draw(canvas)
+
+    address = f"{property_info.address}, {property_info.city}, {property_info.state} {property_info.zip_code}".strip()
+    lines = [
+        ((property_info.property_type or "Modern Estate").upper(), fonts['title_large'], 70),
+        (fit_text(draw, address, fonts['address_small'], size - 120), fonts['address_small'], 60),
+        ("$" + property_info.price, fonts['bold_value'], 44),
+        (listing_specs(property_info), fonts['regular_specs'], 80),
+        (CAROUSEL_CLOSING_CTA, fonts['bold_label'], 30),
+    ]
+    y = (size - sum(height for _, _, height in lines)) // 2
+    for text, font, height in lines:
+        draw.text((size // 2, y), text, fill=CAROUSEL_WHITE, font=font, anchor="ma")
+        y += height
+    return canvas
+
+def render_slide(create, *args) -> str:
+    with pipeline_stage("render"):
+        slide = create(*args)
+    with pipeline_stage("encode"):
+        return image_to_base64(slide)
+
+async def render_carousel(image_urls: List[str], property_info, client: str) -> List[str]:
+    """
+    Render cover, photo and closing slides as base64 JPEGs.
+
+    Every distinct source is decoded once up front and shared by the slides
+    that use it; the slides then render concurrently on the render pool.
+    Each decode and slide takes its own render slot, as batch posts do.
+    """
+    unique = list(dict.fromkeys(image_urls))
+    target = (CAROUSEL_SIZE, CAROUSEL_SIZE)
+    loaded = await render_in_slots(client, [(download_image, url, None, target) for url in unique])
+    sources = dict(zip(unique, loaded))
+    failed = [str(idx + 1) for idx, url in enumerate(image_urls) if sources[url] is None]
+    if failed:
+        raise HTTPException(status_code=400, detail=f"Failed to load carousel image(s) {', '.join(failed)}")
+
+    images = [sources[url] for url in image_urls]
+    total = len(images) + 2
+    slides = [(create_social_media_post, images[0], images[1:4], property_info)]
+    slides += [(create_photo_slide, img, property_info, idx + 2, total) for idx, img in enumerate(images)]
+    slides.append((create_closing_slide, images[0], property_info))
+    return await render_in_slots(client, [(render_slide, *slide) for slide in slides])
+
+# ============================================================================
+# SLIDESHOW
+# ============================================================================
+
+KEN_BURNS_ZOOM = 1.15
+SLIDESHOW_FADE_SECONDS = 0.5
+
+def slideshow_frame_count(duration: float, fps: int, n_images: int) -> int:
+    """Frames in a slideshow: an equal run per image"""
+    return max(1, round(duration * fps / n_images)) * n_images
+
+@lru_cache(maxsize=1)
+def frame_sequence_class():
+    """
+    Built on first use so PIL stays lazily imported. FrameSequence swaps
+    frames in through Pillow internals, so it is only used once a tiny
+    GIF and WebP round trip shows this Pillow still encodes it correctly;
+    otherwise None, and callers hold the frames in a list instead.
+    """
+
+    class FrameSequence(Image.Image):
+        """
+        Multi-frame image whose frames are pulled from an iterator as the
+        encoder seeks forward, so only the current frame is held here.
+        """
+
+        def __init__(self, frames, n_frames: int):
+            super().__init__()
+            self._frames = frames
+            self.n_frames = n_frames
+            self.is_animated = n_frames > 1
+            self._index = -1
+            self._advance()
+
+        def _advance(self):
+            frame = next(self._frames)
+            self.im = frame.im
+            self._mode = frame.mode
+            self._size = frame.size
+            self._index += 1
+
+        def seek(self, frame: int):
+            if frame >= self.n_frames:
+                raise EOFError("no more frames")
+            # Encoders rewind to the start when done; earlier frames are gone, so that's a no-op
+            while self._index < frame:
+                self._advance()
+
+        def tell(self) -> int:
+            return self._index
+
+    try:
+        frame_sequence_round_trip(FrameSequence)
+    except Exception as e:
+        logger.warning(f"⚠️ Streaming frames unsupported by this Pillow ({str(e)}), slideshows hold every frame")
+        return None
+    return FrameSequence
+
+def frame_sequence_round_trip(sequence_class):
+    """Encode three solid frames through sequence_class as GIF and WebP and check they decode back"""
+    colours = [(255, 0, 0), (0, 255, 0), (0, 0, 255)]
+    for image_format, options in (("GIF", {}), ("WEBP", {'lossless': True})):
+        frames = sequence_class(iter([Image.new("RGB", (8, 8), colour) for colour in colours]), len(colours))
+        buffered = io.BytesIO()
+        frames.save(buffered, format=image_format, save_all=True, duration=100, loop=0, **options)
+        decoded = Image.open(buffered)
+        if decoded.n_frames != len(colours):
+            raise ValueError(f"{image_format} came back with {decoded.n_frames} frames, not {len(colours)}")
+        for index, colour in enumerate(colours):
+            decoded.seek(index)
+            if decoded.convert("RGB").getpixel((4, 4)) != colour:
+                raise ValueError(f"{image_format} frame {index} came back the wrong colour")
+
+def create_info_overlay(property_info, width: int) -> Image.Image:
+    """Translucent info strip drawn once at full scale and resized to the slideshow width"""
+    overlay = Image.new("RGBA", (CAROUSEL_SIZE, CAROUSEL_STRIP_HEIGHT), CAROUSEL_DARK + (200,))
+    draw_info_strip(ImageDraw.Draw(overlay), 0, property_info)
+    if width != CAROUSEL_SIZE:
+        overlay = overlay.resize((width, round(CAROUSEL_STRIP_HEIGHT * width / CAROUSEL_SIZE)), Image.Resampling.LANCZOS)
+    return overlay
+
+def ken_burns_frame(tile: Image.Image, size: Tuple[int, int], t: float, zoom_in: bool) -> Image.Image:
+    """Crop a drifting, zooming window out of a pre-scaled tile; t runs 0 to 1"""
+    progress = t if zoom_in else 1 - t
+    zoom = 1 + (KEN_BURNS_ZOOM - 1) * progress
+    window_w, window_h = tile.width / zoom, tile.height / zoom
+    left = (tile.width - window_w) * (0.25 + 0.5 * progress)
+    top = (tile.height - window_h) / 2
+    return tile.resize(size, Image.Resampling.BILINEAR, box=(left, top, left + window_w, top + window_h))
+
+def slideshow_frames(tiles: List[Image.Image], overlay: Image.Image, size: Tuple[int, int],
+                     frames_per_image: int, fade_frames: int, timings: dict):
+    """
+    Yield slideshow frames one at a time: pan and zoom across each tile,
+    cross-fading into the next (wrapping round so the loop is seamless),
+    with the static overlay pasted on top. Time spent here is added to
+    timings['render'] so the caller can separate it from encoding.
+    """
+    overlay_y = size[1] - overlay.height
+    for idx, tile in enumerate(tiles):
+        zoom_in = idx % 2 == 0
+        next_start = None
+        for f in range(frames_per_image):
+            start = time.perf_counter()
+            frame = ken_burns_frame(tile, size, f / frames_per_image, zoom_in)
+            fade_step = f - (frames_per_image - fade_frames) + 1
+            if fade_step > 0:
+                if next_start is None:
+                    next_start = ken_burns_frame(tiles[(idx + 1) % len(tiles)], size, 0, (idx + 1) % 2 == 0)
+                frame = Image.blend(frame, next_start, fade_step / (fade_frames + 1))
+            frame.paste(overlay, (0, overlay_y), overlay)
+            timings['render'] += time.perf_counter() - start
+            yield frame
+
+def render_slideshow(request: SlideshowRequest) -> dict:
+    """Render an animated WebP/GIF pan-and-zoom across the selected images"""
+    size = (request.size, request.size)
+    tile_size = (round(size[0] * KEN_BURNS_ZOOM), round(size[1] * KEN_BURNS_ZOOM))
+    hero_img, detail_imgs = load_post_images(request.hero_image_url, request.detail_images, tile_size, tile_size)
+    timings = {'render': 0.0}
+
+    start = time.perf_counter()
+    with pipeline_stage("slideshow_tiles"):
+        tiles = [enhance_tile(fit_cover(img, tile_size), "slide") for img in [hero_img] + detail_imgs]
+        overlay = create_info_overlay(request.property_info, size[0])
+    timings['render'] += time.perf_counter() - start
+
+    n_frames = slideshow_frame_count(request.duration, request.fps, len(tiles))
+    frames_per_image = n_frames // len(tiles)
+    fade_frames = min(frames_per_image - 1, round(SLIDESHOW_FADE_SECONDS * request.fps))
+    frame_iter = slideshow_frames(tiles, overlay, size, frames_per_image, fade_frames, timings)
+    sequence_class = frame_sequence_class()
+    if sequence_class is not None:
+        frames, extra = sequence_class(frame_iter, n_frames), {}
+    else:
+        # SlideshowRequest's megapixel budget bounds what this holds
+        frames, *rest = list(frame_iter)
+        extra = {'append_images': rest}
+
+    # Frames are rendered inside save() as the encoder pulls them, so encode time is what's left over
+    buffered = io.BytesIO()
+    prepare_seconds = timings['render']
+    start = time.perf_counter()
+    frame_ms = round(1000 / request.fps)
+    if request.format == "webp":
+        frames.save(buffered, format="WEBP", save_all=True, duration=frame_ms, loop=0,
+                    quality=SLIDESHOW_WEBP_QUALITY, method=4, **extra)
+    else:
+        # The GIF writer keeps palettised copies of every frame to compute deltas
+        frames.save(buffered, format="GIF", save_all=True, duration=frame_ms, loop=0, **extra)
+    encode_seconds = time.perf_counter() - start - (timings['render'] - prepare_seconds)
+
+    STAGE_SECONDS.observe(timings['render'], stage="slideshow_render")
+    STAGE_SECONDS.observe(encode_seconds, stage="slideshow_encode")
+    logger.info(f"Slideshow: {n_frames} frames, {buffered.tell() / 1024:.0f}KB {request.format}, "
+                f"render {timings['render']:.2f}s, encode {encode_seconds:.2f}s")
+    return {
+        'image_base64': base64.b64encode(buffered.getvalue()).decode(),
+        'format': request.format,
+        'width': size[0],
+        'height': size[1],
+        'frames': n_frames,
+        'fps': request.fps,
+        'render_ms': round(timings['render'] * 1000, 1),
+        'encode_ms': round(encode_seconds * 1000, 1),
+    }
+
+# ============================================================================
+# BATCH GENERATION
+# ============================================================================
+
+class ZipStreamSink(io.RawIOBase):
+    """Write-only, unseekable sink for zipfile whose bytes are drained as they arrive"""
+
+    def __init__(self):
+        self._chunks: List[bytes] = []
+        self._offset = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        self._offset += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._offset
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+def slugify(text: str) -> str:
+    return re.sub(r'[^a-z0-9]+', '-', text.lower()).strip('-')[:60] or "post"
+
+def render_batch_job(index: int, job: ImageSelection) -> dict:
+    """Render one batch job; failures are returned rather than raised"""
+    start = time.perf_counter()
+    try:
+        jpeg = render_post_jpeg(job.hero_image_url, job.detail_images, job.property_info)
+        return {
+            'index': index,
+            'ok': True,
+            'jpeg': jpeg,
+            'caption': generate_caption(job.property_info),
+            'hashtags': generate_hashtags(job.property_info),
+            'ms': round((time.perf_counter() - start) * 1000, 1),
+        }
+    except Exception as e:
+        detail = e.detail if isinstance(e, HTTPException) else str(e)
+        logger.error(f"Batch job {index + 1} failed: {detail}")
+        return {'index': index, 'ok': False, 'error': detail, 'ms': round((time.perf_counter() - start) * 1000, 1)}
+
+def write_batch_entry(archive: zipfile.ZipFile, job: ImageSelection, result: dict) -> dict:
+    """Add a rendered post, its caption and hashtags to the archive"""
+    folder = f"{result['index'] + 1:03d}_{slugify(job.property_info.address)}"
+    now = datetime.now().timetuple()[:6]
+    entry = {'index': result['index'] + 1, 'session_id': job.session_id, 'ok': result['ok'], 'ms': result['ms']}
+    if not result['ok']:
+        entry['error'] = result['error']
+        return entry
+    # JPEGs are already compressed, so store them and only deflate the text
+    archive.writestr(zipfile.ZipInfo(f"{folder}/post.jpg", now), result['jpeg'], compress_type=zipfile.ZIP_STORED)
+    archive.writestr(zipfile.ZipInfo(f"{folder}/caption.txt", now), result['caption'], compress_type=zipfile.ZIP_DEFLATED)
+    archive.writestr(zipfile.ZipInfo(f"{folder}/hashtags.txt", now), "\n".join(result['hashtags']),
+                     compress_type=zipfile.ZIP_DEFLATED)
+    entry['folder'] = folder
+    return entry
+
+async def acquire_render_slot(client: str):
+    """
+    Wait for a render slot, backing off while the render queue is full.
+    Gives up with the last rejection after RENDER_SLOT_MAX_WAIT seconds.
+    """
+    deadline = time.monotonic() + RENDER_SLOT_MAX_WAIT
+    while True:
+        try:
+            await render_admission.acquire(client)
+            return
+        except HTTPException as e:
+            backoff = int(e.headers.get("Retry-After", "1"))
+            if time.monotonic() + backoff > deadline:
+                raise
+            await asyncio.sleep(backoff)
+
+def submit_in_slot(fn, *args) -> asyncio.Future:
+    """Start fn on the render pool under an already acquired render slot, freed when it finishes"""
+    start = time.perf_counter()
+    task = asyncio.ensure_future(run_in_worker(render_executor, fn, *args))
+    task.add_done_callback(lambda _: render_admission.release(time.perf_counter() - start))
+    return task
+
+async def render_in_slots(client: str, calls: List[tuple]) -> list:
+    """
+    Run (fn, *args) calls on the render pool, each under its own render
+    slot, and return their results in order. Slots are taken one at a time,
+    so a request never queues more than one waiter.
+    """
+    tasks = []
+    for fn, *args in calls:
+        await acquire_render_slot(client)
+        tasks.append(submit_in_slot(fn, *args))
+    return await asyncio.gather(*tasks)
+
+async def stream_batch_zip(jobs: List[ImageSelection], client: str):
+    """
+    Render jobs in parallel and yield ZIP bytes as each post finishes.
+
+    At most BATCH_WINDOW jobs are in flight and each finished post is written
+    and dropped straight away, so memory stays flat however large the batch.
+    Posts are admitted one slot at a time through render_admission, so other
+    clients keep their turn while a big batch runs.
+    """
+    sink = ZipStreamSink()
+    archive = zipfile.ZipFile(sink, mode="w")
+    manifest = []
+    pending = set()
+    upcoming = iter(enumerate(jobs))
+    start = time.perf_counter()
+    gave_up = None
+
+    async def submit_next() -> bool:
+        nonlocal gave_up
+        item = next(upcoming, None)
+        if item is None:
+            return False
+        if gave_up is None:
+            try:
+                await acquire_render_slot(client)
+                pending.add(submit_in_slot(render_batch_job, *item))
+                return True
+            except HTTPException as e:
+                # No capacity freed up in time - fail the rest of the batch rather than stall the stream
+                gave_up = e.detail
+                logger.error(f"Batch gave up waiting for render capacity at job {item[0] + 1}: {gave_up}")
+        failed = asyncio.get_running_loop().create_future()
+        failed.set_result({'index': item[0], 'ok': False, 'error': gave_up, 'ms': 0.0})
+        pending.add(failed)
+        return True
+
+    try:
+        with IN_FLIGHT.track_inprogress(operation="batch"):
+            while len(pending) < BATCH_WINDOW and await submit_next():
+                pass
+            while pending:
+                done, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    pending.discard(task)
+                    result = task.result()
+                    manifest.append(write_batch_entry(archive, jobs[result['index']], result))
+                    yield sink.drain()
+                    await submit_next()
+
+        archive.writestr("manifest.json", json.dumps({
+            'jobs': sorted(manifest, key=lambda entry: entry['index']),
+            'succeeded': sum(entry['ok'] for entry in manifest),
+            'failed': sum(not entry['ok'] for entry in manifest),
+            'elapsed_ms': round((time.perf_counter() - start) * 1000, 1),
+        }, indent=2))
+        archive.close()
+        yield sink.drain()
+        logger.info(f"Batch of {len(jobs)} posts streamed in {time.perf_counter() - start:.1f}s")
+    finally:
+        if pending:
+            # Client went away - the in-flight renders finish in the pool and free their slots on their own
+            logger.warning(f"Batch abandoned with {len(pending)} posts still rendering")
+
+# ============================================================================
+# AUTO SELECTION
+# ============================================================================
+
+# Target aspect ratios of the post slots (see create_social_media_post)
+HERO_ASPECT = 1080 / 540
+DETAIL_ASPECT = 360 / 270
+
+# Score weights; diversity is subtracted for each detail pick
+SCORE_WEIGHTS = {
+    'sharpness': 0.40,
+    'exposure': 0.25,
+    'colourfulness': 0.15,
+    'aspect': 0.20,
+}
+DIVERSITY_PENALTY = 0.35
+
+proxy_cache = LRUCache("proxy", maxsize=512, sizeof=lambda proxy: proxy[0].nbytes)
+
+def load_image_proxy(url_or_path: str) -> Optional[tuple]:
+    """Load a small RGB proxy for scoring, returns (pixels, original_size)"""
+    proxy = proxy_cache.get(url_or_path)
+    if proxy is not None:
+        return proxy
+    try:
+        with pipeline_stage("proxy_download"):
+            # Scoring only needs the aspect ratio, so the smallest variant will do; original_size
+            # is scaled back up to the variant the URL names, which is what probes record
+            proxy_w, proxy_h = AUTO_SELECT_PROXY_SIZE
+            content, source = fetch_variant(url_or_path, (proxy_w * 2, proxy_h * 2), timeout=10)
+        img = Image.open(io.BytesIO(content))
+        original_size = named_variant_size(img.size, url_or_path, source)
+        # JPEG draft mode decodes at a reduced DCT scale, far cheaper than a full decode
+        img.draft('RGB', (proxy_w * 2, proxy_h * 2))
+        img = img.convert('RGB').resize(AUTO_SELECT_PROXY_SIZE, Image.Resampling.BILINEAR)
+        pixels = np.asarray(img, dtype=np.uint8)
+        pixels.setflags(write=False)
+        proxy_cache.put(url_or_path, (pixels, original_size))
+        return pixels, original_size
+    except Exception as e:
+        logger.warning(f"Proxy load error for {url_or_path}: {str(e)}")
+        return None
+
+def perceptual_hash(pixels: np.ndarray) -> str:
+    """64-bit DCT perceptual hash of an RGB proxy, as 16 hex chars"""
+    gray = Image.fromarray(pixels).convert('L').resize((32, 32), Image.Resampling.BILINEAR)
+    dct = _dct_matrix(32)
+    coefficients = dct @ np.asarray(gray, dtype=np.float32) @ dct.T
+    low = coefficients[:8, :8].flatten()
+    bits = low > np.median(low[1:])
+    return f"{int(''.join('1' if bit else '0' for bit in bits), 2):016x}"
+
+@lru_cache(maxsize=4)
+def _dct_matrix(n: int) -> np.ndarray:
+    k = np.arange(n)[:, None]
+    matrix = np.cos(np.pi * (2 * np.arange(n)[None, :] + 1) * k / (2 * n)) * np.sqrt(2 / n)
+    matrix[0] /= np.sqrt(2)
+    return matrix.astype(np.float32)
+
+def probe_image(url_or_path: str) -> Optional[dict]:
+    """Dimensions of the image the URL names (not the variant proxied) and perceptual hash, from the proxy"""
+    proxy = load_image_proxy(url_or_path)
+    if proxy is None:
+        return None
+    pixels, (width, height) = proxy
+    return {'width': width, 'height': height, 'phash': perceptual_hash(pixels)}
+
+def _crop_retention(aspects: np.ndarray, target_aspect: float) -> np.ndarray:
+    """Fraction of each image kept by a centre crop to target_aspect"""
+    return np.minimum(aspects, target_aspect) / np.maximum(aspects, target_aspect)
+
+def _normalise(values: np.ndarray) -> np.ndarray:
+    """Min-max scale a score vector to [0, 1] within the batch"""
+    spread = values.max() - values.min()
+    if spread < 1e-9:
+        return np.ones_like(values)
+    return (values - values.min()) / spread
+
+def score_images(pixels: np.ndarray, sizes: np.ndarray) -> Dict[str, np.ndarray]:
+    """
+    Score a batch of proxies in one vectorised pass.
+
+    pixels is (N, H, W, 3) uint8, sizes is (N, 2) original (width, height).
+    Every score is normalised to [0, 1], higher is better.
+    """
+    rgb = pixels.astype(np.float32)
+    r, g, b = rgb[..., 0], rgb[..., 1], rgb[..., 2]
+    gray = 0.299 * r + 0.587 * g + 0.114 * b
+
+    # Sharpness - variance of the 4-neighbour Laplacian
+    laplacian = (4 * gray[:, 1:-1, 1:-1]
+                 - gray[:, :-2, 1:-1] - gray[:, 2:, 1:-1]
+                 - gray[:, 1:-1, :-2] - gray[:, 1:-1, 2:])
+    sharpness = _normalise(np.log1p(laplacian.var(axis=(1, 2))))
+
+    # Exposure - mid-tone mean with a penalty for clipped shadows/highlights
+    mean_luma = gray.mean(axis=(1, 2)) / 255.0
+    clipped = ((gray < 8) | (gray > 247)).mean(axis=(1, 2))
+    exposure = np.clip(1.0 - 2.0 * np.abs(mean_luma - 0.5) - 2.0 * clipped, 0.0, 1.0)
+
+    # Colourfulness - Hasler & Suesstrunk opponent colour metric
+    rg = r - g
+    yb = 0.5 * (r + g) - b
+    colourfulness = _normalise(
+        np.sqrt(rg.std(axis=(1, 2)) ** 2 + yb.std(axis=(1, 2)) ** 2)
+        + 0.3 * np.sqrt(rg.mean(axis=(1, 2)) ** 2 + yb.mean(axis=(1, 2)) ** 2)
+    )
+
+    aspects = sizes[:, 0] / np.maximum(sizes[:, 1], 1)
+
+    return {
+        'sharpness': sharpness,
+        'exposure': exposure,
+        'colourfulness': colourfulness,
+        'hero_aspect': _crop_retention(aspects, HERO_ASPECT),
+        'detail_aspect': _crop_retention(aspects, DETAIL_ASPECT),
+    }
+
+def similarity_matrix(pixels: np.ndarray) -> np.ndarray:
+    """Cosine similarity between coarse 8x6 colour layouts of each proxy"""
+    n, h, w, _ = pixels.shape
+    blocks = pixels.astype(np.float32).reshape(n, 6, h // 6, 8, w // 8, 3).mean(axis=(2, 4))
+    features = blocks.reshape(n, -1)
+    features -= features.mean(axis=1, keepdims=True)
+    features /= np.linalg.norm(features, axis=1, keepdims=True) + 1e-6
+    return features @ features.T
+
+def auto_select_images(image_urls: List[str], detail_count: int = 3) -> dict:
+    """Pick a hero and detail images from a listing by batch scoring proxies"""
+    start = time.perf_counter()
+
+    with pipeline_stage("proxy_load"):
+        proxies = list(proxy_executor.map(load_image_proxy, image_urls))
+    urls = [url for url, proxy in zip(image_urls, proxies) if proxy is not None]
+    proxies = [proxy for proxy in proxies if proxy is not None]
+    if len(urls) < detail_count + 1:
+        raise ValueError(f"Need at least {detail_count + 1} loadable images, got {len(urls)}")
+
+    pixels = np.stack([proxy[0] for proxy in proxies])
+    sizes = np.array([proxy[1] for proxy in proxies], dtype=np.float32)
+    with pipeline_stage("score"):
+        scores = score_images(pixels, sizes)
+        similarity = similarity_matrix(pixels)
+
+    quality = (SCORE_WEIGHTS['sharpness'] * scores['sharpness']
+               + SCORE_WEIGHTS['exposure'] * scores['exposure']
+               + SCORE_WEIGHTS['colourfulness'] * scores['colourfulness'])
+    hero_score = quality + SCORE_WEIGHTS['aspect'] * scores['hero_aspect']
+    detail_score = quality + SCORE_WEIGHTS['aspect'] * scores['detail_aspect']
+
+    # Greedy maximal-marginal-relevance: each pick is penalised by its
+    # closest resemblance to what has already been chosen
+    picked = [int(np.argmax(hero_score))]
+    diversity = np.zeros(len(urls), dtype=np.float32)
+    for _ in range(detail_count):
+        closest = similarity[:, picked].max(axis=1)
+        candidate = detail_score - DIVERSITY_PENALTY * np.clip(closest, 0.0, 1.0)
+        candidate[picked] = -np.inf
+        choice = int(np.argmax(candidate))
+        diversity[choice] = 1.0 - max(float(closest[choice]), 0.0)
+        picked.append(choice)
+
+    breakdown = {
+        urls[idx]: {
+            'sharpness': round(float(scores['sharpness'][idx]), 4),
+            'exposure': round(float(scores['exposure'][idx]), 4),
+            'colourfulness': round(float(scores['colourfulness'][idx]), 4),
+            'aspect_fit': round(float(scores['hero_aspect' if pos == 0 else 'detail_aspect'][idx]), 4),
+            'diversity': round(float(diversity[idx]), 4) if pos else 1.0,
+            'total': round(float(hero_score[idx] if pos == 0 else detail_score[idx]), 4),
+        }
+        for pos, idx in enumerate(picked)
+    }
+
+    return {
+        'hero_image_url': urls[picked[0]],
+        'detail_images': [urls[idx] for idx in picked[1:]],
+        'scores': breakdown,
+        'scored': len(urls),
+        'elapsed_ms': round((time.perf_counter() - start) * 1000, 1),
+    }
+
+# ============================================================================
+# SESSION MANAGEMENT
+# ============================================================================
+
+def connect_sqlite(path: str) -> sqlite3.Connection:
+    """Open an autocommit SQLite connection in WAL mode"""
+    conn = sqlite3.connect(path, timeout=10, isolation_level=None, check_same_thread=False)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    return conn
+
+class SessionBackend(ABC):
+    """
+    Dict-like session storage with TTL expiry and a max-session cap.
+
+    Values are JSON-serialisable dicts. Backends may hand out copies, so
+    write a mutated session back with backend[session_id] = data.
+    """
+
+    @abstractmethod
+    def __setitem__(self, session_id: str, data: dict): ...
+
+    @abstractmethod
+    def __getitem__(self, session_id: str) -> dict: ...
+
+    @abstractmethod
+    def __delitem__(self, session_id: str): ...
+
+    @abstractmethod
+    def __len__(self) -> int: ...
+
+    @abstractmethod
+    def items(self) -> List[tuple]: ...
+
+    @abstractmethod
+    def clear(self): ...
+
+    @abstractmethod
+    def reap(self) -> List[str]:
+        """Drop expired sessions, returns the removed session IDs"""
+
+    def get(self, session_id: str, default=None) -> Optional[dict]:
+        try:
+            return self[session_id]
+        except KeyError:
+            return default
+
+    def __contains__(self, session_id: str) -> bool:
+        return self.get(session_id) is not None
+
+    def close(self):
+        """Release resources at shutdown"""
+
+class MemorySessionBackend(SessionBackend):
+    """
+    In-process session dict ordered by expiry, with LRU eviction past a size cap.
+
+    Entries live in an OrderedDict kept in access order (for O(1) lookup and
+    LRU eviction) plus a min-heap of (expires_at, session_id) on the monotonic
+    clock. Reaping pops only the expired heap head, so its cost is proportional
+    to the number of expired sessions; heap entries left behind by deletes and
+    overwrites are skipped lazily.
+    """
+
+    def __init__(self, ttl: timedelta, max_sessions: int):
+        self.ttl = ttl.total_seconds()
+        self.max_sessions = max_sessions
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._expiry: list = []
+        self._lock = threading.Lock()
+
+    def __setitem__(self, session_id: str, data: dict):
+        expires_at = time.monotonic() + self.ttl
+        with self._lock:
+            self._entries[session_id] = (expires_at, data)
+            self._entries.move_to_end(session_id)
+            heapq.heappush(self._expiry, (expires_at, session_id))
+            while len(self._entries) > self.max_sessions:
+                evicted, _ = self._entries.popitem(last=False)
+                logger.info(f"Evicted least recently used session: {evicted}")
+
+    def __getitem__(self, session_id: str) -> dict:
+        with self._lock:
+            expires_at, data = self._entries[session_id]
+            if expires_at <= time.monotonic():
+                del self._entries[session_id]
+                raise KeyError(session_id)
+            self._entries.move_to_end(session_id)
+            return data
+
+    def __contains__(self, session_id: str) -> bool:
+        entry = self._entries.get(session_id)
+        return entry is not None and entry[0] > time.monotonic()
+
+    def __delitem__(self, session_id: str):
+        with self._lock:
+            del self._entries[session_id]
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def items(self) -> List[tuple]:
+        now = time.monotonic()
+        with self._lock:
+            return [(sid, data) for sid, (expires_at, data) in self._entries.items() if expires_at > now]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._expiry.clear()
+
+    def reap(self) -> List[str]:
+        now = time.monotonic()
+        removed = []
+        with self._lock:
+            while self._expiry and self._expiry[0][0] <= now:
+                expires_at, sid = heapq.heappop(self._expiry)
+                entry = self._entries.get(sid)
+                if entry is not None and entry[0] == expires_at:
+                    del self._entries[sid]
+                    removed.append(sid)
+            # Compact once stale heap entries dominate
+            if len(self._expiry) > 2 * len(self._entries) + 64:
+                self._expiry = [(expires_at, sid) for sid, (expires_at, _) in self._entries.items()]
+                heapq.heapify(self._expiry)
+        return removed
+
+    def close(self):
+        self.clear()
+
+class SQLiteSessionBackend(SessionBackend):
+    """
+    On-disk session table shared by every worker process on the host.
+
+    Uses WAL mode so readers never block the single writer, one connection
+    per thread, and wall-clock expiry timestamps so all processes agree.
+    """
+
+    def __init__(self, path: str, ttl: timedelta, max_sessions: int):
+        self.path = path
+        self.ttl = ttl.total_seconds()
+        self.max_sessions = max_sessions
+        self._local = threading.local()
+
+    def _conn(self) -> sqlite3.Connection:
+        # The database is created by the first connection, not at import
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = self._local.conn = connect_sqlite(self.path)
+            conn.executescript("""
+                CREATE TABLE IF NOT EXISTS sessions (
+                    session_id TEXT PRIMARY KEY,
+                    data TEXT NOT NULL,
+                    expires_at REAL NOT NULL,
+                    last_access REAL NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS idx_sessions_expires_at ON sessions (expires_at);
+                CREATE INDEX IF NOT EXISTS idx_sessions_last_access ON sessions (last_access);
+            """)
+        return conn
+
+    def __setitem__(self, session_id: str, data: dict):
+        now = time.time()
+        conn = self._conn()
+        conn.execute(
+            "INSERT OR REPLACE INTO sessions (session_id, data, expires_at, last_access) VALUES (?, ?, ?, ?)",
+            (session_id, json.dumps(data), now + self.ttl, now)
+        )
+        excess = conn.execute("SELECT COUNT(*) FROM sessions").fetchone()[0] - self.max_sessions
+        if excess > 0:
+            conn.execute(
+                "DELETE FROM sessions WHERE session_id IN "
+                "(SELECT session_id FROM sessions ORDER BY last_access LIMIT ?)",
+                (excess,)
+            )
+            logger.info(f"Evicted {excess} least recently used session(s)")
+
+    def __getitem__(self, session_id: str) -> dict:
+        now = time.time()
+        conn = self._conn()
+        row = conn.execute(
+            "SELECT data FROM sessions WHERE session_id = ? AND expires_at > ?", (session_id, now)
+        ).fetchone()
+        if row is None:
+            raise KeyError(session_id)
+        conn.execute("UPDATE sessions SET last_access = ? WHERE session_id = ?", (now, session_id))
+        return json.loads(row[0])
+
+    def __contains__(self, session_id: str) -> bool:
+        return self._conn().execute(
+            "SELECT 1 FROM sessions WHERE session_id = ? AND expires_at > ?", (session_id, time.time())
+        ).fetchone() is not None
+
+    def __delitem__(self, session_id: str):
+        if self._conn().execute("DELETE FROM sessions WHERE session_id = ?", (session_id,)).rowcount == 0:
+            raise KeyError(session_id)
+
+    def __len__(self) -> int:
+        return self._conn().execute(
+            "SELECT COUNT(*) FROM sessions WHERE expires_at > ?", (time.time(),)
+        ).fetchone()[0]
+
+    def items(self) -> List[tuple]:
+        rows = self._conn().execute(
+            "SELECT session_id, data FROM sessions WHERE expires_at > ? ORDER BY last_access", (time.time(),)
+        ).fetchall()
+        return [(sid, json.loads(data)) for sid, data in rows]
+
+    def clear(self):
+        self._conn().execute("DELETE FROM sessions")
+
+    def reap(self) -> List[str]:
+        now = time.time()
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            removed = [row[0] for row in conn.execute(
+                "SELECT session_id FROM sessions WHERE expires_at <= ?", (now,)
+            )]
+            conn.execute("DELETE FROM sessions WHERE expires_at <= ?", (now,))
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return removed
+
+    def close(self):
+        # Other workers still use the shared table, so only drop our connection
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+def create_session_backend() -> SessionBackend:
+    """Build the session backend selected by SESSION_BACKEND"""
+    if SESSION_BACKEND == "sqlite":
+        return SQLiteSessionBackend(SESSION_DB_PATH, SESSION_TTL, SESSION_MAX)
+    if SESSION_BACKEND != "memory":
+        raise ValueError(f"Unknown SESSION_BACKEND: {SESSION_BACKEND}")
+    if WORKERS > 1:
+        logger.warning("In-memory sessions are per process; use SESSION_BACKEND=sqlite with multiple workers")
+    return MemorySessionBackend(SESSION_TTL, SESSION_MAX)
+
+sessions = create_session_backend()
+
+def clean_expired_sessions():
+    """Remove expired sessions"""
+    for sid in sessions.reap():
+        logger.info(f"Cleaned expired session: {sid}")
+    for edit_id in live_edits.reap():
+        logger.info(f"Dropped idle live edit: {edit_id}")
+
+def drop_session(session_id: str) -> bool:
+    """Delete a session, returns False if it did not exist"""
+    if session_id not in sessions:
+        return False
+    del sessions[session_id]
+    return True
+
+async def load_session(session_id: str) -> Optional[dict]:
+    """A session's data, or None if it is unknown or expired; the backend call runs on the store pool"""
+    return await run_in_worker(store_executor, sessions.get, session_id)
+
+async def reap_sessions_periodically():
+    """Background task reaping expired sessions off the request path"""
+    while True:
+        await asyncio.sleep(SESSION_REAP_INTERVAL)
+        try:
+            await run_in_worker(store_executor, clean_expired_sessions)
+        except Exception as e:
+            logger.error(f"Session reaper error: {str(e)}")
+
+# ============================================================================
+# LISTING CATALOGUE
 # ============================================================================
 
-@lru_cache(maxsize=100)
-def download_image(url_or_path: str, cookies_hash: str = None) -> Optional[Image.Image]:
-    """Load image from URL or local path"""
+class ListingCatalogue:
+    """
+    Persistent record of scraped listings, keyed by Aryeo listing ID.
+
+    Holds the current image set of each listing with probed dimensions and
+    perceptual hashes, plus a history of scrapes with their durations.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+
+    def _conn(self) -> sqlite3.Connection:
+        # The database is created by the first connection, not at import
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = self._local.conn = connect_sqlite(self.path)
+            conn.row_factory = sqlite3.Row
+            conn.executescript("""
+                CREATE TABLE IF NOT EXISTS listings (
+                    listing_id TEXT PRIMARY KEY,
+                    listing_url TEXT NOT NULL,
+                    first_scraped_at REAL NOT NULL,
+                    last_scraped_at REAL NOT NULL,
+                    scrape_duration_ms REAL,
+                    image_count INTEGER NOT NULL
+                );
+                CREATE TABLE IF NOT EXISTS images (
+                    listing_id TEXT NOT NULL,
+                    image_url TEXT NOT NULL,
+                    position INTEGER NOT NULL,
+                    width INTEGER,
+                    height INTEGER,
+                    phash TEXT,
+                    first_seen REAL NOT NULL,
+                    last_seen REAL NOT NULL,
+                    PRIMARY KEY (listing_id, image_url)
+                );
+                CREATE TABLE IF NOT EXISTS scrapes (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    listing_id TEXT NOT NULL,
+                    scraped_at REAL NOT NULL,
+                    duration_ms REAL,
+                    image_count INTEGER NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS idx_listings_recent ON listings (last_scraped_at DESC);
+                CREATE INDEX IF NOT EXISTS idx_images_url ON images (image_url);
+                CREATE INDEX IF NOT EXISTS idx_images_phash ON images (phash);
+                CREATE INDEX IF NOT EXISTS idx_scrapes_listing ON scrapes (listing_id, scraped_at DESC);
+            """)
+        return conn
+
+    def record_scrape(self, listing_id: str, listing_url: str, image_urls: List[str], duration_ms: float):
+        """Store a scrape result, replacing the listing's image set"""
+        now = time.time()
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute("""
+                INSERT INTO listings (listing_id, listing_url, first_scraped_at, last_scraped_at, scrape_duration_ms, image_count)
+                VALUES (?, ?, ?, ?, ?, ?)
+                ON CONFLICT (listing_id) DO UPDATE SET
+                    listing_url = excluded.listing_url,
+                    last_scraped_at = excluded.last_scraped_at,
+                    scrape_duration_ms = excluded.scrape_duration_ms,
+                    image_count = excluded.image_count
+            """, (listing_id, listing_url, now, now, duration_ms, len(image_urls)))
+            conn.executemany("""
+                INSERT INTO images (listing_id, image_url, position, first_seen, last_seen)
+                VALUES (?, ?, ?, ?, ?)
+                ON CONFLICT (listing_id, image_url) DO UPDATE SET
+                    position = excluded.position,
+                    last_seen = excluded.last_seen
+            """, [(listing_id, url, position, now, now) for position, url in enumerate(image_urls)])
+            conn.execute("DELETE FROM images WHERE listing_id = ? AND last_seen < ?", (listing_id, now))
+            conn.execute(
+                "INSERT INTO scrapes (listing_id, scraped_at, duration_ms, image_count) VALUES (?, ?, ?, ?)",
+                (listing_id, now, duration_ms, len(image_urls))
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def update_probes(self, listing_id: str, probes: Dict[str, dict]):
+        """Store probed dimensions and hashes for images of a listing"""
+        self._conn().executemany(
+            "UPDATE images SET width = ?, height = ?, phash = ? WHERE listing_id = ? AND image_url = ?",
+            [(p['width'], p['height'], p['phash'], listing_id, url) for url, p in probes.items()]
+        )
+
+    def get_listing(self, listing_id: str) -> Optional[dict]:
+        conn = self._conn()
+        listing = conn.execute("SELECT * FROM listings WHERE listing_id = ?", (listing_id,)).fetchone()
+        if listing is None:
+            return None
+        images = conn.execute(
+            "SELECT image_url, width, height, phash, first_seen, last_seen FROM images "
+            "WHERE listing_id = ? ORDER BY position", (listing_id,)
+        ).fetchall()
+        scrapes = conn.execute(
+            "SELECT scraped_at, duration_ms, image_count FROM scrapes "
+            "WHERE listing_id = ? ORDER BY scraped_at DESC LIMIT 10", (listing_id,)
+        ).fetchall()
+        return {**dict(listing), 'images': [dict(row) for row in images], 'scrapes': [dict(row) for row in scrapes]}
+
+    def find_image(self, image_url: str) -> List[dict]:
+        """Listings that contain the given image URL"""
+        return [dict(row) for row in self._conn().execute(
+            "SELECT listing_id, position, width, height, phash, last_seen FROM images WHERE image_url = ?",
+            (image_url,)
+        )]
+
+    def recent(self, limit: int = 20) -> List[dict]:
+        return [dict(row) for row in self._conn().execute(
+            "SELECT * FROM listings ORDER BY last_scraped_at DESC LIMIT ?", (limit,)
+        )]
+
+catalogue = ListingCatalogue(CATALOGUE_DB_PATH)
+
+def catalogue_listing_id(listing_url: str) -> Optional[str]:
+    """Listing ID for the catalogue, None when the URL carries no ID"""
     try:
-        if url_or_path.startswith('http'):
-            headers = {
-                'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
-            }
-            response = requests.get(url_or_path, headers=headers, timeout=30)
-            response.raise_for_status()
-            content = response.content
-        else:
-            with open(url_or_path, 'rb') as f:
-                content = f.read()
-        
-        img = Image.open(io.BytesIO(content))
-        
-        if img.mode in ('RGBA', 'LA', 'P'):
-            background = Image.new('RGB', img.size, (255, 255, 255))
-            if img.mode == 'P':
-                img = img.convert('RGBA')
-            background.paste(img, mask=img.split()[-1] if img.mode in ('RGBA', 'LA') else None)
-            img = background
-        
-        return img
-    except Exception as e:
-        logger.error(f"Image load error for {url_or_path}: {str(e)}")
+        return extract_id_from_url(listing_url)
+    except ValueError:
         return None
 
-def create_social_media_post(hero_img: Image.Image, detail_imgs: list, property_info) -> Image.Image:
+def record_listing_scrape(listing_id: str, listing_url: str, image_urls: List[str],
+                          duration_ms: float) -> Tuple[Optional[dict], List[str]]:
     """
-    Enhanced real estate social media post with responsive address typography.
-    
-    Typography improvements:
-    - Better font hierarchy with distinct sizes
-    - Improved spacing and letter-spacing for readability
-    - Better contrast and visual balance
-    - Optimized text positioning and alignment
-    - Enhanced readability with proper line heights
-    - Responsive address sizing based on length
+    Diff a scrape against the catalogue and record it. Returns the changes
+    (None on a first scrape) and the images that still need probing.
     """
-    width, height = 1080, 1080
-    
-    # ==========================================
-    # COLOR PALETTE
-    # ==========================================
-    BLACK = (0, 0, 0)
-    WHITE = (255, 255, 255)
-    DARK_GRAY = (20, 20, 20)  # Softer than pure black
-    
-    # ==========================================
-    # LAYOUT DIMENSIONS
-    # ==========================================
-    HERO_HEIGHT = 540
-    INFO_BAR_HEIGHT = 90  # Slightly increased for better breathing room
-    DETAIL_HEIGHT = 270
-    BOTTOM_HEIGHT = height - HERO_HEIGHT - INFO_BAR_HEIGHT - DETAIL_HEIGHT
-    
-    # ==========================================
-    # LOAD FONTS WITH BETTER HIERARCHY
-    # ==========================================
-    try:
-        # Info bar fonts - improved sizes
-        font_bold_label = ImageFont.truetype("/usr/share/fonts/truetype/dejavu/DejaVuSans-Bold.ttf", 20)
-        font_bold_value = ImageFont.truetype("/usr/share/fonts/truetype/dejavu/DejaVuSans-Bold.ttf", 28)
-        font_regular_specs = ImageFont.truetype("/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf", 22)
-        font_regular_specs_small = ImageFont.truetype("/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf", 18)
-        
-        # Bottom section fonts - better hierarchy
-        font_title_large = ImageFont.truetype("/usr/share/fonts/truetype/dejavu/DejaVuSans-Bold.ttf", 50)
-        
-        # Responsive address fonts
-        font_address_large = ImageFont.truetype("/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf", 42)
-        font_address_medium = ImageFont.truetype("/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf", 36)
-        font_address_small = ImageFont.truetype("/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf", 32)
-    except:
-        font_bold_label = font_bold_value = font_regular_specs = font_title_large = ImageFont.load_default()
-        font_regular_specs_small = ImageFont.load_default()
-        font_address_large = font_address_medium = font_address_small = ImageFont.load_default()
-    
-    # Create canvas
-    canvas = Image.new("RGB", (width, height), WHITE)
-    draw = ImageDraw.Draw(canvas)
-    
-    # ==========================================
-    # HELPER FUNCTIONS
-    # ==========================================
-    def wrap_phrases(draw, phrases, font, max_width, separator=" | "):
-        lines = []
-        current = []
-        for phrase in phrases:
-            test = current + [phrase]
-            test_text = separator.join(test)
-            bbox = draw.textbbox((0, 0), test_text, font=font)
-            if bbox[2] - bbox[0] <= max_width:
-                current = test
-            else:
-                if current:
-                    lines.append(separator.join(current))
-                current = [phrase]
-        if current:
-            lines.append(separator.join(current))
-        return lines
-    
-    def wrap_text(draw, text, font, max_width):
-        words = text.split()
-        lines = []
-        current = ""
-        for word in words:
-            test = current + " " + word if current else word
-            bbox = draw.textbbox((0, 0), test, font=font)
-            if bbox[2] - bbox[0] <= max_width:
-                current = test
-            else:
-                if current:
-                    lines.append(current)
-                current = word
-        if current:
-            lines.append(current)
-        return lines
-    
-    def get_responsive_address_font(draw, text, max_width, available_height):
-        """Choose the best font size that fits the address in the available space."""
-        fonts = [
-            (font_address_large, 40),  # (font, line_height)
-            (font_address_medium, 34),
-            (font_address_small, 28)
-        ]
-        
-        for font, line_height in fonts:
-            lines = wrap_text(draw, text, font, max_width)
-            total_height = len(lines) * line_height
-            if total_height <= available_height:
-                return font, lines, line_height
-        
-        # If still doesn't fit, return smallest with lines
-        return font_address_small, wrap_text(draw, text, font_address_small, max_width), 28
-    
-    # ==========================================
-    # HERO IMAGE
-    # ==========================================
-    hero_aspect = hero_img.width / hero_img.height
-    target_aspect = width / HERO_HEIGHT
-    if hero_aspect > target_aspect:
-        new_width = int(hero_img.height * target_aspect)
-        left = (hero_img.width - new_width) // 2
-        hero_img = hero_img.crop((left, 0, left + new_width, hero_img.height))
+    previous = catalogue.get_listing(listing_id)
+    if previous:
+        changes = diff_image_sets([image['image_url'] for image in previous['images']], image_urls)
+        changes['previous_scraped_at'] = datetime.fromtimestamp(previous['last_scraped_at']).isoformat()
+        to_probe = changes['added'] + changes['changed']
+        logger.info(f"Re-scrape of {listing_id}: {len(changes['added'])} added, "
+                    f"{len(changes['changed'])} changed, {len(changes['removed'])} removed, "
+                    f"{len(changes['unchanged'])} unchanged")
     else:
-        new_height = int(hero_img.width / target_aspect)
-        top = (hero_img.height - new_height) // 2
-        hero_img = hero_img.crop((0, top, hero_img.width, top + new_height))
-    
-    hero_img = hero_img.resize((width, HERO_HEIGHT), Image.Resampling.LANCZOS)
-    hero_img = ImageEnhance.Contrast(hero_img).enhance(1.1)
-    hero_img = ImageEnhance.Sharpness(hero_img).enhance(1.1)
-    canvas.paste(hero_img, (0, 0))
-    
-    # ==========================================
-    # INFO BAR (IMPROVED TYPOGRAPHY)
-    # ==========================================
-    info_y = HERO_HEIGHT
-    draw.rectangle([(0, info_y), (width, info_y + INFO_BAR_HEIGHT)], fill=DARK_GRAY)
-    
-    section_width = width // 3
-    margin = 25
-    
-    # Left: PRICE (improved hierarchy)
-    price_label = "PRICE:"
-    price_value = "$"+property_info.price
-    
-    # Calculate total width for centering
-    label_bbox = draw.textbbox((0, 0), price_label, font=font_bold_label)
-    value_bbox = draw.textbbox((0, 0), price_value, font=font_bold_value)
-    spacing = 8
-    total_width = (label_bbox[2] - label_bbox[0]) + spacing + (value_bbox[2] - value_bbox[0])
-    
-    start_x = (section_width - total_width) // 2
-    label_y = info_y + 25
-    value_y = info_y + 45
-    
-    draw.text((start_x, label_y), price_label, fill=WHITE, font=font_bold_label)
-    draw.text((start_x, value_y), price_value, fill=WHITE, font=font_bold_value)
-    
-    # Middle: SPECS (cleaner separator, better spacing)
-    baths_str = str(int(property_info.bathrooms)) if property_info.bathrooms == int(property_info.bathrooms) else str(property_info.bathrooms)
-    specs_phrases = [
-        f"{property_info.bedrooms} BEDS",
-        f"{baths_str} BATHS",
-        f"{property_info.square_feet:,} SQ FT"
-    ]
-    if property_info.year_built:
-        specs_phrases.append(f"BUILT {property_info.year_built}")
+        changes = None
+        to_probe = image_urls
+    catalogue.record_scrape(listing_id, listing_url, image_urls, duration_ms)
+    return changes, to_probe
 
-    
-    # Use cleaner separator
-    specs_lines = wrap_phrases(draw, specs_phrases, font_regular_specs, section_width - margin * 2, " · ")
-    
-    # Adjust font if needed
-    if len(specs_lines) > 2:
-        specs_lines = wrap_phrases(draw, specs_phrases, font_regular_specs_small, section_width - margin * 2, " · ")
-        font_used = font_regular_specs_small
-    else:
-        font_used = font_regular_specs
-    
-    line_height = 28
-    total_text_height = line_height * len(specs_lines)
-    start_y = info_y + (INFO_BAR_HEIGHT - total_text_height) // 2
-    
-    for idx, line in enumerate(specs_lines):
-        line_bbox = draw.textbbox((0, 0), line, font=font_used)
-        line_x = section_width + (section_width - (line_bbox[2] - line_bbox[0])) // 2
-        draw.text((line_x, start_y + idx * line_height), line, fill=WHITE, font=font_used)
-    
-    # Right: PROPERTY TYPE
-    type_text = property_info.property_type.upper() if property_info.property_type else "MODERN ESTATE"
-    type_bbox = draw.textbbox((0, 0), type_text, font=font_bold_value)
-    type_x = (section_width * 2) + (section_width - (type_bbox[2] - type_bbox[0])) // 2
-    type_y = info_y + (INFO_BAR_HEIGHT - (type_bbox[3] - type_bbox[1])) // 2
-    draw.text((type_x, type_y), type_text, fill=WHITE, font=font_bold_value)
-    
-    # ==========================================
-    # DETAIL IMAGES
-    # ==========================================
-    detail_y = info_y + INFO_BAR_HEIGHT
-    detail_width = width // 3
-    if len(detail_imgs) >= 3:
-        for idx, img in enumerate(detail_imgs[:3]):
-            target_aspect = detail_width / DETAIL_HEIGHT
-            img_aspect = img.width / img.height
-            if img_aspect > target_aspect:
-                new_width = int(img.height * target_aspect)
-                left = (img.width - new_width) // 2
-                img = img.crop((left, 0, left + new_width, img.height))
-            else:
-                new_height = int(img.width / target_aspect)
-                top = (img.height - new_height) // 2
-                img = img.crop((0, top, img.width, top + new_height))
-            
-            img = img.resize((detail_width, DETAIL_HEIGHT), Image.Resampling.LANCZOS)
-            img = ImageEnhance.Contrast(img).enhance(1.1)
-            canvas.paste(img, (idx * detail_width, detail_y))
-    
-    # ==========================================
-    # BOTTOM SECTION (RESPONSIVE ADDRESS)
-    # ==========================================
-    bottom_y = detail_y + DETAIL_HEIGHT
-    draw.rectangle([(0, bottom_y), (width, height)], fill=DARK_GRAY)
-    
-    # Title with better spacing
-    title_text = type_text
-    title_x = 50
-    title_y = bottom_y + 30
-    
-    # Calculate available space for address
-    title_bbox = draw.textbbox((0, 0), title_text, font=font_title_large)
-    title_height = title_bbox[3] - title_bbox[1]
-    
-    # Available height for address (with padding)
-    available_height = BOTTOM_HEIGHT - title_height - 60  # 30 top padding + 30 bottom padding
-    max_width = width - 100  # 50px margin on each side
-    
-    # Address with responsive sizing
-    address_text = f"{property_info.address}, {property_info.city}, {property_info.state}"
-    if property_info.zip_code:
-        address_text += f" {property_info.zip_code}"
-    
-    # Get the best fitting font and wrapped lines
-    address_font, address_lines, line_height = get_responsive_address_font(
-        draw, address_text, max_width, available_height
-    )
-    
-    # Draw title
-    # draw.text((title_x, title_y), title_text, fill=WHITE, font=font_title_large)
-    
-    # Draw address with responsive font
-    address_y = title_y + title_height 
-    
-    for line in address_lines:
-        draw.text((title_x, address_y), line, fill=WHITE, font=address_font)
-        address_y += line_height+10
-    
-    return canvas
-def image_to_base64(img: Image.Image) -> str:
-    """Convert PIL Image to base64"""
-    buffered = io.BytesIO()
-    img.save(buffered, format="JPEG", quality=95, optimize=True)
-    return base64.b64encode(buffered.getvalue()).decode()
+def probe_listing_images(listing_id: str, image_urls: List[str]):
+    """Probe dimensions and perceptual hashes in the background and store them"""
+    start = time.perf_counter()
+    probes = {
+        url: probe
+        for url, probe in zip(image_urls, proxy_executor.map(probe_image, image_urls))
+        if probe is not None
+    }
+    catalogue.update_probes(listing_id, probes)
+    logger.info(f"Probed {len(probes)}/{len(image_urls)} images for listing {listing_id} "
+                f"in {(time.perf_counter() - start) * 1000:.0f}ms")
 
 # ============================================================================
-# SESSION MANAGEMENT
+# WARM-UP
 # ============================================================================
 
-def clean_expired_sessions():
-    """Remove expired sessions"""
-    now = datetime.now()
-    expired = [
-        sid for sid, data in sessions.items()
-        if now - datetime.fromisoformat(data['timestamp']) > SESSION_TTL
-    ]
-    for sid in expired:
-        del sessions[sid]
-        logger.info(f"Cleaned expired session: {sid}")
+warmup_state = {'ready': False, 'started_at': None, 'finished_at': None, 'steps': {}}
+
+def warm_render():
+    """Dry-run the post template so fonts, codecs and the render path are loaded"""
+    load_post_fonts()
+    sample = PropertyInfo(
+        price="500,000", bedrooms=3, bathrooms=2, square_feet=1800,
+        address="1 Warm Up Lane", city="Austin", state="TX", zip_code="78701"
+    )
+    tile = Image.new("RGB", (1200, 800), (128, 128, 128))
+    image_to_base64(create_social_media_post(tile, [tile, tile, tile], sample))
+    score_images(np.zeros((4, 96, 128, 3), dtype=np.uint8), np.ones((4, 2), dtype=np.float32))
+
+def warm_cdn():
+    """Open keep-alive connections to the CDN in parallel"""
+    with ThreadPoolExecutor(max_workers=WARMUP_CDN_CONNECTIONS) as pool:
+        list(pool.map(lambda _: http_client().head(CDN_ORIGIN, timeout=5), range(WARMUP_CDN_CONNECTIONS)))
+
+def warm_drivers():
+    """Import Selenium and pre-launch the driver pool"""
+    import selenium.webdriver  # noqa: F401
+    if DRIVER_POOL_SIZE:
+        driver_pool.fill(prelogin=WARMUP_PRELOGIN)
+
+def _run_warm_step(name: str, step):
+    start = time.perf_counter()
+    try:
+        step()
+        warmup_state['steps'][name] = {'ok': True}
+    except Exception as e:
+        logger.warning(f"Warm-up step {name} failed: {str(e)}")
+        warmup_state['steps'][name] = {'ok': False, 'error': str(e)}
+    warmup_state['steps'][name]['ms'] = round((time.perf_counter() - start) * 1000, 1)
+
+async def run_warm_up():
+    """Warm the instance, then mark it ready; failed steps are reported, not fatal"""
+    warmup_state['started_at'] = datetime.now().isoformat()
+    loop = asyncio.get_running_loop()
+    steps = {'render': warm_render, 'cdn': warm_cdn, 'drivers': warm_drivers}
+    try:
+        await asyncio.wait_for(
+            asyncio.gather(*(loop.run_in_executor(None, _run_warm_step, name, step) for name, step in steps.items())),
+            timeout=WARMUP_TIMEOUT
+        )
+    except asyncio.TimeoutError:
+        logger.warning(f"Warm-up did not finish within {WARMUP_TIMEOUT}s, marking ready anyway")
+    warmup_state['finished_at'] = datetime.now().isoformat()
+    warmup_state['ready'] = True
+    logger.info(f"Warm-up complete: {warmup_state['steps']}")
 
 # ============================================================================
 # API ENDPOINTS
 # ============================================================================
 
+@app.middleware("http")
+async def trace_requests(request: Request, call_next):
+    """Give every API request a trace ID and a root span"""
+    if request.url.path in TRACE_SKIP_PATHS or request.url.path.startswith("/debug/"):
+        return await call_next(request)
+
+    # The ID ends up in blob store paths, so only a plain hex/UUID value is adopted
+    trace_id = request.headers.get("X-Trace-Id", "")
+    if not re.fullmatch(r"[0-9a-f-]{8,64}", trace_id):
+        trace_id = uuid.uuid4().hex
+    token = current_trace_id.set(trace_id)
+    try:
+        label = f"{request.method} {request.url.path}"
+        with trace_span(label) as span:
+            with memory_watch(label) as usage:
+                response = await call_next(request)
+            span['status_code'] = response.status_code
+            span['rss_delta_bytes'] = usage['rss_delta_bytes']
+    finally:
+        current_trace_id.reset(token)
+    response.headers["X-Trace-Id"] = trace_id
+    return response
+
+@app.middleware("http")
+async def profile_requests(request: Request, call_next):
+    """Profile a single request when an admin asks for it"""
+    if not profiling_requested(request):
+        return await call_next(request)
+    if not is_admin(request):
+        return JSONResponse(status_code=403, content={"detail": "Profiling requires a valid admin token"})
+    if profile_lock.locked():
+        return JSONResponse(status_code=409, content={"detail": "Another request is being profiled"})
+
+    async with profile_lock:
+        session = ProfileSession(uuid.uuid4().hex[:12])
+        token = current_profile.set(session)
+        session.start()
+        try:
+            # The event loop thread is profiled too, so concurrent requests
+            # interleaving on it will show up in this profile
+            with session.profile_thread():
+                response = await call_next(request)
+        finally:
+            current_profile.reset(token)
+            summary = await asyncio.get_running_loop().run_in_executor(None, session.finish)
+    logger.info(f"Stored profile {summary['profile_id']} for {request.method} {request.url.path}")
+    response.headers["X-Profile-Id"] = summary['profile_id']
+    return response
+
 @app.options("/scrape")
 async def options_scrape():
     return JSONResponse(
@@ -835,25 +4405,55 @@ async def options_scrape():
 
 @app.get("/health")
 def health_check():
-    clean_expired_sessions()
     return {
         "status": "healthy",
         "timestamp": datetime.now().isoformat(),
         "active_sessions": len(sessions)
     }
 
+def create_session(listing_url: str, image_urls: List[str], changes: Optional[dict] = None) -> ScrapedImages:
+    """Store a new session for a listing's images"""
+    session_id = uuid.uuid4().hex
+    sessions[session_id] = {
+        'images': image_urls,
+        'listing_url': listing_url,
+        'timestamp': datetime.now().isoformat()
+    }
+    logger.info(f"Session {session_id} created with {len(image_urls)} images")
+
+    return ScrapedImages(
+        session_id=session_id,
+        images=image_urls[:50],
+        listing_url=listing_url,
+        total_found=len(image_urls),
+        changes=ScrapeChanges(**changes) if changes else None
+    )
+
+@app.get("/metrics")
+def metrics():
+    """Prometheus metrics for every pipeline stage"""
+    memory_report()
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
+
+@app.get("/ready")
+def readiness_check():
+    """Readiness for load balancers - 503 until warm-up has finished"""
+    return JSONResponse(status_code=200 if warmup_state['ready'] else 503, content=warmup_state)
+
 @app.post("/scrape", response_model=ScrapedImages)
-async def scrape_listing(request: ListingURLRequest):
+async def scrape_listing(request: ListingURLRequest, background_tasks: BackgroundTasks, http_request: Request):
     """Scrape images from Aryeo listing with authentication"""
-    driver = None
     try:
-        session_id = f"session_{int(time.time())}_{hash(str(request.listing_url)) % 10000}"
+        listing_url = str(request.listing_url)
+        logger.info(f"Starting scrape for listing: {listing_url}")
+        start = time.perf_counter()
         
-        logger.info(f"Starting scrape for session: {session_id}")
-        driver = init_driver()  
-        
-        # Scrape with login
-        remote_urls = scrape_listing_images(driver, str(request.listing_url))
+        # Scrape with login, once a Chrome slot is free
+        async with scrape_admission.slot(client_id(http_request)):
+            with IN_FLIGHT.track_inprogress(operation="scrape"):
+                remote_urls = await run_in_worker(scrape_executor, run_scrape, listing_url)
+        duration_ms = (time.perf_counter() - start) * 1000
+        IMAGES_FOUND.observe(len(remote_urls))
         
         if not remote_urls:
             raise HTTPException(status_code=404, detail="No images found in listing")
@@ -861,62 +4461,38 @@ async def scrape_listing(request: ListingURLRequest):
         # Convert to original high-res URLs
         original_urls = [get_original_url(url) for url in remote_urls]
         
-        # No download here for speed
-        
-        # Store session
-        sessions[session_id] = {
-            'images': original_urls,
-            'listing_url': str(request.listing_url),
-            'timestamp': datetime.now().isoformat()
-        }
-        
-        logger.info(f"Session {session_id} created with {len(original_urls)} images")
+        # No download here for speed - probing for the catalogue runs after the response,
+        # and only for images that are new or changed since the previous scrape
+        changes = None
+        listing_id = catalogue_listing_id(listing_url)
+        if listing_id:
+            changes, to_probe = await run_in_worker(
+                store_executor, record_listing_scrape, listing_id, listing_url, original_urls, duration_ms
+            )
+            if to_probe:
+                background_tasks.add_task(probe_listing_images, listing_id, to_probe)
         
-        return ScrapedImages(
-            session_id=session_id,
-            images=original_urls[:50],
-            listing_url=str(request.listing_url),
-            total_found=len(original_urls)
-        )
+        return await run_in_worker(store_executor, create_session, listing_url, original_urls, changes)
     
     except HTTPException:
         raise
     except Exception as e:
         logger.error(f"Scraping failed: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Scraping failed: {str(e)}")
-    finally:
-        if driver:
-            try:
-                driver.quit()
-            except:
-                pass
 
 @app.post("/generate", response_model=GeneratedContent)
-async def generate_content(request: ImageSelection):
+async def generate_content(request: ImageSelection, http_request: Request):
     """Generate social media content from selected images"""
     try:
-        if request.session_id not in sessions:
+        session_data = await load_session(request.session_id)
+        if session_data is None:
             raise HTTPException(status_code=404, detail="Session not found or expired")
         
-        session_data = sessions[request.session_id]
-        
-        logger.info(f"Loading hero image: {request.hero_image_url}")
-        hero_img = download_image(request.hero_image_url)
-        if not hero_img:
-            raise HTTPException(status_code=400, detail="Failed to load hero image")
-        
-        detail_imgs = []
-        for idx, path in enumerate(request.detail_images):
-            logger.info(f"Loading detail image {idx + 1}: {path}")
-            img = download_image(path)
-            if not img:
-                raise HTTPException(status_code=400, detail=f"Failed to load detail image {idx + 1}")
-            detail_imgs.append(img)
-        
-        logger.info("Creating composite image")
-        final_image = create_social_media_post(hero_img, detail_imgs, request.property_info)
-        
-        image_base64 = image_to_base64(final_image)
+        async with render_admission.slot(client_id(http_request)):
+            with IN_FLIGHT.track_inprogress(operation="render"):
+                image_base64 = await run_in_worker(
+                    render_executor, render_post, request.hero_image_url, request.detail_images, request.property_info
+                )
         caption = generate_caption(request.property_info)
         hashtags = generate_hashtags(request.property_info)
         
@@ -935,6 +4511,170 @@ async def generate_content(request: ImageSelection):
         logger.error(f"Content generation failed: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Content generation failed: {str(e)}")
 
+@app.post("/generate/preview", response_model=PreviewContent)
+async def generate_preview(request: ImageSelection, http_request: Request):
+    """Fast reduced-scale render of the post for interactive editing; same layout as /generate"""
+    if await load_session(request.session_id) is None:
+        raise HTTPException(status_code=404, detail="Session not found or expired")
+
+    try:
+        async with render_admission.slot(client_id(http_request)):
+            with IN_FLIGHT.track_inprogress(operation="preview"):
+                result = await run_in_worker(
+                    render_executor, render_preview, request.hero_image_url, request.detail_images, request.property_info
+                )
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Preview generation failed: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Preview generation failed: {str(e)}")
+
+    return PreviewContent(
+        session_id=request.session_id,
+        caption=generate_caption(request.property_info),
+        hashtags=generate_hashtags(request.property_info),
+        **result
+    )
+
+@app.post("/edit", response_model=EditUpdate)
+async def start_edit(request: EditStart, http_request: Request):
+    """
+    Open a live edit of a post. The response carries the whole canvas as one
+    patch; later PATCH /edit/{edit_id} calls return only the regions that
+    changed. Live edits live in this process's memory.
+    """
+    if await load_session(request.session_id) is None:
+        raise HTTPException(status_code=404, detail="Session not found or expired")
+
+    try:
+        async with render_admission.slot(client_id(http_request)):
+            with IN_FLIGHT.track_inprogress(operation="edit"):
+                result = await run_in_worker(render_executor, start_live_edit, request)
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Live edit failed to start: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Live edit failed to start: {str(e)}")
+
+    return EditUpdate(**result)
+
+@app.patch("/edit/{edit_id}", response_model=EditUpdate)
+async def update_edit(edit_id: str, request: EditChange, http_request: Request):
+    """Apply a change to a live edit and return re-encoded patches of the regions it affected"""
+    edit = live_edits.get(edit_id)
+    if edit is None:
+        raise HTTPException(status_code=404, detail="Live edit not found or expired")
+
+    try:
+        async with render_admission.slot(client_id(http_request)):
+            with IN_FLIGHT.track_inprogress(operation="edit"):
+                result = await run_in_worker(render_executor, update_live_edit, edit_id, edit, request)
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Live edit update failed: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Live edit update failed: {str(e)}")
+
+    return EditUpdate(**result)
+
+@app.get("/edit/{edit_id}", response_model=EditUpdate)
+async def get_edit(edit_id: str):
+    """The current canvas of a live edit as one patch, for clients that lost track"""
+    edit = live_edits.get(edit_id)
+    if edit is None:
+        raise HTTPException(status_code=404, detail="Live edit not found or expired")
+
+    def snapshot():
+        start = time.perf_counter()
+        with edit.lock:
+            return live_edit_update(edit_id, edit, [edit.patch("canvas")], True, start)
+
+    return EditUpdate(**await run_in_worker(render_executor, snapshot))
+
+@app.delete("/edit/{edit_id}")
+async def delete_edit(edit_id: str):
+    if not live_edits.discard(edit_id):
+        raise HTTPException(status_code=404, detail="Live edit not found or expired")
+    return {"message": "Live edit closed"}
+
+@app.post("/generate/carousel", response_model=CarouselContent)
+async def generate_carousel(request: CarouselRequest, http_request: Request):
+    """Generate a full carousel: cover post, one slide per photo and a closing slide"""
+    if await load_session(request.session_id) is None:
+        raise HTTPException(status_code=404, detail="Session not found or expired")
+
+    start = time.perf_counter()
+    try:
+        with IN_FLIGHT.track_inprogress(operation="carousel"):
+            slides = await render_carousel(request.image_urls, request.property_info, client_id(http_request))
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Carousel generation failed: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Carousel generation failed: {str(e)}")
+
+    elapsed_ms = round((time.perf_counter() - start) * 1000, 1)
+    logger.info(f"Carousel of {len(slides)} slides generated for session {request.session_id} in {elapsed_ms:.0f}ms")
+    return CarouselContent(
+        session_id=request.session_id,
+        slides=slides,
+        caption=generate_caption(request.property_info),
+        hashtags=generate_hashtags(request.property_info),
+        elapsed_ms=elapsed_ms
+    )
+
+@app.post("/generate/slideshow", response_model=SlideshowContent)
+async def generate_slideshow(request: SlideshowRequest, http_request: Request):
+    """Generate an animated pan-and-zoom preview of the selected images"""
+    if await load_session(request.session_id) is None:
+        raise HTTPException(status_code=404, detail="Session not found or expired")
+
+    try:
+        async with render_admission.slot(client_id(http_request)):
+            with IN_FLIGHT.track_inprogress(operation="slideshow"):
+                result = await run_in_worker(render_executor, render_slideshow, request)
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Slideshow generation failed: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Slideshow generation failed: {str(e)}")
+
+    return SlideshowContent(session_id=request.session_id, **result)
+
+@app.post("/generate/batch")
+async def generate_batch(request: BatchGenerateRequest, http_request: Request):
+    """Generate many posts at once, streamed back as a ZIP as each one finishes"""
+    def find_missing():
+        return sorted({job.session_id for job in request.jobs if job.session_id not in sessions})
+
+    missing = await run_in_worker(store_executor, find_missing)
+    if missing:
+        raise HTTPException(status_code=404, detail=f"Sessions not found or expired: {', '.join(missing)}")
+
+    filename = f"posts_{datetime.now():%Y%m%d_%H%M%S}.zip"
+    return StreamingResponse(
+        stream_batch_zip(request.jobs, client_id(http_request)),
+        media_type="application/zip",
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
+
+@app.post("/auto-select", response_model=AutoSelection)
+async def auto_select(request: AutoSelectRequest, http_request: Request):
+    """Recommend a hero and 3 detail images for a scraped session"""
+    session_data = await load_session(request.session_id)
+    if session_data is None:
+        raise HTTPException(status_code=404, detail="Session not found or expired")
+
+    try:
+        async with render_admission.slot(client_id(http_request)):
+            selection = await run_in_worker(render_executor, auto_select_images, session_data['images'])
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    logger.info(f"Auto-selected {len(selection['detail_images']) + 1} of {selection['scored']} images "
+                f"for session {request.session_id} in {selection['elapsed_ms']}ms")
+    return AutoSelection(session_id=request.session_id, **selection)
+
 def generate_caption(property_info: PropertyInfo) -> str:
     """Generate engaging social media caption"""
     price_num = int(re.sub(r'[^\d]', '', property_info.price))
@@ -1014,11 +4754,110 @@ def generate_hashtags(property_info: PropertyInfo) -> List[str]:
     
     return list(set(hashtags[:30]))
 
+@app.get("/debug/traces")
+def list_traces():
+    """Trace IDs held in memory, most recent last"""
+    with recent_traces_lock:
+        traces = [
+            {"trace_id": trace_id, "spans": len(spans), "root": spans[-1]['name']}
+            for trace_id, spans in recent_traces.items()
+        ]
+    return {"traces": traces, "total": len(traces)}
+
+@app.get("/debug/traces/{trace_id}")
+def get_trace(trace_id: str, format: str = "json"):
+    """Span tree of one trace, as JSON or a text waterfall (format=text)"""
+    spans = load_trace(trace_id)
+    if not spans:
+        raise HTTPException(status_code=404, detail="Trace not found")
+    tree = build_span_tree(spans)
+    if format == "text":
+        return PlainTextResponse(render_waterfall(tree))
+    return {"trace_id": trace_id, "span_count": len(spans), "spans": tree}
+
+@app.get("/debug/profiles")
+def list_profiles(request: Request):
+    """Stored profiles, newest first"""
+    if not is_admin(request):
+        raise HTTPException(status_code=403, detail="Admin token required")
+    profiles = []
+    if os.path.isdir(PROFILE_DIR):
+        for profile_id in os.listdir(PROFILE_DIR):
+            summary_path = os.path.join(PROFILE_DIR, profile_id, "summary.json")
+            if os.path.exists(summary_path):
+                with open(summary_path, encoding="utf-8") as f:
+                    profiles.append(json.load(f))
+    profiles.sort(key=lambda p: p['started_at'], reverse=True)
+    return {"profiles": profiles, "total": len(profiles)}
+
+@app.get("/debug/profiles/{profile_id}")
+def get_profile(profile_id: str, request: Request, format: str = "text"):
+    """A stored profile as pstats text, raw pstats or collapsed stacks"""
+    if not is_admin(request):
+        raise HTTPException(status_code=403, detail="Admin token required")
+    if not re.fullmatch(r"[0-9a-f]{12}", profile_id):
+        raise HTTPException(status_code=404, detail="Profile not found")
+    path = os.path.join(PROFILE_DIR, profile_id)
+    pstats_path = os.path.join(path, "profile.pstats")
+    if format == "collapsed":
+        collapsed_path = os.path.join(path, "stacks.collapsed")
+        if not os.path.exists(collapsed_path):
+            raise HTTPException(status_code=404, detail="Profile not found")
+        return FileResponse(collapsed_path, media_type="text/plain")
+    if not os.path.exists(pstats_path):
+        raise HTTPException(status_code=404, detail="Profile not found")
+    if format == "pstats":
+        return FileResponse(pstats_path, media_type="application/octet-stream", filename=f"{profile_id}.pstats")
+    report = io.StringIO()
+    pstats.Stats(pstats_path, stream=report).sort_stats("cumulative").print_stats(60)
+    return PlainTextResponse(report.getvalue())
+
+@app.get("/debug/memory")
+def get_memory():
+    """RSS including Chrome children, cache sizes, tracemalloc state and heavy requests"""
+    return memory_report()
+
+@app.get("/debug/cdn")
+def get_cdn():
+    """CDN fetch hedging: hedge rate, retries and the p99 with and without hedges"""
+    return cdn_fetch_report()
+
+@app.get("/debug/storage")
+def get_storage():
+    """Usage of the managed download and debug-artifact stores"""
+    return {store.name: store.stats() for store in (download_store, debug_store)}
+
+@app.get("/catalogue")
+def list_catalogue(limit: int = 20):
+    """Most recently scraped listings"""
+    listings = catalogue.recent(min(max(limit, 1), 200))
+    return {"listings": listings, "total": len(listings)}
+
+@app.get("/catalogue/listings/{listing_id}")
+def get_catalogue_listing(listing_id: str):
+    """Catalogued images and scrape history of a listing"""
+    listing = catalogue.get_listing(listing_id)
+    if listing is None:
+        raise HTTPException(status_code=404, detail="Listing not in catalogue")
+    return listing
+
+@app.get("/catalogue/images")
+def find_catalogue_image(url: str):
+    """Listings that contain an image URL"""
+    return {"image_url": url, "listings": catalogue.find_image(url)}
+
+@app.post("/catalogue/listings/{listing_id}/session", response_model=ScrapedImages)
+def session_from_catalogue(listing_id: str):
+    """Create a session from the catalogue without starting a browser"""
+    listing = catalogue.get_listing(listing_id)
+    if listing is None or not listing['images']:
+        raise HTTPException(status_code=404, detail="Listing not in catalogue")
+    return create_session(listing['listing_url'], [image['image_url'] for image in listing['images']])
+
 @app.delete("/session/{session_id}")
 async def delete_session(session_id: str):
     """Delete a session"""
-    if session_id in sessions:
-        del sessions[session_id]
+    if await run_in_worker(store_executor, drop_session, session_id):
         logger.info(f"Deleted session: {session_id}")
         return {"message": "Session deleted successfully"}
     raise HTTPException(status_code=404, detail="Session not found")
@@ -1026,8 +4865,7 @@ async def delete_session(session_id: str):
 @app.get("/sessions")
 async def list_sessions():
     """List all active sessions"""
-    clean_expired_sessions()
-    
+    active = await run_in_worker(store_executor, sessions.items)
     return {
         "sessions": [
             {
@@ -1037,23 +4875,46 @@ async def list_sessions():
                 "timestamp": data['timestamp'],
                 "age_minutes": (datetime.now() - datetime.fromisoformat(data['timestamp'])).total_seconds() / 60
             }
-            for sid, data in sessions.items()
+            for sid, data in active
         ],
-        "total": len(sessions)
+        "total": len(active)
     }
 
 @app.on_event("startup")
 async def startup_event():
     logger.info("Social Media Content Generator API v2.2 started")
-    logger.info(f"Session TTL: {SESSION_TTL}")
-    logger.info("Login credentials loaded")
+    logger.info(f"Session backend: {SESSION_BACKEND}, TTL: {SESSION_TTL}, max sessions: {SESSION_MAX}")
+    if EMAIL and PASSWORD:
+        logger.info("Login credentials loaded")
+    else:
+        logger.warning("ARYEO_EMAIL/ARYEO_PASSWORD not set - scrapes will fail until they are")
+    start_memory_tracing()
+    start_span_writer()
+    app.state.session_reaper = asyncio.create_task(reap_sessions_periodically())
+    app.state.blob_sweeper = asyncio.create_task(sweep_blob_stores_periodically())
+    if WARMUP_ENABLED:
+        app.state.warm_up = asyncio.create_task(run_warm_up())
+    else:
+        warmup_state['ready'] = True
 
 @app.on_event("shutdown")
 async def shutdown_event():
     logger.info("Shutting down API")
-    sessions.clear()
+    app.state.session_reaper.cancel()
+    app.state.blob_sweeper.cancel()
+    artifact_executor.shutdown(wait=True)
+    cdn_executor.shutdown(wait=False, cancel_futures=True)
+    stop_span_writer()
+    await asyncio.get_running_loop().run_in_executor(None, driver_pool.close)
+    sessions.close()
 
-app.mount("/", StaticFiles(directory="frontend/build", html=True), name="static")
+if os.path.isdir(FRONTEND_DIR):
+    app.mount("/", StaticFiles(directory=FRONTEND_DIR, html=True), name="static")
+else:
+    logger.warning(f"Frontend build not found at {FRONTEND_DIR}, serving API only")
 
 if __name__ == "__main__":
-    uvicorn.run(app, host="0.0.0.0", port=8000, log_level="info")
+    import uvicorn
+
+    # Multiple workers need an import string so each process builds its own app
+    uvicorn.run("myapp:app" if WORKERS > 1 else app, host="0.0.0.0", port=8000, log_level="info", workers=WORKERS)